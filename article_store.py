@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for raw scraped articles.
+
+Every article is serialised canonically, hashed (SHA-256) and written once as
+a compressed blob under blobs/<first two hex digits>/<hash>.<zst|gz>; storing
+the same article again is a no-op. A SQLite index maps link, title, date and
+source to blob hashes, so readers fetch subsets ("Fortinet since March") with
+one indexed query and only decompress the articles they asked for, instead
+of re-parsing multi-megabyte dated JSON dumps.
+
+iter_input is the reader for consumers of the merged corpus (the classifier,
+the preprocessing and extraction notebooks): given a store directory it
+yields the latest version of every article in the merged format
+({'title', 'content', 'link'}, see process_record), given a JSON array or
+JSONL file it yields that file's records.
+
+Blobs are zstd-compressed when the zstandard package is installed and gzip
+otherwise; the codec is recorded per article, so stores written with either
+stay readable.
+
+    python article_store.py import data/raw/threat_intelligence_multi_source_*.json
+    python article_store.py export --source Fortinet --since 2025-01-01 --output fortinet.jsonl
+    python classify_threat_intelligence.py --input data/store --source Fortinet --stream
+"""
+
+import os
+import gzip
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlparse
+from typing import Dict, Any, List, Optional, Iterable, Iterator
+
+from json_stream import iter_records, JsonlWriter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DEFAULT_STORE_DIR = 'data/store'
+
+BLOB_SUFFIXES = {'zstd': '.zst', 'gzip': '.gz'}
+
+# Formats of the 'date' field the scrapers pick up from article pages
+_DATE_FORMATS = ['%Y-%m-%d', '%B %d, %Y', '%b %d, %Y', '%d %B %Y', '%d %b %Y', '%m/%d/%Y']
+
+
+def article_hash(article: Dict[str, Any]) -> str:
+    """
+    SHA-256 of the canonical JSON serialisation of an article.
+    """
+    return hashlib.sha256(canonical_json(article)).hexdigest()
+
+
+def canonical_json(article: Dict[str, Any]) -> bytes:
+    return json.dumps(article, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def article_date(article: Dict[str, Any]) -> Optional[str]:
+    """
+    Publication date as YYYY-MM-DD, falling back to the scrape date; None if neither parses.
+    """
+    for field in ('published_date', 'date'):
+        value = article.get(field)
+        if not isinstance(value, str) or not value.strip():
+            continue
+        value = value.strip()
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).date().isoformat()
+        except ValueError:
+            pass
+        for date_format in _DATE_FORMATS:
+            try:
+                return datetime.strptime(value, date_format).date().isoformat()
+            except ValueError:
+                continue
+
+    scraped_at = article.get('scraped_at')
+    if isinstance(scraped_at, str) and len(scraped_at) >= 10:
+        return scraped_at[:10]
+    return None
+
+
+def article_link(article: Dict[str, Any]) -> Optional[str]:
+    return article.get('url') or article.get('link')
+
+
+def article_source(article: Dict[str, Any]) -> Optional[str]:
+    """
+    The scraper's source name, or the site's host name for records without one.
+    """
+    if article.get('source'):
+        return article['source']
+    link = article_link(article)
+    if not link:
+        return None
+    return urlparse(link).netloc or None
+
+
+def parse_security_title_from_url(url: str) -> str:
+    """
+    Parse title from security.com URL.
+    Example: "security.com/threat-intelligence/espionage-asia-governments" 
+    -> "espionage asia governments"
+    """
+    try:
+        # Extract the path part after the domain
+        parsed_url = urlparse(url)
+        path = parsed_url.path
+        
+        # Remove leading slash and split by '/'
+        path_parts = path.strip('/').split('/')
+        
+        # Find the last part that contains the title
+        if len(path_parts) >= 2:
+            # Get the last part (e.g., "espionage-asia-governments")
+            title_part = path_parts[-1]
+            
+            # Replace hyphens with spaces
+            title = title_part.replace('-', ' ')
+            
+            return title
+        else:
+            return "Unknown Title"
+            
+    except Exception as e:
+        print(f"Error parsing title from URL {url}: {e}")
+        return "Unknown Title"
+
+def extract_content_text(content: Any) -> str:
+    """
+    Extract text content from various content formats.
+    """
+    if isinstance(content, list):
+        # Join all paragraphs with spaces
+        return ' '.join([str(item) for item in content if item])
+    elif isinstance(content, str):
+        return content
+    else:
+        return str(content) if content else ""
+
+def process_record(record: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Process a single record according to the specified rules.
+    """
+    url = record.get('url', '')
+    title = record.get('title', '')
+    content = record.get('content', '')
+    
+    # Extract content text
+    content_text = extract_content_text(content)
+    
+    # Apply parsing rules
+    if 'fortinet.com' in url:
+        # Parse normally - use original title
+        final_title = title
+    elif 'security.com' in url or title == 'Main menu':
+        # Parse title from URL
+        final_title = parse_security_title_from_url(url)
+    else:
+        # Use original title for other cases
+        final_title = title
+    
+    return {
+        "title": final_title,
+        "content": content_text,
+        "link": url
+    }
+
+
+class ArticleStore:
+    """
+    Compressed, deduplicated article blobs with a SQLite index on link, title, date and source.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, compression: Optional[str] = None,
+                 level: Optional[int] = None, commit_every: int = 500, read_only: bool = False):
+        if compression is None:
+            compression = 'zstd' if zstandard is not None else 'gzip'
+        if compression not in BLOB_SUFFIXES:
+            raise ValueError(f"Unknown compression {compression!r} (choose from {', '.join(BLOB_SUFFIXES)})")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("zstd compression needs the zstandard package (pip install zstandard)")
+
+        self.root = Path(root)
+        self.blob_dir = self.root / 'blobs'
+        self.compression = compression
+        self.level = level if level is not None else (10 if compression == 'zstd' else 6)
+        self.commit_every = commit_every
+        self.added = 0
+        self._pending = 0
+        self.read_only = read_only
+
+        if read_only:
+            # Readers must not turn a mistyped path into an empty store
+            if not is_store(str(self.root)):
+                raise FileNotFoundError(f"{self.root} is not an article store (no index.sqlite)")
+            self.conn = sqlite3.connect(f"{(self.root / 'index.sqlite').resolve().as_uri()}?mode=ro", uri=True)
+            return
+
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.root / 'index.sqlite'))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS articles (
+                hash TEXT PRIMARY KEY,
+                link TEXT,
+                title TEXT,
+                date TEXT,
+                source TEXT,
+                compression TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                added_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_link ON articles (link)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_source_date ON articles (source, date)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_date ON articles (date)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_title ON articles (title)")
+
+    def blob_path(self, digest: str, compression: str) -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}{BLOB_SUFFIXES[compression]}"
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    @staticmethod
+    def _decompress(data: bytes, compression: str) -> bytes:
+        if compression == 'zstd':
+            if zstandard is None:
+                raise ImportError("this store has zstd blobs; install the zstandard package to read them")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def put(self, article: Dict[str, Any]) -> str:
+        """
+        Store an article (once per distinct content) and return its hash.
+        """
+        if self.read_only:
+            raise PermissionError(f"{self.root} was opened read-only")
+        data = canonical_json(article)
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self:
+            return digest
+
+        path = self.blob_path(digest, self.compression)
+        path.parent.mkdir(exist_ok=True)
+        blob = self._compress(data)
+        # Write then rename, so a crash never leaves a truncated blob under its final name
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_bytes(blob)
+        os.replace(tmp_path, path)
+
+        self.conn.execute(
+            "INSERT INTO articles (hash, link, title, date, source, compression, size, stored_size, added_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (digest, article_link(article), article.get('title'), article_date(article),
+             article_source(article), self.compression, len(data), len(blob), time.time())
+        )
+        self.added += 1
+        self._maybe_commit()
+        return digest
+
+    def put_many(self, articles: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Store articles; returns how many were new and how many were already stored.
+        """
+        added_before = self.added
+        total = 0
+        for article in articles:
+            self.put(article)
+            total += 1
+        self.conn.commit()
+        added = self.added - added_before
+        return {'added': added, 'existing': total - added}
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT compression FROM articles WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        blob = self.blob_path(digest, row[0]).read_bytes()
+        return json.loads(self._decompress(blob, row[0]))
+
+    def latest(self, link: str) -> Optional[Dict[str, Any]]:
+        """
+        Most recently stored version of the article at link.
+        """
+        row = self.conn.execute(
+            "SELECT hash FROM articles WHERE link = ? ORDER BY added_at DESC LIMIT 1", (link,)
+        ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def hashes(self, source: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+               title: Optional[str] = None, link: Optional[str] = None, latest: bool = False) -> List[str]:
+        """
+        Hashes of the articles matching every given filter, oldest date first
+        and articles without a date last (in the order they were stored).
+
+        since/until are inclusive YYYY-MM-DD bounds; title matches a substring.
+        With latest, only the most recently stored version of each link is returned.
+        """
+        conditions, params = [], []
+        if source is not None:
+            conditions.append("source = ?")
+            params.append(source)
+        if since is not None:
+            conditions.append("date >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("date <= ?")
+            params.append(until)
+        if title is not None:
+            conditions.append("title LIKE ?")
+            params.append(f"%{title}%")
+        if link is not None:
+            conditions.append("link = ?")
+            params.append(link)
+        if latest:
+            conditions.append("(link IS NULL OR added_at = "
+                              "(SELECT MAX(added_at) FROM articles AS newer WHERE newer.link = articles.link))")
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.conn.execute(f"SELECT hash FROM articles {where} ORDER BY date IS NULL, date, added_at", params).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_articles(self, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the articles matching hashes(**filters), decompressing one at a time.
+        """
+        for digest in self.hashes(**filters):
+            yield self.get(digest)
+
+    def iter_merged(self, **filters) -> Iterator[Dict[str, str]]:
+        """
+        The latest version of every article matching filters, in the merged
+        format, skipping articles without content like merge_json_files does.
+        """
+        for article in self.iter_articles(latest=True, **filters):
+            record = process_record(article)
+            if record['content'].strip():
+                yield record
+
+    def stats(self) -> Dict[str, Any]:
+        articles, size, stored_size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM articles"
+        ).fetchone()
+        sources = dict(self.conn.execute("SELECT source, COUNT(*) FROM articles GROUP BY source").fetchall())
+        return {'articles': articles, 'size': size, 'stored_size': stored_size, 'sources': sources}
+
+    def _maybe_commit(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self):
+        """
+        Flush pending writes and close the index.
+        """
+        self.conn.commit()
+        self.conn.close()
+
+    def __contains__(self, digest: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM articles WHERE hash = ?", (digest,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+
+def is_store(path: str) -> bool:
+    """
+    True if path is an article store directory.
+    """
+    return (Path(path) / 'index.sqlite').is_file()
+
+
+def iter_input(path: str, **filters) -> Iterator[Dict[str, Any]]:
+    """
+    Merged-format articles from a store directory (filtered like
+    ArticleStore.hashes), or the records of a JSON array / JSONL file.
+    The store is opened read-only; a directory that is not one is an error.
+    """
+    if not is_store(path):
+        if any(value is not None for value in filters.values()):
+            raise ValueError(f"{path} is not an article store; filters need a store directory")
+        if Path(path).is_dir():
+            raise FileNotFoundError(f"{path} is a directory but not an article store (no index.sqlite)")
+        yield from iter_records(path)
+        return
+
+    store = ArticleStore(path, read_only=True)
+    try:
+        yield from store.iter_merged(**filters)
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed store for raw scraped articles")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR, help='Store directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Add articles from JSON / JSONL files')
+    import_parser.add_argument('files', nargs='+')
+    import_parser.add_argument('--compression', choices=list(BLOB_SUFFIXES), default=None,
+                               help='Blob codec (default: zstd if installed, else gzip)')
+
+    export_parser = subparsers.add_parser('export', help='Write a subset of the store to JSONL')
+    export_parser.add_argument('--output', required=True)
+    export_parser.add_argument('--source', default=None)
+    export_parser.add_argument('--since', default=None, help='First date (YYYY-MM-DD), inclusive')
+    export_parser.add_argument('--until', default=None, help='Last date (YYYY-MM-DD), inclusive')
+    export_parser.add_argument('--title', default=None, help='Substring of the title')
+
+    subparsers.add_parser('stats', help='Show article counts and sizes')
+    args = parser.parse_args()
+
+    # Only import writes; export and stats must not create a store at a mistyped path
+    store = ArticleStore(args.store, compression=getattr(args, 'compression', None),
+                         read_only=args.command != 'import')
+    try:
+        if args.command == 'import':
+            for input_file in args.files:
+                counts = store.put_many(iter_records(input_file))
+                print(f"📥 {Path(input_file).name}: {counts['added']} added, {counts['existing']} already stored")
+
+        elif args.command == 'export':
+            with JsonlWriter(args.output, append=False) as writer:
+                for article in store.iter_articles(source=args.source, since=args.since,
+                                                   until=args.until, title=args.title):
+                    writer.write(article)
+            print(f"📤 Wrote {writer.written} articles to {args.output}")
+
+        stats = store.stats()
+        ratio = stats['size'] / stats['stored_size'] if stats['stored_size'] else 0.0
+        print(f"🗄️  {stats['articles']} articles, {stats['size'] / 1e6:.1f} MB as JSON, "
+              f"{stats['stored_size'] / 1e6:.1f} MB stored ({ratio:.1f}x, {store.compression})")
+        print(f"📊 Sources: {stats['sources']}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
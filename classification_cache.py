@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk cache for threat classification results.
+
+Entries are keyed by a hash of the article and of everything that can change
+its classification, and evicted least-recently-used first once the cache
+grows past its size budget.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+
+class ClassificationCache:
+    """
+    SQLite-backed key/value store with LRU eviction by total payload size.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, commit_every: int = 500):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        Hash arbitrary JSON-serialisable parts into a stable cache key.
+        """
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached value for key, refreshing its LRU position.
+        """
+        row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._maybe_commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """
+        Store a value, evicting old entries if the size budget is exceeded.
+        """
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode('utf-8'))
+
+        old = self.conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if old is not None:
+            self.total_bytes -= old[0]
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, payload, size, time.time())
+        )
+        self.total_bytes += size
+
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        self._maybe_commit()
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache fits its budget.
+        """
+        # Leave some headroom so eviction does not run on every insert
+        target = int(self.max_bytes * 0.9)
+        cursor = self.conn.execute("SELECT key, size FROM entries ORDER BY last_used ASC")
+        doomed = []
+        for key, size in cursor:
+            if self.total_bytes <= target:
+                break
+            doomed.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def _maybe_commit(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.conn.commit()
+            self._pending = 0
+
+    def close(self):
+        """
+        Flush pending writes and close the database.
+        """
+        self.conn.commit()
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
@@ -5,22 +5,38 @@ Enhanced with reasoning capabilities from Mistral AI.
 """
 
 import os
+import re
 import json
+import pickle
+import hashlib
+import argparse
+import time
+import itertools
 import torch
 import datetime
 from pathlib import Path
-from typing import List, Dict, Any
-from transformers import AutoTokenizer, AutoModel, AutoModelForCausalLM, pipeline
+from typing import List, Dict, Any, Optional, Tuple
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report
 import numpy as np
 import gc
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+from classification_cache import ClassificationCache
+from json_stream import recover_jsonl, JsonlWriter
+from article_store import iter_input
+from model_registry import load_causal_lm
+from length_batching import make_length_batches
+from pipeline_metrics import METRICS
+from dedup import DuplicateIndex
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Bump whenever classification logic changes in a way that invalidates cached results
+CLASSIFIER_VERSION = '1.1'
+
 # Try to import bitsandbytes for 8-bit loading
 try:
     import bitsandbytes
@@ -28,14 +44,18 @@ except ImportError:
     print("bitsandbytes not installed - 8-bit loading unavailable")
 
 
-def load_data(input_file: str) -> List[Dict[str, Any]]:
+def load_data(input_file: str, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
     """
-    Load threat intelligence data from JSON file.
+    Load threat intelligence data from a JSON array or JSONL file, or an article store directory.
     """
     try:
         print(f"📖 Loading data from: {input_file}")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with METRICS.stage('load'):
+            if Path(input_file).suffix == '.json' and not filters:
+                with open(input_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            else:
+                data = list(iter_input(input_file, **(filters or {})))
         print(f"✅ Loaded {len(data)} articles")
         return data
     except Exception as e:
@@ -46,6 +66,8 @@ def load_data(input_file: str) -> List[Dict[str, Any]]:
 def setup_model():
     """
     Setup Mistral-7B-Instruct model for classification.
+    
+    Models come from the process-wide registry, so repeated calls are cheap.
     """
     try:
         print("🤖 Setting up Mistral-7B-Instruct model...")
@@ -76,52 +98,18 @@ def setup_model():
         print(f"📦 Loading model: {model_name}")
         
         try:
-            from transformers import AutoModelForCausalLM
-            
-            # Load tokenizer with token if available
-            if hf_token:
-                tokenizer = AutoTokenizer.from_pretrained(
-                    model_name,
-                    token=hf_token,
-                    trust_remote_code=True
-                )
-            else:
-                tokenizer = AutoTokenizer.from_pretrained(
-                    model_name,
-                    trust_remote_code=True
-                )
-            
-            # Load model with token if available
-            if hf_token:
-                model = AutoModelForCausalLM.from_pretrained(
-                    model_name,
-                    token=hf_token,
-                    torch_dtype=torch.float16 if device != 'cpu' else torch.float32,
-                    device_map='auto' if device != 'cpu' else None,
-                    trust_remote_code=True
-                )
-            else:
-                model = AutoModelForCausalLM.from_pretrained(
-                    model_name,
-                    torch_dtype=torch.float16 if device != 'cpu' else torch.float32,
-                    device_map='auto' if device != 'cpu' else None,
-                    trust_remote_code=True
-                )
-            
-            if device == 'cpu':
-                model = model.to(device)
-            
-            # Set pad token if not exists
-            if tokenizer.pad_token is None:
-                tokenizer.pad_token = tokenizer.eos_token
+            loaded = load_causal_lm(model_name, device, hf_token, trust_remote_code=True)
             
             print(f"✅ {model_name} loaded successfully on {device}")
             
             return {
-                'model': model,
-                'tokenizer': tokenizer,
+                'model': loaded['model'],
+                'tokenizer': loaded['tokenizer'],
                 'device': device,
-                'model_type': 'mistral_instruct'
+                'model_type': 'mistral_instruct',
+                'model_name': model_name,
+                'load_seconds': loaded['load_seconds'],
+                'rss_mb': loaded['rss_mb']
             }
             
         except Exception as e:
@@ -133,38 +121,18 @@ def setup_model():
             print(f"📦 Loading fallback model: {fallback_model}")
             
             try:
-                if hf_token:
-                    tokenizer = AutoTokenizer.from_pretrained(
-                        fallback_model,
-                        token=hf_token
-                    )
-                    model = AutoModelForCausalLM.from_pretrained(
-                        fallback_model,
-                        token=hf_token,
-                        torch_dtype=torch.float16 if device != 'cpu' else torch.float32,
-                        device_map='auto' if device != 'cpu' else None
-                    )
-                else:
-                    tokenizer = AutoTokenizer.from_pretrained(fallback_model)
-                    model = AutoModelForCausalLM.from_pretrained(
-                        fallback_model,
-                        torch_dtype=torch.float16 if device != 'cpu' else torch.float32,
-                        device_map='auto' if device != 'cpu' else None
-                    )
-                
-                if device == 'cpu':
-                    model = model.to(device)
-                
-                if tokenizer.pad_token is None:
-                    tokenizer.pad_token = tokenizer.eos_token
+                loaded = load_causal_lm(fallback_model, device, hf_token)
                 
                 print(f"✅ {fallback_model} loaded successfully on {device}")
                 
                 return {
-                    'model': model,
-                    'tokenizer': tokenizer,
+                    'model': loaded['model'],
+                    'tokenizer': loaded['tokenizer'],
                     'device': device,
-                    'model_type': 'dialogpt_instruct'
+                    'model_type': 'dialogpt_instruct',
+                    'model_name': fallback_model,
+                    'load_seconds': loaded['load_seconds'],
+                    'rss_mb': loaded['rss_mb']
                 }
                 
             except Exception as e2:
@@ -176,21 +144,14 @@ def setup_model():
         return None
 
 
-def classify_with_mistral(title: str, content: str, model_info: Dict) -> Dict[str, Any]:
-    """
-    Enhanced classification using Mistral-7B instruction following capabilities.
+def build_classification_prompt(title: str, content: str, max_chars: Optional[int] = 1500) -> str:
     """
-    if model_info is None or 'instruct' not in model_info.get('model_type', ''):
-        # Fallback to rule-based if model not available
-        return classify_with_rules(title, content)
+    Build the Mistral instruction prompt for threat classification.
     
-    try:
-        model = model_info['model']
-        tokenizer = model_info['tokenizer']
-        device = model_info['device']
-        
-        # Create a structured prompt for threat classification using Mistral format
-        prompt = f"""[INST] You are a cybersecurity expert specialized in threat intelligence analysis. Analyze the given article and classify it.
+    max_chars=None keeps the whole content (used for pre-sized chunk windows).
+    """
+    # Create a structured prompt for threat classification using Mistral format
+    return f"""[INST] You are a cybersecurity expert specialized in threat intelligence analysis. Analyze the given article and classify it.
 
 Instructions:
 1. Determine if this is a cybersecurity threat report (yes/no)
@@ -206,7 +167,7 @@ Categories:
 
 Article:
 Title: {title}
-Content: {content[:1500]}...
+Content: {content[:max_chars]}...
 
 Please respond in this exact format:
 THREAT: yes/no
@@ -218,69 +179,280 @@ Looking at this cybersecurity article, I'll analyze it systematically:
 
 """
 
-        # Get max length from environment or use default
-        max_length = int(os.getenv('MAX_LENGTH', '3000'))
-        
-        # Tokenize input
-        inputs = tokenizer(
-            prompt,
-            max_length=max_length,
-            truncation=True,
-            return_tensors='pt'
-        ).to(device)
-        
-        # Get generation parameters from environment or use defaults
-        max_new_tokens = int(os.getenv('MAX_TOKENS', '200'))
-        temperature = float(os.getenv('TEMPERATURE', '0.1'))
-        
-        # Generate response
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-                temperature=temperature,
-                pad_token_id=tokenizer.eos_token_id,
-                eos_token_id=tokenizer.eos_token_id
-            )
-        
-        # Decode response
-        response = tokenizer.decode(outputs[0][inputs['input_ids'].shape[1]:], skip_special_tokens=True)
-        
-        # Parse response
-        is_threat = False
-        category = "unknown"
-        object_name = "unknown"
-        confidence = 0.5
-        
-        lines = response.strip().split('\n')
-        for line in lines:
-            line = line.strip().upper()
-            if line.startswith('THREAT:'):
-                is_threat = 'YES' in line
-            elif line.startswith('CATEGORY:'):
-                category = line.split(':', 1)[1].strip().lower()
-            elif line.startswith('OBJECT:'):
-                object_name = line.split(':', 1)[1].strip()
-            elif line.startswith('CONFIDENCE:'):
-                try:
-                    confidence = float(line.split(':', 1)[1].strip())
-                except:
-                    confidence = 0.5
-        
-        main_object = f"{category.title()}: {object_name}" if is_threat else ""
-        
+
+def parse_classification_fields(response: str) -> Dict[str, Any]:
+    """
+    Extract the raw THREAT/CATEGORY/OBJECT/CONFIDENCE values from a model response.
+    """
+    is_threat = False
+    category = "unknown"
+    object_name = "unknown"
+    confidence = 0.5
+    
+    lines = response.strip().split('\n')
+    for line in lines:
+        line = line.strip().upper()
+        if line.startswith('THREAT:'):
+            is_threat = 'YES' in line
+        elif line.startswith('CATEGORY:'):
+            category = line.split(':', 1)[1].strip().lower()
+        elif line.startswith('OBJECT:'):
+            object_name = line.split(':', 1)[1].strip()
+        elif line.startswith('CONFIDENCE:'):
+            try:
+                confidence = float(line.split(':', 1)[1].strip())
+            except:
+                confidence = 0.5
+    
+    return {
+        'is_threat': is_threat,
+        'category': category,
+        'object': object_name,
+        'confidence': confidence
+    }
+
+
+def parse_classification_response(response: str) -> Dict[str, Any]:
+    """
+    Parse a THREAT/CATEGORY/OBJECT/CONFIDENCE block from a model response.
+    """
+    fields = parse_classification_fields(response)
+    is_threat = fields['is_threat']
+    confidence = fields['confidence']
+    
+    main_object = f"{fields['category'].title()}: {fields['object']}" if is_threat else ""
+    
+    return {
+        'is_threat_report': is_threat,
+        'main_object': main_object,
+        'confidence': confidence,
+        'mistral_response': response[:300] + "..." if len(response) > 300 else response
+    }
+
+
+def has_threat_verdict(response: str) -> bool:
+    """
+    Check whether a model response contains a THREAT: line at all.
+    """
+    return any(line.strip().upper().startswith('THREAT:') for line in response.split('\n'))
+
+
+def generate_responses(prompts: List[str], model_info: Dict, batch_size: int = None) -> List[Optional[str]]:
+    """
+    Run prompts through the model in length-sorted, left-padded batches.
+    
+    Returns the decoded new tokens for every prompt, or None where the
+    prompt's batch failed.
+    """
+    model = model_info['model']
+    tokenizer = model_info['tokenizer']
+    device = model_info['device']
+    
+    # Get max length, batching and generation parameters from environment or use defaults
+    max_length = int(os.getenv('MAX_LENGTH', '3000'))
+    batch_size = batch_size or int(os.getenv('BATCH_SIZE', '8'))
+    max_batch_tokens = int(os.getenv('MAX_BATCH_TOKENS', '16384'))
+    max_new_tokens = int(os.getenv('MAX_TOKENS', '200'))
+    temperature = float(os.getenv('TEMPERATURE', '0.1'))
+    
+    responses: List[Optional[str]] = [None] * len(prompts)
+    
+    try:
+        with METRICS.stage('llm_tokenize'):
+            encoded = tokenizer(prompts, max_length=max_length, truncation=True)['input_ids']
+    except Exception as e:
+        print(f"⚠️ Mistral batch tokenization failed: {e}")
+        return responses
+    
+    batches = make_length_batches([len(ids) for ids in encoded], batch_size, max_batch_tokens)
+    
+    # Decoder-only models must be padded on the left so generation continues the prompt
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = 'left'
+    try:
+        for batch in batches:
+            try:
+                with METRICS.stage('llm_tokenize'):
+                    inputs = tokenizer.pad(
+                        {'input_ids': [encoded[i] for i in batch]},
+                        return_tensors='pt'
+                    ).to(device)
+                
+                with METRICS.stage('llm_generate'), torch.no_grad():
+                    outputs = model.generate(
+                        **inputs,
+                        max_new_tokens=max_new_tokens,
+                        do_sample=False,
+                        temperature=temperature,
+                        pad_token_id=tokenizer.eos_token_id,
+                        eos_token_id=tokenizer.eos_token_id
+                    )
+                
+                # Decode only the newly generated tokens of every row
+                with METRICS.stage('llm_decode'):
+                    decoded = tokenizer.batch_decode(
+                        outputs[:, inputs['input_ids'].shape[1]:],
+                        skip_special_tokens=True
+                    )
+                for i, response in zip(batch, decoded):
+                    responses[i] = response
+                        
+            except Exception as e:
+                print(f"⚠️ Mistral batch classification failed ({len(batch)} prompts): {e}")
+    finally:
+        tokenizer.padding_side = padding_side
+    
+    return responses
+
+
+def classify_batch_with_mistral(articles: List[Tuple[str, str]], model_info: Dict,
+                                batch_size: int = None) -> List[Dict[str, Any]]:
+    """
+    Classify many (title, content) pairs with batched generation.
+    
+    Prompts are sorted by token length and left-padded into dynamic batches so
+    each batch costs one generate call. Rows whose batch failed or whose answer
+    has no THREAT verdict fall back to rule-based classification.
+    """
+    if model_info is None or 'instruct' not in model_info.get('model_type', ''):
+        # Fallback to rule-based if model not available
+        return [classify_with_rules(title, content) for title, content in articles]
+    
+    prompts = [build_classification_prompt(title, content) for title, content in articles]
+    responses = generate_responses(prompts, model_info, batch_size)
+    
+    results = []
+    for (title, content), response in zip(articles, responses):
+        if response is not None and has_threat_verdict(response):
+            results.append(parse_classification_response(response))
+        else:
+            # Fallback to rule-based classification for the rows that failed
+            results.append(classify_with_rules(title, content))
+    
+    return results
+
+
+def split_into_windows(tokenizer, content: str, window_tokens: int, overlap: int,
+                       max_windows: int) -> List[str]:
+    """
+    Split content into overlapping token windows, decoded back to text.
+    
+    When a document needs more than max_windows windows, evenly spaced
+    windows are kept so the beginning, middle and end are all covered.
+    """
+    token_ids = tokenizer(content, add_special_tokens=False)['input_ids']
+    if len(token_ids) <= window_tokens:
+        return [content]
+    
+    step = max(1, window_tokens - overlap)
+    starts = list(range(0, len(token_ids) - overlap, step))
+    if len(starts) > max_windows:
+        if max_windows == 1:
+            starts = starts[:1]
+        else:
+            starts = [starts[round(i * (len(starts) - 1) / (max_windows - 1))] for i in range(max_windows)]
+    
+    return [tokenizer.decode(token_ids[start:start + window_tokens], skip_special_tokens=True)
+            for start in starts]
+
+
+def aggregate_window_votes(votes: List[Dict[str, Any]], min_confidence: float) -> Dict[str, Any]:
+    """
+    Combine per-window THREAT/CATEGORY/OBJECT/CONFIDENCE votes into one decision.
+    
+    A document is a threat report if any window says so with at least
+    min_confidence, or if confidence-weighted yes votes outweigh the no votes.
+    The category is the confidence-weighted majority among yes votes and the
+    object comes from that category's most confident window.
+    """
+    yes_votes = [vote for vote in votes if vote['is_threat']]
+    no_votes = [vote for vote in votes if not vote['is_threat']]
+    yes_weight = sum(vote['confidence'] for vote in yes_votes)
+    no_weight = sum(vote['confidence'] for vote in no_votes)
+    
+    is_threat = bool(yes_votes) and (
+        max(vote['confidence'] for vote in yes_votes) >= min_confidence or yes_weight > no_weight
+    )
+    
+    if not is_threat:
         return {
-            'is_threat_report': is_threat,
-            'main_object': main_object,
-            'confidence': confidence,
-            'mistral_response': response[:300] + "..." if len(response) > 300 else response
+            'is_threat_report': False,
+            'main_object': '',
+            'confidence': no_weight / len(no_votes) if no_votes else 0.5
         }
+    
+    category_weights = {}
+    for vote in yes_votes:
+        category_weights[vote['category']] = category_weights.get(vote['category'], 0) + vote['confidence']
+    category = max(category_weights.items(), key=lambda x: x[1])[0]
+    best = max((vote for vote in yes_votes if vote['category'] == category), key=lambda v: v['confidence'])
+    
+    return {
+        'is_threat_report': True,
+        'main_object': f"{category.title()}: {best['object']}",
+        'confidence': best['confidence']
+    }
+
+
+def classify_chunked_with_mistral(articles: List[Tuple[str, str]], model_info: Dict,
+                                  batch_size: int = None) -> List[Dict[str, Any]]:
+    """
+    Classify long articles from overlapping token windows instead of a truncated head.
+    
+    Windows of all articles are batched through the model together and each
+    article's window votes are aggregated into one decision. Articles where no
+    window produced a THREAT verdict fall back to rule-based classification.
+    """
+    if model_info is None or 'instruct' not in model_info.get('model_type', ''):
+        # Fallback to rule-based if model not available
+        return [classify_with_rules(title, content) for title, content in articles]
+    
+    # Get chunking parameters from environment or use defaults
+    window_tokens = int(os.getenv('CHUNK_TOKENS', '512'))
+    overlap = int(os.getenv('CHUNK_OVERLAP', '64'))
+    max_windows = int(os.getenv('MAX_CHUNKS_PER_DOC', '8'))
+    min_confidence = float(os.getenv('CHUNK_MIN_CONFIDENCE', '0.7'))
+    
+    prompts = []
+    owners = []
+    for doc_index, (title, content) in enumerate(articles):
+        try:
+            windows = split_into_windows(model_info['tokenizer'], content, window_tokens, overlap, max_windows)
+        except Exception as e:
+            print(f"⚠️ Could not split article into windows: {e}")
+            windows = [content]
+        for window in windows:
+            prompts.append(build_classification_prompt(title, window, max_chars=None))
+            owners.append(doc_index)
+    
+    responses = generate_responses(prompts, model_info, batch_size)
+    
+    votes: List[List[Dict[str, Any]]] = [[] for _ in articles]
+    window_counts = [0] * len(articles)
+    for doc_index, response in zip(owners, responses):
+        window_counts[doc_index] += 1
+        if response is not None and has_threat_verdict(response):
+            votes[doc_index].append(parse_classification_fields(response))
+    
+    results = []
+    for doc_index, (title, content) in enumerate(articles):
+        if not votes[doc_index]:
+            results.append(classify_with_rules(title, content))
+            continue
         
-    except Exception as e:
-        print(f"⚠️ Mistral classification failed: {e}")
-        # Fallback to rule-based classification
-        return classify_with_rules(title, content)
+        result = aggregate_window_votes(votes[doc_index], min_confidence)
+        result['windows'] = window_counts[doc_index]
+        result['threat_votes'] = sum(1 for vote in votes[doc_index] if vote['is_threat'])
+        results.append(result)
+    
+    return results
+
+
+def classify_with_mistral(title: str, content: str, model_info: Dict) -> Dict[str, Any]:
+    """
+    Enhanced classification using Mistral-7B instruction following capabilities.
+    """
+    return classify_batch_with_mistral([(title, content)], model_info, batch_size=1)[0]
 
 
 def extract_features(text: str, model_info: Dict) -> np.ndarray:
@@ -311,6 +483,119 @@ def extract_features(text: str, model_info: Dict) -> np.ndarray:
 
 
 
+# Comprehensive threat indicators with weighted scoring
+THREAT_INDICATORS = {
+    'malware': {
+        'high_priority': ['ransomware', 'trojan', 'virus', 'backdoor', 'rootkit', 'worm', 'botnet', 'keylogger', 'spyware', 'adware'],
+        'medium_priority': ['malware', 'malicious', 'infected', 'payload', 'dropper', 'loader'],
+        'low_priority': ['threat', 'attack', 'compromise']
+    },
+    'vulnerability': {
+        'high_priority': ['cve-', 'zero-day', 'zero day', 'exploit', 'vulnerability', 'security flaw', 'buffer overflow', 'sql injection'],
+        'medium_priority': ['patch', 'update', 'fix', 'mitigation', 'workaround'],
+        'low_priority': ['weakness', 'flaw', 'issue']
+    },
+    'tool': {
+        'high_priority': ['cobalt strike', 'metasploit', 'nmap', 'wireshark', 'burp suite', 'fortinet', 'fortigate', 'fortisandbox', 'forticnapp'],
+        'medium_priority': ['tool', 'framework', 'software', 'platform', 'solution'],
+        'low_priority': ['application', 'system']
+    },
+    'technique': {
+        'high_priority': ['phishing', 'spear phishing', 'social engineering', 'ddos', 'dos', 'man-in-the-middle', 'mitm', 'brute force'],
+        'medium_priority': ['attack', 'technique', 'method', 'tactic', 'procedure', 'campaign'],
+        'low_priority': ['strategy', 'approach']
+    },
+    'actor': {
+        'high_priority': ['apt', 'advanced persistent threat', 'threat actor', 'cybercriminal', 'hacker group', 'nation-state'],
+        'medium_priority': ['group', 'actor', 'organization', 'team', 'gang'],
+        'low_priority': ['attacker', 'adversary']
+    },
+    'incident': {
+        'high_priority': ['breach', 'data breach', 'incident', 'intrusion', 'compromise', 'attack'],
+        'medium_priority': ['alert', 'warning', 'advisory', 'report'],
+        'low_priority': ['event', 'activity']
+    }
+}
+
+PRIORITY_WEIGHTS = {'high_priority': 3, 'medium_priority': 2, 'low_priority': 1}
+
+
+class ThreatKeywordMatcher:
+    """
+    Single-pass keyword engine for the rule-based classifier.
+
+    All indicators are compiled into one trie-shaped lookahead regex, so a
+    single scan reports the longest keyword starting at each position. Shorter
+    keywords starting at the same position are always prefixes of that match
+    and are added from a precomputed table, which keeps the substring semantics
+    of ``indicator in text`` exact (including overlapping hits).
+    """
+
+    def __init__(self, indicators: Dict[str, Dict[str, List[str]]], weights: Dict[str, int]):
+        self.categories = list(indicators.keys())
+
+        # keyword -> [(category, weight), ...] (one entry per list it appears in)
+        self.keyword_weights: Dict[str, List[tuple]] = {}
+        for category, priority_indicators in indicators.items():
+            for priority, keywords in priority_indicators.items():
+                for keyword in keywords:
+                    self.keyword_weights.setdefault(keyword, []).append((category, weights[priority]))
+
+        keywords = sorted(self.keyword_weights, key=len, reverse=True)
+        self.prefixes = {
+            keyword: [other for other in keywords if other != keyword and keyword.startswith(other)]
+            for keyword in keywords
+        }
+        self.pattern = re.compile('(?=(' + self._trie_pattern(keywords) + '))')
+
+    @staticmethod
+    def _trie_pattern(keywords: List[str]) -> str:
+        """Build a prefix-factored alternation so each position is tried once."""
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        def build(node: Dict) -> str:
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            # Greedy optional tail: the longest keyword at a position wins
+            return f'(?:{body})?' if '' in node else body
+
+        return build(trie)
+
+    def find(self, text: str) -> set:
+        """Return the set of indicators occurring anywhere in ``text``."""
+        found = set()
+        for match in self.pattern.finditer(text):
+            keyword = match.group(1)
+            if keyword not in found:
+                found.add(keyword)
+                found.update(self.prefixes[keyword])
+        return found
+
+    def score(self, text: str) -> Dict[str, int]:
+        """Weighted per-category scores for already lowercased ``text``."""
+        category_scores = {category: 0 for category in self.categories}
+        for keyword in self.find(text):
+            for category, weight in self.keyword_weights[keyword]:
+                category_scores[category] += weight
+        return category_scores
+
+
+# Built once at import time and shared by every classify_with_rules call
+KEYWORD_MATCHER = ThreatKeywordMatcher(THREAT_INDICATORS, PRIORITY_WEIGHTS)
+
+# Editing the indicator tables changes this, so cached rule results are not reused
+RULES_FINGERPRINT = hashlib.sha256(
+    json.dumps([THREAT_INDICATORS, PRIORITY_WEIGHTS], sort_keys=True).encode('utf-8')
+).hexdigest()[:16]
+
+
 def classify_with_rules(title: str, content: str) -> Dict[str, Any]:
     """
     Enhanced rule-based classification for threat intelligence with comprehensive coverage.
@@ -318,53 +603,9 @@ def classify_with_rules(title: str, content: str) -> Dict[str, Any]:
     # Combine title and content for analysis
     text = f"{title} {content}".lower()
     
-    # Comprehensive threat indicators with weighted scoring
-    threat_indicators = {
-        'malware': {
-            'high_priority': ['ransomware', 'trojan', 'virus', 'backdoor', 'rootkit', 'worm', 'botnet', 'keylogger', 'spyware', 'adware'],
-            'medium_priority': ['malware', 'malicious', 'infected', 'payload', 'dropper', 'loader'],
-            'low_priority': ['threat', 'attack', 'compromise']
-        },
-        'vulnerability': {
-            'high_priority': ['cve-', 'zero-day', 'zero day', 'exploit', 'vulnerability', 'security flaw', 'buffer overflow', 'sql injection'],
-            'medium_priority': ['patch', 'update', 'fix', 'mitigation', 'workaround'],
-            'low_priority': ['weakness', 'flaw', 'issue']
-        },
-        'tool': {
-            'high_priority': ['cobalt strike', 'metasploit', 'nmap', 'wireshark', 'burp suite', 'fortinet', 'fortigate', 'fortisandbox', 'forticnapp'],
-            'medium_priority': ['tool', 'framework', 'software', 'platform', 'solution'],
-            'low_priority': ['application', 'system']
-        },
-        'technique': {
-            'high_priority': ['phishing', 'spear phishing', 'social engineering', 'ddos', 'dos', 'man-in-the-middle', 'mitm', 'brute force'],
-            'medium_priority': ['attack', 'technique', 'method', 'tactic', 'procedure', 'campaign'],
-            'low_priority': ['strategy', 'approach']
-        },
-        'actor': {
-            'high_priority': ['apt', 'advanced persistent threat', 'threat actor', 'cybercriminal', 'hacker group', 'nation-state'],
-            'medium_priority': ['group', 'actor', 'organization', 'team', 'gang'],
-            'low_priority': ['attacker', 'adversary']
-        },
-        'incident': {
-            'high_priority': ['breach', 'data breach', 'incident', 'intrusion', 'compromise', 'attack'],
-            'medium_priority': ['alert', 'warning', 'advisory', 'report'],
-            'low_priority': ['event', 'activity']
-        }
-    }
-    
-    # Calculate threat score with weighted indicators
-    threat_score = 0
-    category_scores = {}
-    
-    for category, priority_indicators in threat_indicators.items():
-        category_score = 0
-        for priority, indicators in priority_indicators.items():
-            weight = {'high_priority': 3, 'medium_priority': 2, 'low_priority': 1}[priority]
-            matches = sum(1 for indicator in indicators if indicator in text)
-            category_score += matches * weight
-        
-        category_scores[category] = category_score
-        threat_score += category_score
+    # Calculate threat score with weighted indicators in a single pass
+    category_scores = KEYWORD_MATCHER.score(text)
+    threat_score = sum(category_scores.values())
     
     # Determine if it's a threat report (threshold-based)
     is_threat = threat_score >= 2  # At least 2 points to be considered a threat
@@ -396,130 +637,683 @@ def classify_with_rules(title: str, content: str) -> Dict[str, Any]:
     }
 
 
+# Object name patterns per category, in priority order; the first group is the name.
+# Patterns that start with a word are anchored at a word boundary, which finds the
+# same leftmost match without retrying \w+ from every character inside each word.
+OBJECT_PATTERNS = {
+    'malware': [
+        r'\b(\w+)\s+(ransomware|trojan|virus|backdoor|rootkit|worm|botnet)',
+        r'(ransomware|trojan|virus|backdoor|rootkit|worm|botnet)\s+(\w+)',
+        r'\b(\w+)\s+(malware|malicious)',
+    ],
+    'vulnerability': [
+        r'(cve-\d{4}-\d+)',
+        r'\b(\w+)\s+(vulnerability|exploit|flaw)',
+        r'(zero-day|zero day)\s+(\w+)',
+    ],
+    'tool': [
+        r'(cobalt strike|metasploit|nmap|wireshark|burp suite)',
+        r'(fortinet|fortigate|fortisandbox|forticnapp)',
+        r'\b(\w+)\s+(tool|framework|software)',
+    ],
+    'technique': [
+        r'(phishing|spear phishing|social engineering|ddos|dos|man-in-the-middle|mitm)',
+        r'\b(\w+)\s+(attack|technique|method)',
+    ],
+    'actor': [
+        r'(apt\d+|apt-\d+)',
+        r'\b(\w+)\s+(group|actor|organization)',
+        r'(threat actor|cybercriminal|hacker group)',
+    ],
+    'incident': [
+        r'\b(\w+)\s+(breach|incident|intrusion|compromise)',
+        r'(data breach|security incident)',
+    ]
+}
+
+COMPILED_OBJECT_PATTERNS = {
+    category: [re.compile(pattern) for pattern in patterns]
+    for category, patterns in OBJECT_PATTERNS.items()
+}
+
+
 def extract_specific_object(text: str, category: str, title: str) -> str:
     """
     Extract specific object name based on category and context.
-    """
-    # Common patterns for each category
-    patterns = {
-        'malware': [
-            r'(\w+)\s+(ransomware|trojan|virus|backdoor|rootkit|worm|botnet)',
-            r'(ransomware|trojan|virus|backdoor|rootkit|worm|botnet)\s+(\w+)',
-            r'(\w+)\s+(malware|malicious)',
-        ],
-        'vulnerability': [
-            r'(cve-\d{4}-\d+)',
-            r'(\w+)\s+(vulnerability|exploit|flaw)',
-            r'(zero-day|zero day)\s+(\w+)',
-        ],
-        'tool': [
-            r'(cobalt strike|metasploit|nmap|wireshark|burp suite)',
-            r'(fortinet|fortigate|fortisandbox|forticnapp)',
-            r'(\w+)\s+(tool|framework|software)',
-        ],
-        'technique': [
-            r'(phishing|spear phishing|social engineering|ddos|dos|man-in-the-middle|mitm)',
-            r'(\w+)\s+(attack|technique|method)',
-        ],
-        'actor': [
-            r'(apt\d+|apt-\d+)',
-            r'(\w+)\s+(group|actor|organization)',
-            r'(threat actor|cybercriminal|hacker group)',
-        ],
-        'incident': [
-            r'(\w+)\s+(breach|incident|intrusion|compromise)',
-            r'(data breach|security incident)',
-        ]
-    }
     
-    import re
-    
-    # Try to extract from title first (more likely to contain specific names)
-    title_lower = title.lower()
-    
-    if category in patterns:
-        for pattern in patterns[category]:
-            match = re.search(pattern, title_lower)
-            if match:
-                # Extract the most specific part
-                groups = match.groups()
-                if len(groups) == 2:
-                    # Return the more specific part (usually the first group)
-                    return groups[0].title()
-                else:
-                    return groups[0].title()
-    
-    # Fallback: extract from text
-    if category in patterns:
-        for pattern in patterns[category]:
-            match = re.search(pattern, text)
-            if match:
-                groups = match.groups()
-                if len(groups) == 2:
-                    return groups[0].title()
-                else:
-                    return groups[0].title()
+    text is expected in lower case. The title is tried first (more likely to
+    contain specific names), then the text; within each, patterns are tried
+    in priority order and the first match wins.
+    """
+    patterns = COMPILED_OBJECT_PATTERNS.get(category)
+    if patterns:
+        for source in (title.lower(), text):
+            for pattern in patterns:
+                match = pattern.search(source)
+                if match:
+                    # The first group holds the most specific part
+                    return match.group(1).title()
     
     # Final fallback: return category name
     return category.title()
 
 
-def process_data(data: List[Dict[str, Any]], model_info: Dict = None) -> List[Dict[str, Any]]:
+def extract_specific_objects(texts: List[str], categories: List[str], titles: List[str]) -> List[str]:
     """
-    Process all articles using enhanced rule-based classification for speed and accuracy.
+    Batch version of extract_specific_object over many articles.
     """
-    print(f"🔍 Processing {len(data)} articles with enhanced rule-based classification...")
+    return [extract_specific_object(text, category, title)
+            for text, category, title in zip(texts, categories, titles)]
+
+
+def classify_record(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Classify a single article and build its result record.
+    """
+    title = item.get('title', '')
+    link = item.get('link', '')
+    content = item.get('content', '')
     
-    results = []
-    threat_reports = 0
-    non_threat_reports = 0
+    # Use rule-based classification only
+    with METRICS.stage('rules'):
+        classification = classify_with_rules(title, content)
+    
+    # Create result object with detailed information
+    return {
+        "title": title,
+        "link": link,
+        "is_threat_report": classification["is_threat_report"],
+        "main_object": classification["main_object"],
+        "confidence": classification.get("confidence", 0.5),
+        "classification_method": "rules",
+        "threat_score": classification.get("threat_score", 0),
+        "category_scores": classification.get("category_scores", {})
+    }
+
+
+# Fast TF-IDF + logistic regression tier, trained on saved rule/LLM outputs
+FAST_MODEL_PATH = os.getenv('FAST_MODEL_PATH', 'data/models/fast_threat_classifier.pkl')
+
+
+def _as_bool(value: Any) -> bool:
+    """
+    Saved LLM outputs store is_threat_report as 'True'/'False' strings.
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1')
+    return bool(value)
+
+
+def load_training_examples(label_files: List[str], corpus: List[Dict[str, Any]]) -> Tuple[List[str], List[bool], List[str]]:
+    """
+    Build (texts, threat labels, categories) from saved classification outputs.
+    
+    Outputs without their own content are joined to the corpus by link, then by title.
+    Non-threat examples get an empty category.
+    """
+    by_link = {item.get('link'): item for item in corpus if item.get('link')}
+    by_title = {item.get('title'): item for item in corpus if item.get('title')}
     
-    for i, item in enumerate(data):
-        print(f"Processing {i+1}/{len(data)}: {item.get('title', 'Unknown')[:50]}...")
+    texts, labels, categories = [], [], []
+    skipped = 0
+    for label_file in label_files:
+        with open(label_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
         
-        title = item.get('title', '')
-        link = item.get('link', '')
-        content = item.get('content', '')
+        for record in records:
+            title = record.get('title', '')
+            content = record.get('content')
+            if not content:
+                source = by_link.get(record.get('link')) or by_title.get(title) or {}
+                content = source.get('content')
+            if not content:
+                skipped += 1
+                continue
+            
+            is_threat = _as_bool(record.get('is_threat_report'))
+            main_object = record.get('main_object') or ''
+            category = main_object.split(':')[0].strip().lower() if is_threat and ':' in main_object else ''
+            
+            texts.append(f"{title} {content}")
+            labels.append(is_threat)
+            categories.append(category)
+    
+    print(f"📚 Loaded {len(texts)} training examples from {len(label_files)} file(s) ({skipped} without content skipped)")
+    return texts, labels, categories
+
+
+def train_fast_classifier(texts: List[str], labels: List[bool], categories: List[str],
+                          max_features: int = 50000, ngram_range: Tuple[int, int] = (1, 1),
+                          holdout: float = 0.2) -> Dict[str, Any]:
+    """
+    Fit a TF-IDF vectorizer plus threat and category logistic regressions.
+    
+    Both models are folded into one weight matrix (threat logit in column 0,
+    category logits after it) so inference is a single sparse matrix multiply.
+    A classification report on a held-out split is printed before refitting
+    on all examples. Unigrams are the default: bigrams roughly halve
+    vectorizer throughput for little gain on these long articles.
+    """
+    if len(set(labels)) < 2:
+        raise ValueError("Training data needs both threat and non-threat examples")
+    
+    def fit(train_idx):
+        vectorizer = TfidfVectorizer(
+            lowercase=True,
+            sublinear_tf=True,
+            ngram_range=ngram_range,
+            min_df=2,
+            max_features=max_features,
+            dtype=np.float32
+        )
+        X = vectorizer.fit_transform([texts[i] for i in train_idx])
+        y = np.array([labels[i] for i in train_idx])
+        threat_model = LogisticRegression(max_iter=1000, class_weight='balanced').fit(X, y)
         
-        # Use rule-based classification only
-        classification = classify_with_rules(title, content)
+        threat_rows = [row for row, i in enumerate(train_idx) if labels[i] and categories[i]]
+        category_names = sorted({categories[train_idx[row]] for row in threat_rows})
+        weights = [threat_model.coef_[0]]
+        bias = [threat_model.intercept_[0]]
         
-        if classification["is_threat_report"]:
-            threat_reports += 1
+        if len(category_names) > 1:
+            category_model = LogisticRegression(max_iter=1000, class_weight='balanced').fit(
+                X[threat_rows], [categories[train_idx[row]] for row in threat_rows]
+            )
+            category_names = [str(name) for name in category_model.classes_]
+            if len(category_names) == 2:
+                # Binary models keep one logit for classes_[1]; split it symmetrically
+                # so the softmax over both columns matches predict_proba
+                half_coef, half_bias = category_model.coef_[0] / 2, category_model.intercept_[0] / 2
+                weights += [-half_coef, half_coef]
+                bias += [-half_bias, half_bias]
+            else:
+                weights += list(category_model.coef_)
+                bias += list(category_model.intercept_)
         else:
-            non_threat_reports += 1
+            # Zero logits: the single (or unknown) category always wins
+            category_names = category_names or ['unknown']
+            weights.append(np.zeros_like(threat_model.coef_[0]))
+            bias.append(0.0)
         
-        # Create result object with detailed information
-        result = {
-            "title": title,
-            "link": link,
-            "is_threat_report": classification["is_threat_report"],
-            "main_object": classification["main_object"],
-            "confidence": classification.get("confidence", 0.5),
-            "classification_method": "rules",
-            "threat_score": classification.get("threat_score", 0),
-            "category_scores": classification.get("category_scores", {})
+        return {
+            'vectorizer': vectorizer,
+            'weights': np.ascontiguousarray(np.array(weights, dtype=np.float32).T),
+            'bias': np.array(bias, dtype=np.float32),
+            'categories': category_names
         }
+    
+    indices = list(range(len(texts)))
+    if holdout and len(texts) >= 20:
+        rng = np.random.default_rng(42)
+        shuffled = rng.permutation(indices).tolist()
+        split = int(len(shuffled) * (1 - holdout))
+        train_idx, test_idx = shuffled[:split], shuffled[split:]
+        if len({labels[i] for i in train_idx}) == 2:
+            model = fit(train_idx)
+            predicted = predict_fast([texts[i] for i in test_idx], model)
+            print("📏 Held-out threat classification report:")
+            print(classification_report(
+                [labels[i] for i in test_idx],
+                [p['is_threat_report'] for p in predicted],
+                zero_division=0
+            ))
+    
+    model = fit(indices)
+    model.update({
+        'classifier_version': CLASSIFIER_VERSION,
+        'trained_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'n_train': len(texts),
+        'fingerprint': hashlib.sha256(model['weights'].tobytes() + model['bias'].tobytes()).hexdigest()[:16]
+    })
+    print(f"✅ Trained fast classifier on {len(texts)} examples "
+          f"({model['weights'].shape[0]} features, categories: {', '.join(model['categories'])})")
+    return model
+
+
+def save_fast_classifier(model: Dict[str, Any], path: str = FAST_MODEL_PATH):
+    """
+    Persist the fitted vectorizer and weights with pickle.
+    """
+    output_path = Path(path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'wb') as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"💾 Saved fast classifier to {output_path}")
+
+
+def load_fast_classifier(path: str = FAST_MODEL_PATH) -> Dict[str, Any]:
+    """
+    Load a classifier written by save_fast_classifier.
+    """
+    with open(path, 'rb') as f:
+        model = pickle.load(f)
+    print(f"📦 Loaded fast classifier from {path} (trained {model.get('trained_at')} on {model.get('n_train')} examples)")
+    return model
+
+
+def predict_fast(texts: List[str], model: Dict[str, Any], threshold: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Threat probability and category probabilities for every text in one pass.
+    """
+    if not texts:
+        return []
+    
+    with METRICS.stage('tfidf_vectorize'):
+        X = model['vectorizer'].transform(texts)
+    with METRICS.stage('tfidf_predict'):
+        logits = np.asarray(X @ model['weights']) + model['bias']
+    
+    threat_prob = 1.0 / (1.0 + np.exp(-logits[:, 0]))
+    category_logits = logits[:, 1:]
+    category_logits = category_logits - category_logits.max(axis=1, keepdims=True)
+    category_prob = np.exp(category_logits)
+    category_prob /= category_prob.sum(axis=1, keepdims=True)
+    
+    categories = model['categories']
+    predictions = []
+    for p_threat, p_categories in zip(threat_prob.tolist(), category_prob.tolist()):
+        predictions.append({
+            'is_threat_report': p_threat >= threshold,
+            'threat_probability': p_threat,
+            'category_scores': {name: round(p, 4) for name, p in zip(categories, p_categories)}
+        })
+    return predictions
+
+
+def classify_with_fast_model(items: List[Dict[str, Any]], model: Dict[str, Any],
+                             threshold: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Classify a batch of articles with the fast model, in the process_data result schema.
+    """
+    texts = [f"{item.get('title', '')} {item.get('content', '')}" for item in items]
+    predictions = predict_fast(texts, model, threshold)
+    
+    # Object names are only needed for the predicted threats
+    positives = [i for i, prediction in enumerate(predictions) if prediction['is_threat_report']]
+    categories = {i: max(predictions[i]['category_scores'].items(), key=lambda x: x[1])[0] for i in positives}
+    objects = dict(zip(positives, extract_specific_objects(
+        [texts[i].lower() for i in positives],
+        [categories[i] for i in positives],
+        [items[i].get('title', '') for i in positives]
+    )))
+    
+    results = []
+    for i, (item, prediction) in enumerate(zip(items, predictions)):
+        title = item.get('title', '')
+        p_threat = prediction['threat_probability']
         
-        results.append(result)
+        if prediction['is_threat_report']:
+            main_object = f"{categories[i].title()}: {objects[i]}"
+            confidence = p_threat
+        else:
+            main_object = ''
+            confidence = 1.0 - p_threat
         
-        # Print progress every 25 items for more frequent updates
-        if (i + 1) % 25 == 0:
-            print(f"  Processed {i+1}/{len(data)} articles")
-            print(f"    Threat reports: {threat_reports}, Non-threat: {non_threat_reports}")
+        results.append({
+            "title": title,
+            "link": item.get('link', ''),
+            "is_threat_report": prediction['is_threat_report'],
+            "main_object": main_object,
+            "confidence": round(confidence, 4),
+            "classification_method": "tfidf_logreg",
+            "threat_score": round(p_threat, 4),
+            "category_scores": prediction['category_scores']
+        })
+    return results
+
+
+def cascade_band() -> Tuple[float, float]:
+    """
+    Rule threat_score range (inclusive) whose articles are sent to the LLM.
+    
+    Rule scores are summed keyword weights, so they grow with article length;
+    the default band covers the weakly positive articles where the saved LLM
+    labels most often disagree with the rules.
+    """
+    return (float(os.getenv('CASCADE_MIN_SCORE', '1')),
+            float(os.getenv('CASCADE_MAX_SCORE', '27')))
+
+
+def classify_cascade(items: List[Dict[str, Any]], model_info: Dict,
+                     band: Tuple[float, float] = None, chunked: bool = False,
+                     batch_size: int = None) -> List[Dict[str, Any]]:
+    """
+    Classify articles with rules first and the batched LLM only where rules are unsure.
+    
+    Articles whose rule threat_score lies inside band are classified by the
+    LLM in one batched call; all others keep their rule result. decided_by
+    records the tier that produced each result ('rules', 'llm', or
+    'rules_fallback' when the LLM gave no usable answer).
+    """
+    low, high = band or cascade_band()
+    results = [dict(classify_record(item), classification_method="cascade", decided_by="rules")
+               for item in items]
+    uncertain = [i for i, result in enumerate(results) if low <= result['threat_score'] <= high]
+    
+    if uncertain and model_info is not None:
+        print(f"🎚️ Cascade: {len(uncertain)}/{len(items)} articles in score band [{low:g}, {high:g}] go to the LLM")
+        articles = [(items[i].get('title', ''), items[i].get('content', '')) for i in uncertain]
+        classify_llm = classify_chunked_with_mistral if chunked else classify_batch_with_mistral
         
-        # Memory cleanup every 100 items
-        if (i + 1) % 100 == 0:
-            gc.collect()
+        for i, llm_result in zip(uncertain, classify_llm(articles, model_info, batch_size)):
+            # The LLM helpers fall back to rules per row; only real answers carry a response or votes
+            if 'mistral_response' not in llm_result and 'windows' not in llm_result:
+                results[i]['decided_by'] = "rules_fallback"
+                continue
+            
+            results[i].update({
+                "is_threat_report": llm_result["is_threat_report"],
+                "main_object": llm_result["main_object"],
+                "confidence": llm_result.get("confidence", 0.5),
+                "decided_by": "llm"
+            })
+            for key in ('mistral_response', 'windows', 'threat_votes'):
+                if key in llm_result:
+                    results[i][key] = llm_result[key]
+    
+    return results
+
+
+def classification_settings(model_info: Dict = None, fast_model: Dict = None,
+                            cascade: Dict = None) -> Dict[str, Any]:
+    """
+    Everything besides the article itself that can change a classification result.
+    """
+    settings = {
+        'classifier_version': CLASSIFIER_VERSION,
+        'rules': RULES_FINGERPRINT
+    }
+    if model_info is not None:
+        settings.update({
+            'model_name': model_info.get('model_name', model_info.get('model_type')),
+            'max_length': os.getenv('MAX_LENGTH', '3000'),
+            'max_tokens': os.getenv('MAX_TOKENS', '200'),
+            'temperature': os.getenv('TEMPERATURE', '0.1'),
+            # Batch composition changes padding, which can change greedy outputs
+            'batch_size': os.getenv('BATCH_SIZE', '8'),
+            'max_batch_tokens': os.getenv('MAX_BATCH_TOKENS', '16384')
+        })
+        if cascade is not None and cascade.get('chunked'):
+            settings.update({
+                'chunk_tokens': os.getenv('CHUNK_TOKENS', '512'),
+                'chunk_overlap': os.getenv('CHUNK_OVERLAP', '64'),
+                'max_chunks_per_doc': os.getenv('MAX_CHUNKS_PER_DOC', '8'),
+                'chunk_min_confidence': os.getenv('CHUNK_MIN_CONFIDENCE', '0.7')
+            })
+    if fast_model is not None:
+        settings['fast_model'] = fast_model['fingerprint']
+    if cascade is not None:
+        settings['cascade'] = cascade
+    return settings
+
+
+def iter_classified(data: List[Dict[str, Any]], classify, cache: ClassificationCache = None,
+                    settings: Dict[str, Any] = None, dedup: DuplicateIndex = None):
+    """
+    Yield one result per article in input order, classifying only cache misses.
+    
+    classify maps an iterable of articles to an iterable of result records
+    (serially or through a process pool). With a duplicate index, exact and
+    near-duplicates of an earlier article are not classified but inherit the
+    result of their cluster representative.
+    """
+    if dedup is None:
+        yield from iter_cached(data, classify, cache, settings)
+        return
+    
+    with METRICS.stage('dedup'):
+        clusters = [dedup.add(item) for item in data]
+    representatives = [item for item, (_, kind) in zip(data, clusters) if kind is None]
+    fresh = iter(iter_cached(representatives, classify, cache, settings))
+    
+    for item, (representative, kind) in zip(data, clusters):
+        if kind is None:
+            result = next(fresh)
+            dedup.keep_result(representative, result)
+            yield result
+        else:
+            source = dedup.results[representative]
+            yield dict(source, title=item.get('title', ''), link=item.get('link', ''),
+                       duplicate_of=source['link'], duplicate_kind=kind)
+
+
+def iter_cached(data: List[Dict[str, Any]], classify, cache: ClassificationCache = None,
+                settings: Dict[str, Any] = None):
+    """
+    Yield one result per article in input order, classifying only cache misses.
+    
+    Cascade results that fell back to rules after an LLM failure are not cached.
+    """
+    if cache is None:
+        yield from classify(data)
+        return
+    
+    with METRICS.stage('cache_lookup'):
+        keys = [ClassificationCache.make_key(item.get('title', ''), item.get('content', ''), settings)
+                for item in data]
+        cached = [cache.get(key) for key in keys]
+    fresh = iter(classify([item for item, hit in zip(data, cached) if hit is None]))
+    
+    for item, key, hit in zip(data, keys, cached):
+        if hit is None:
+            result = next(fresh)
+            # A rules fallback stands in for a failed LLM call; leave it uncached so a later run asks again
+            if result.get('decided_by') != "rules_fallback":
+                cache.put(key, result)
+            yield result
+        else:
+            # Identical articles may be published under several links
+            yield dict(hit, title=item.get('title', ''), link=item.get('link', ''))
+
+
+def timed_classify_record(item: Dict[str, Any]) -> Tuple[Dict[str, Any], float, Dict[str, Dict[str, float]]]:
+    """
+    classify_record plus its duration and stage timings, measured where it runs (also in pool workers).
+    """
+    # A worker's own collector is never reported, so its stages travel back with the result
+    with METRICS.capture() as stages:
+        start = time.perf_counter()
+        result = classify_record(item)
+        seconds = time.perf_counter() - start
+    return result, seconds, stages
+
+
+def record_latencies(timed_results):
+    """
+    Yield the results of timed_classify_record, recording each duration as the article's latency
+    and merging its stage timings into this process's metrics.
+    """
+    for result, seconds, stages in timed_results:
+        METRICS.add_latency(seconds)
+        METRICS.merge_stages(stages)
+        yield result
+
+
+def timed_batches(classify_batch):
+    """
+    Wrap a batch classifier so each call's duration is the latency of every article in it.
+    """
+    def classify(items):
+        items = list(items)
+        if not items:
+            return []
+        start = time.perf_counter()
+        results = classify_batch(items)
+        METRICS.add_latency(time.perf_counter() - start, len(items))
+        return results
+    return classify
+
+
+def make_classifier(workers: int, chunk_size: int, batch_len: int, fast_model: Dict = None,
+                    model_info: Dict = None, cascade: Dict = None):
+    """
+    Return (executor, classify) where classify maps articles to result records.
+    
+    With workers > 1 the work runs in a process pool; executor is None otherwise.
+    A fast model classifies each batch in one vectorised call and ignores workers,
+    as does the cascade, which batches its uncertain articles through the LLM.
+    """
+    if fast_model is not None:
+        return None, timed_batches(lambda items: classify_with_fast_model(items, fast_model))
+    
+    if cascade is not None:
+        return None, timed_batches(lambda items: classify_cascade(
+            items, model_info, tuple(cascade['band']), cascade['chunked']
+        ))
+    
+    if workers <= 1:
+        return None, lambda items: record_latencies(map(timed_classify_record, items))
+    
+    if chunk_size is None:
+        # A few chunks per worker keeps the pool balanced without per-item IPC
+        chunk_size = max(1, batch_len // (workers * 4))
+    print(f"⚡ Using {workers} worker processes (chunk size {chunk_size})")
+    executor = ProcessPoolExecutor(max_workers=workers)
+    return executor, lambda items: record_latencies(
+        executor.map(timed_classify_record, items, chunksize=chunk_size)
+    )
+
+
+def process_data(data: List[Dict[str, Any]], model_info: Dict = None, workers: int = 1,
+                 chunk_size: int = None, cache: ClassificationCache = None,
+                 fast_model: Dict = None, cascade: Dict = None,
+                 dedup: DuplicateIndex = None) -> List[Dict[str, Any]]:
+    """
+    Process all articles using enhanced rule-based classification for speed and accuracy.
+    
+    With workers > 1 the articles are sharded across a process pool in chunks;
+    results come back in input order, so the output matches the serial path.
+    When a cache is given, only articles without a cached result are classified.
+    With a fast model the TF-IDF classifier replaces the rules; with cascade
+    settings ({'band': [low, high], 'chunked': bool}) rules run first and
+    articles in the uncertain score band go to the LLM in model_info.
+    With a duplicate index, duplicates inherit their representative's result.
+    """
+    if fast_model is not None:
+        method = "fast TF-IDF"
+    elif cascade is not None:
+        method = "cascade rules → LLM"
+    else:
+        method = "enhanced rule-based"
+    print(f"🔍 Processing {len(data)} articles with {method} classification...")
+    
+    results = []
+    threat_reports = 0
+    non_threat_reports = 0
+    
+    executor, classify = make_classifier(workers, chunk_size, len(data), fast_model, model_info, cascade)
+    settings = classification_settings(model_info if cascade is not None else None, fast_model, cascade)
+    classified = iter_classified(data, classify, cache, settings, dedup)
+    
+    try:
+        for i, result in enumerate(classified):
+            METRICS.result_done()
+            print(f"Processing {i+1}/{len(data)}: {data[i].get('title', 'Unknown')[:50]}...")
+            
+            if result["is_threat_report"]:
+                threat_reports += 1
+            else:
+                non_threat_reports += 1
+            
+            results.append(result)
+            
+            # Print progress every 25 items for more frequent updates
+            if (i + 1) % 25 == 0:
+                print(f"  Processed {i+1}/{len(data)} articles")
+                print(f"    Threat reports: {threat_reports}, Non-threat: {non_threat_reports}")
+            
+            # Memory cleanup every 100 items (workers manage their own heaps)
+            if executor is None and (i + 1) % 100 == 0:
+                gc.collect()
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
     print(f"\n📊 Classification Summary:")
     print(f"   - Threat reports: {threat_reports}")
     print(f"   - Non-threat reports: {non_threat_reports}")
     print(f"   - Threat percentage: {(threat_reports/len(data)*100):.1f}%")
+    if dedup is not None:
+        print(f"   - Duplicates skipped: {dedup.exact_duplicates} exact, {dedup.near_duplicates} near")
+    if cache is not None:
+        print(f"   - Cache hits: {cache.hits}, misses: {cache.misses}")
     
     return results
 
 
+def process_stream(input_file: str, output_file: str, workers: int = 1, chunk_size: int = None,
+                   cache: ClassificationCache = None, block_size: int = 1000,
+                   fsync_every: int = 100, restart: bool = False,
+                   fast_model: Dict = None, model_info: Dict = None,
+                   cascade: Dict = None, dedup: DuplicateIndex = None,
+                   filters: Dict[str, Any] = None) -> Dict[str, int]:
+    """
+    Classify articles record by record and append results to a JSONL file.
+    
+    Input is read incrementally (JSONL, JSON array or an article store
+    directory narrowed by filters) in blocks of block_size, so memory stays
+    flat regardless of corpus size. An existing output file is
+    resumed after its last complete record unless restart is set. Duplicate
+    detection only covers the records read in this run.
+    """
+    done = 0 if restart else recover_jsonl(output_file)
+    if done:
+        print(f"⏩ Resuming after {done} already classified articles in {output_file}")
+    
+    print(f"🔍 Streaming articles from {input_file} to {output_file}...")
+    
+    records = itertools.islice(iter_input(input_file, **(filters or {})), done, None)
+    executor, classify = make_classifier(workers, chunk_size, block_size, fast_model, model_info, cascade)
+    settings = classification_settings(model_info if cascade is not None else None, fast_model, cascade)
+    
+    processed = 0
+    threat_reports = 0
+    non_threat_reports = 0
+    
+    try:
+        with JsonlWriter(output_file, fsync_every=fsync_every, append=not restart) as writer:
+            while True:
+                block = list(itertools.islice(records, block_size))
+                if not block:
+                    break
+                
+                for item, result in zip(block, iter_classified(block, classify, cache, settings, dedup)):
+                    METRICS.result_done()
+                    processed += 1
+                    print(f"Processing {done + processed}: {item.get('title', 'Unknown')[:50]}...")
+                    
+                    with METRICS.stage('save'):
+                        writer.write(result)
+                    if result["is_threat_report"]:
+                        threat_reports += 1
+                    else:
+                        non_threat_reports += 1
+                    
+                    # Print progress every 25 items for more frequent updates
+                    if processed % 25 == 0:
+                        print(f"  Processed {done + processed} articles")
+                        print(f"    Threat reports: {threat_reports}, Non-threat: {non_threat_reports}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    print(f"\n📊 Classification Summary (this run):")
+    print(f"   - Newly classified: {processed} (resumed after {done})")
+    print(f"   - Threat reports: {threat_reports}")
+    print(f"   - Non-threat reports: {non_threat_reports}")
+    if dedup is not None:
+        print(f"   - Duplicates skipped: {dedup.exact_duplicates} exact, {dedup.near_duplicates} near")
+    if cache is not None:
+        print(f"   - Cache hits: {cache.hits}, misses: {cache.misses}")
+    
+    return {
+        'resumed_after': done,
+        'processed': processed,
+        'threat_reports': threat_reports,
+        'non_threat_reports': non_threat_reports
+    }
+
+
 def save_results(results: List[Dict[str, Any]], output_file: str = None):
     """
     Save classification results to JSON file with automatic directory creation.
@@ -539,7 +1333,7 @@ def save_results(results: List[Dict[str, Any]], output_file: str = None):
         
         print(f"💾 Saving to: {absolute_path}")
         
-        with open(absolute_path, 'w', encoding='utf-8') as f:
+        with METRICS.stage('save'), open(absolute_path, 'w', encoding='utf-8') as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
         
         print(f"✅ Successfully saved results to {output_file}")
@@ -590,15 +1384,76 @@ def save_results(results: List[Dict[str, Any]], output_file: str = None):
         print(f"   Current working directory: {os.getcwd()}")
 
 
+def parse_args():
+    """
+    Parse command line options for the classification pipeline.
+    """
+    parser = argparse.ArgumentParser(description="Classify threat intelligence articles")
+    parser.add_argument('--input', default=None,
+                        help="Input JSON array or JSONL file, or an article store directory "
+                             "(default: merged_threat_intelligence.json under data/)")
+    parser.add_argument('--source', default=None,
+                        help="Only articles from this source (article store input)")
+    parser.add_argument('--since', default=None,
+                        help="Only articles dated on or after YYYY-MM-DD (article store input)")
+    parser.add_argument('--until', default=None,
+                        help="Only articles dated on or before YYYY-MM-DD (article store input)")
+    parser.add_argument('--output', default=None,
+                        help="Output file (default: timestamped JSON, or a fixed JSONL path with --stream)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Stream records and append results to JSONL, resuming a previous run")
+    parser.add_argument('--restart', action='store_true',
+                        help="With --stream, overwrite the output instead of resuming it")
+    parser.add_argument('--block-size', type=int, default=1000,
+                        help="With --stream, number of records held in memory at once")
+    parser.add_argument('--fsync-every', type=int, default=100,
+                        help="With --stream, fsync the output every N records")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes for classification (default: 1, serial)")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help="Articles per task sent to each worker (default: auto)")
+    parser.add_argument('--cache', default=os.getenv('CLASSIFICATION_CACHE', 'data/cache/classification_cache.sqlite'),
+                        help="Path of the persistent classification result cache")
+    parser.add_argument('--cache-max-mb', type=int, default=int(os.getenv('CLASSIFICATION_CACHE_MAX_MB', '256')),
+                        help="Size budget of the result cache before LRU eviction (MB)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Classify every article from scratch without reading or writing the cache")
+    parser.add_argument('--method', choices=['rules', 'fast', 'cascade'], default='rules',
+                        help="Classifier to run: keyword rules, the trained TF-IDF model, "
+                             "or rules with the LLM for uncertain articles")
+    parser.add_argument('--band', type=float, nargs=2, metavar=('LOW', 'HIGH'), default=None,
+                        help="With --method cascade, rule threat_score range sent to the LLM "
+                             "(default: CASCADE_MIN_SCORE/CASCADE_MAX_SCORE or 1 27)")
+    parser.add_argument('--chunked', action='store_true',
+                        help="With --method cascade, classify uncertain articles from token windows")
+    parser.add_argument('--fast-model', default=FAST_MODEL_PATH,
+                        help="Path of the trained TF-IDF classifier")
+    parser.add_argument('--dedup', action='store_true',
+                        help="Classify only one article per exact/near-duplicate cluster; "
+                             "duplicates inherit its result")
+    parser.add_argument('--dedup-threshold', type=float, default=0.85,
+                        help="Estimated Jaccard similarity of word shingles above which articles are near-duplicates")
+    parser.add_argument('--metrics', default=None,
+                        help="Write per-stage timing, throughput, latency and peak RSS to this JSON file")
+    parser.add_argument('--prometheus', default=None,
+                        help="Also write the metrics in Prometheus text format (needs prometheus-client)")
+    parser.add_argument('--train-fast', nargs='+', metavar='LABELS', default=None,
+                        help="Train the TF-IDF classifier from saved classification outputs and exit")
+    return parser.parse_args()
+
+
 def main():
     """
     Main function to run the classification pipeline using rule-based classification.
     """
+    args = parse_args()
+    METRICS.reset()
+    
     print("🔍 THREAT INTELLIGENCE CLASSIFICATION WITH ENHANCED RULES")
     print("="*60)
     
     # Input file path - try multiple locations
-    input_files = [
+    input_files = [args.input] if args.input else [
         "data/raw/merged_threat_intelligence.json",
         "data/processed/merged_threat_intelligence.json"
     ]
@@ -615,17 +1470,75 @@ def main():
             print(f"   - {file_path}")
         return
     
-    # Load data
-    data = load_data(input_file)
-    if not data:
+    # Article store filters (empty when every article is wanted)
+    filters = {name: value for name, value in
+               (('source', args.source), ('since', args.since), ('until', args.until)) if value is not None}
+    
+    if args.train_fast:
+        # Label files without content are joined to the input corpus
+        texts, labels, categories = load_training_examples(args.train_fast, load_data(input_file, filters))
+        save_fast_classifier(train_fast_classifier(texts, labels, categories), args.fast_model)
         return
     
-    # Process data using rule-based classification only
-    print("🚀 Using enhanced rule-based classification for speed and accuracy...")
-    results = process_data(data)
+    fast_model = load_fast_classifier(args.fast_model) if args.method == 'fast' else None
+    
+    dedup = DuplicateIndex(threshold=args.dedup_threshold) if args.dedup else None
+    
+    model_info = None
+    cascade = None
+    if args.method == 'cascade':
+        cascade = {'band': list(args.band or cascade_band()), 'chunked': args.chunked}
+        model_info = setup_model()
+        if model_info is None:
+            print("⚠️ No LLM available - the cascade will keep every rule result")
+    
+    cache = None
+    if not args.no_cache:
+        cache = ClassificationCache(args.cache, max_bytes=args.cache_max_mb * 1024 * 1024)
+        print(f"🗃️ Using result cache: {args.cache} ({len(cache)} entries)")
+    
+    try:
+        if args.stream:
+            output_file = args.output or "data/topic-classification/rule_base_annotated_data_topic_classification.jsonl"
+            print("🚀 Streaming enhanced rule-based classification...")
+            process_stream(
+                input_file,
+                output_file,
+                workers=args.workers,
+                chunk_size=args.chunk_size,
+                cache=cache,
+                block_size=args.block_size,
+                fsync_every=args.fsync_every,
+                restart=args.restart,
+                fast_model=fast_model,
+                model_info=model_info,
+                cascade=cascade,
+                dedup=dedup,
+                filters=filters
+            )
+        else:
+            # Load data
+            data = load_data(input_file, filters)
+            if not data:
+                return
+            
+            # Process data using rule-based classification only
+            print("🚀 Using enhanced rule-based classification for speed and accuracy...")
+            results = process_data(data, model_info=model_info, workers=args.workers,
+                                   chunk_size=args.chunk_size, cache=cache,
+                                   fast_model=fast_model, cascade=cascade, dedup=dedup)
+            
+            # Save results
+            save_results(results, args.output)
+    finally:
+        if cache is not None:
+            cache.close()
     
-    # Save results
-    save_results(results)
+    METRICS.print_summary()
+    if args.metrics:
+        METRICS.save_json(args.metrics)
+    if args.prometheus:
+        METRICS.save_prometheus(args.prometheus)
     
     print("\n✅ Classification completed successfully!")
 
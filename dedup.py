@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Exact and near-duplicate detection for article corpora.
+
+Exact duplicates share a hash of their whitespace-normalised content.
+Near-duplicates (reposts that differ only in boilerplate) are found with
+MinHash signatures over word shingles and banded locality-sensitive
+hashing, then confirmed by their estimated Jaccard similarity. Only the
+first article of every cluster (its representative) is kept in the index,
+as its signature and the labels its duplicates inherit (no title, content
+or raw model output), so memory grows by a few kilobytes per distinct
+article, mostly for the LSH buckets.
+"""
+
+import re
+import zlib
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+
+# Multiplier for combining word hashes into shingle hashes
+_SHINGLE_BASE = np.uint64(1000003)
+_WORD_PATTERN = re.compile(r'\w+')
+
+# Result fields a duplicate does not inherit: its own title, and raw model output
+_NOT_INHERITED = ('title', 'mistral_response')
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash of the text with case and whitespace differences removed.
+    """
+    normalised = ' '.join(text.lower().split())
+    return hashlib.sha256(normalised.encode('utf-8')).hexdigest()
+
+
+def shingle_hashes(text: str, shingle_size: int = 5) -> np.ndarray:
+    """
+    64-bit hashes of the distinct word shingles of a text.
+    
+    Words are hashed once and every shingle hash is a polynomial over its
+    word hashes, computed for all shingles at once.
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    word_hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words),
+                              dtype=np.uint64, count=len(words))
+    # Texts shorter than one shingle become a single shingle
+    size = max(1, min(shingle_size, len(words)))
+    count = max(1, len(words) - size + 1)
+    
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size if len(words) else 0):
+        hashes = hashes * _SHINGLE_BASE + word_hashes[offset:offset + count]
+    return np.unique(hashes)
+
+
+class DuplicateIndex:
+    """
+    Incremental index that maps every added article to the representative it duplicates.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128, bands: int = 16,
+                 shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Multiply-shift hash family: odd multipliers, arithmetic wraps modulo 2^64
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 63, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+
+        # Content hash -> (representative id, kind reported for later copies)
+        self.exact: Dict[str, Tuple[int, str]] = {}
+        self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self.signatures: Dict[int, np.ndarray] = {}
+        # Labels of representatives, filled in by the caller through keep_result
+        self.results: Dict[int, Dict[str, Any]] = {}
+        self.added = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        MinHash signature of a text (one minimum per permutation).
+        """
+        hashes = shingle_hashes(text, self.shingle_size)
+        return ((self.a * hashes + self.b) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+    def add(self, item: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+        """
+        Add an article and return (representative id, duplicate kind).
+
+        The kind is None for a new representative (whose id is returned),
+        otherwise 'exact' or 'near'. Articles without content are never merged.
+        """
+        item_id = self.added
+        self.added += 1
+
+        content = item.get('content') or ''
+        if not content.strip():
+            return item_id, None
+
+        digest = content_hash(content)
+        if digest in self.exact:
+            representative, kind = self.exact[digest]
+            if kind == 'exact':
+                self.exact_duplicates += 1
+            else:
+                self.near_duplicates += 1
+            return representative, kind
+
+        signature = self.signature(content)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        for candidate in sorted(candidates):
+            # Fraction of agreeing minima estimates the Jaccard similarity of the shingle sets
+            if np.mean(self.signatures[candidate] == signature) >= self.threshold:
+                self.exact[digest] = (candidate, 'near')
+                self.near_duplicates += 1
+                return candidate, 'near'
+
+        self.exact[digest] = (item_id, 'exact')
+        self.signatures[item_id] = signature
+        for bucket, key in zip(self.buckets, keys):
+            bucket.setdefault(key, []).append(item_id)
+        return item_id, None
+
+    def keep_result(self, representative: int, result: Dict[str, Any]):
+        """
+        Remember the part of a representative's result that its duplicates inherit.
+
+        Articles without content can have no duplicates, so nothing is kept for them.
+        """
+        if representative in self.signatures:
+            self.results[representative] = {key: value for key, value in result.items()
+                                            if key not in _NOT_INHERITED}
+
+
+def find_duplicates(data: List[Dict[str, Any]], threshold: float = 0.85) -> List[Tuple[int, Optional[str]]]:
+    """
+    (representative index, duplicate kind) for every article in data.
+    """
+    index = DuplicateIndex(threshold=threshold)
+    return [index.add(item) for item in data]
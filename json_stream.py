@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Streaming helpers for large JSON / JSONL record files.
+
+Records are read one at a time (JSONL line by line, JSON arrays through an
+incremental decoder) and results are appended to JSONL with periodic fsync,
+so memory stays flat and a crashed run can resume after the last full line.
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import Dict, Any, Iterator, IO
+
+
+def iter_json_array(f: IO[str], chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Incrementally decode the elements of a top-level JSON array from a text file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        # Skip whitespace and separators between elements
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+
+        if pos >= len(buffer):
+            buffer = f.read(chunk_size)
+            pos = 0
+            if not buffer:
+                raise ValueError("Unexpected end of JSON array")
+            continue
+
+        if not started:
+            if buffer[pos] != '[':
+                raise ValueError("Input is not a JSON array")
+            started = True
+            pos += 1
+            continue
+
+        if buffer[pos] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+            # A number at the edge of the buffer may have been cut short
+            # ("-1." decodes as -1), so require a delimiter after the value
+            complete = eof or (end < len(buffer) and buffer[end] in ' \t\r\n,]')
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+
+        if not complete:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        yield value
+        pos = end
+
+
+def iter_jsonl(f: IO[str]) -> Iterator[Any]:
+    """
+    Decode one JSON value per non-empty line.
+    """
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(input_file: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream records from a .jsonl file or a JSON array file.
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        if Path(input_file).suffix == '.jsonl':
+            yield from iter_jsonl(f)
+        else:
+            yield from iter_json_array(f)
+
+
+def recover_jsonl(output_file: str) -> int:
+    """
+    Count complete records in a JSONL file, dropping a trailing partial line.
+
+    Returns 0 if the file does not exist.
+    """
+    path = Path(output_file)
+    if not path.exists():
+        return 0
+
+    count = 0
+    last_newline = -1
+    offset = 0
+    with open(path, 'rb+') as f:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            newlines = chunk.count(b'\n')
+            if newlines:
+                count += newlines
+                last_newline = offset + chunk.rfind(b'\n')
+            offset += len(chunk)
+
+        if last_newline + 1 != offset:
+            # The last write was interrupted mid-record
+            f.truncate(last_newline + 1)
+
+    return count
+
+
+class JsonlWriter:
+    """
+    Append records to a JSONL file, fsyncing every fsync_every records.
+    """
+
+    def __init__(self, output_file: str, fsync_every: int = 100, append: bool = True):
+        path = Path(output_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(path, 'a' if append else 'w', encoding='utf-8')
+        self.fsync_every = fsync_every
+        self.written = 0
+
+    def write(self, record: Dict[str, Any]):
+        self.f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.written += 1
+        if self.fsync_every and self.written % self.fsync_every == 0:
+            self.sync()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def close(self):
+        self.sync()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
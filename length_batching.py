@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Length-sorted batching for padded generation.
+
+Prompts of similar token length are generated together, so little compute
+goes to padding. Shared by the classifier's LLM stage and the notebooks'
+entity extraction.
+"""
+
+from typing import List
+
+
+def make_length_batches(lengths: List[int], batch_size: int, max_batch_tokens: int) -> List[List[int]]:
+    """
+    Group indices into batches of similar length (shortest first).
+
+    A batch is closed when it reaches batch_size rows or when padding every row
+    to the longest prompt would exceed max_batch_tokens.
+    """
+    batches = []
+    current = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # Sorted ascending, so the incoming prompt is the longest in the batch
+        if current and (len(current) >= batch_size or (len(current) + 1) * lengths[index] > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
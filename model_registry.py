@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Process-wide registry of loaded Hugging Face causal LMs.
+
+Every (model, device, dtype) combination is loaded at most once per process
+and shared by all callers (classifier, fallback model, extraction helpers).
+Weights are loaded with low_cpu_mem_usage so safetensors checkpoints are
+memory-mapped instead of being copied into a randomly initialised model.
+"""
+
+import time
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+    import resource
+
+
+_MODELS: Dict[tuple, Dict[str, Any]] = {}
+# Models that failed to load (gated, missing) are not retried for FAILURE_TTL seconds
+_FAILED: Dict[tuple, Tuple[Exception, float]] = {}
+_LOCK = threading.Lock()
+
+FAILURE_TTL = 300.0
+
+# Failures worth retrying on the next request: memory pressure and network blips
+TRANSIENT_ERRORS = (MemoryError, torch.cuda.OutOfMemoryError, ConnectionError, TimeoutError)
+
+
+def resident_memory_mb() -> float:
+    """
+    Current resident set size of this process in MB.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    # Peak RSS is the best stdlib approximation (KB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_causal_lm(model_name: str, device: str, hf_token: Optional[str] = None,
+                   trust_remote_code: bool = False, torch_dtype=None) -> Dict[str, Any]:
+    """
+    Return {'model', 'tokenizer', 'load_seconds', 'rss_mb'} for model_name,
+    loading it only on the first request in this process.
+    """
+    if torch_dtype is None:
+        torch_dtype = torch.float16 if device != 'cpu' else torch.float32
+    key = (model_name, device, str(torch_dtype), trust_remote_code)
+
+    with _LOCK:
+        if key in _MODELS:
+            entry = _MODELS[key]
+            print(f"♻️ Reusing {model_name} on {device} (loaded in {entry['load_seconds']:.1f}s)")
+            return entry
+        if key in _FAILED:
+            error, failed_at = _FAILED[key]
+            if time.monotonic() - failed_at < FAILURE_TTL:
+                raise error
+            del _FAILED[key]
+
+        start = time.perf_counter()
+        rss_before = resident_memory_mb()
+
+        # Only pass the token when we have one
+        auth = {'token': hf_token} if hf_token else {}
+
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_name,
+                trust_remote_code=trust_remote_code,
+                **auth
+            )
+            model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                torch_dtype=torch_dtype,
+                device_map='auto' if device != 'cpu' else None,
+                low_cpu_mem_usage=True,
+                trust_remote_code=trust_remote_code,
+                **auth
+            )
+        except Exception as e:
+            if not isinstance(e, TRANSIENT_ERRORS):
+                _FAILED[key] = (e, time.monotonic())
+            raise
+        model.eval()
+
+        # Set pad token if not exists
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        entry = {
+            'model': model,
+            'tokenizer': tokenizer,
+            'load_seconds': time.perf_counter() - start,
+            'rss_mb': resident_memory_mb()
+        }
+        _MODELS[key] = entry
+
+        print(f"⏱️ Loaded {model_name} in {entry['load_seconds']:.1f}s "
+              f"(RSS {entry['rss_mb']:.0f} MB, +{entry['rss_mb'] - rss_before:.0f} MB)")
+        return entry
+
+
+def loaded_models() -> Dict[str, Dict[str, float]]:
+    """
+    Load time and RSS after loading for every model in the registry.
+    """
+    with _LOCK:
+        return {
+            f"{name} [{device}, {dtype}]": {
+                'load_seconds': entry['load_seconds'],
+                'rss_mb': entry['rss_mb']
+            }
+            for (name, device, dtype, _), entry in _MODELS.items()
+        }
+
+
+def unload_all():
+    """
+    Drop every cached model so its memory can be reclaimed.
+    """
+    with _LOCK:
+        _MODELS.clear()
+        _FAILED.clear()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
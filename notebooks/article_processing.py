@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+Post-processing stage for scraped threat intelligence articles.
+
+ThreatIntelligenceProcessor (cleaning, indicator extraction, relevance
+scoring), DataValidator (quality report) and export_for_llm_training live
+here instead of in the collection notebook, so they can run in worker
+processes. postprocess_articles maps them over a process pool in chunks of
+articles, reading the input lazily with only a few chunks in flight per
+worker; every worker loads the NLTK resources and builds its processor and
+validator once, in the pool initializer. The stopword list is the only NLTK
+resource processing uses (the notebook imports the tokenizers but never
+calls them). postprocess_to_jsonl streams the results to a JSONL file in
+input order as they complete.
+
+    python article_processing.py --input ../data/raw/threat_intelligence_multi_source_*.json \\
+        --output ../data/processed/processed_articles.jsonl --workers 8
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Any, Iterable, Iterator
+
+from nltk.corpus import stopwords
+
+from ioc_scanner import IOC_TYPES, scan as scan_iocs, group_indicators
+
+# json_stream lives at the repository root; it streams JSON arrays as well as JSONL
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from json_stream import iter_records
+
+
+PROCESSED_DATA_DIR = Path('../data/processed')
+
+# Articles per task sent to a worker, and tasks in flight per worker
+DEFAULT_CHUNK_SIZE = 16
+CHUNKS_PER_WORKER = 2
+
+# Per-process state, built once by init_worker (or on first use in the parent)
+_STOP_WORDS: Optional[set] = None
+_PROCESSOR = None
+_VALIDATOR = None
+
+
+def load_stop_words() -> set:
+    """
+    English stopwords, read from the NLTK corpus once per process.
+    """
+    global _STOP_WORDS
+    if _STOP_WORDS is None:
+        _STOP_WORDS = set(stopwords.words('english'))
+    return _STOP_WORDS
+
+
+class ThreatIntelligenceProcessor:
+    """
+    Advanced text processor for threat intelligence data.
+    Handles cleaning, normalization, and structure preservation.
+    """
+    
+    def __init__(self):
+        self.stop_words = load_stop_words()
+        
+        # Threat intelligence indicators, found in one pass by ioc_scanner (validated and refanged)
+        self.indicator_types = IOC_TYPES
+        
+        # Threat keywords for relevance scoring
+        self.threat_keywords = [
+            'apt', 'advanced persistent threat', 'ransomware', 'trojan', 'backdoor',
+            'botnet', 'malware', 'phishing', 'spear phishing', 'zero-day',
+            'exploit', 'vulnerability', 'attack', 'campaign', 'threat actor'
+        ]
+    
+    def clean_text(self, text: str) -> str:
+        """Clean and normalize text while preserving important technical details."""
+        if not text:
+            return ""
+        
+        # Remove HTML entities and extra whitespace
+        text = re.sub(r'&[a-zA-Z0-9#]+;', ' ', text)
+        text = re.sub(r'\s+', ' ', text)
+        
+        # Preserve important punctuation in technical contexts
+        text = re.sub(r'([.!?])([A-Z])', r'\1 \2', text)
+        
+        return text.strip()
+    
+    def extract_indicators(self, text: str) -> Dict[str, List[str]]:
+        """Extract cybersecurity indicators from text."""
+        return group_indicators(scan_iocs(text))
+    
+    def extract_indicator_spans(self, text: str) -> List[Dict[str, Any]]:
+        """Typed indicator spans ({'type', 'value', 'raw', 'start', 'end'}) in order of position."""
+        return list(scan_iocs(text))
+    
+    def calculate_threat_relevance_score(self, text: str, indicators: Optional[Dict[str, List[str]]] = None) -> float:
+        """Calculate how relevant the text is to threat intelligence."""
+        if not text:
+            return 0.0
+        
+        text_lower = text.lower()
+        score = 0.0
+        
+        # Count threat-related keywords
+        for keyword in self.threat_keywords:
+            count = text_lower.count(keyword)
+            score += count * 0.1
+        
+        # Bonus for technical indicators
+        if indicators is None:
+            indicators = self.extract_indicators(text)
+        for indicator_type, matches in indicators.items():
+            if matches:
+                score += len(matches) * 0.2
+        
+        # Normalize by text length
+        text_length = len(text.split())
+        if text_length > 0:
+            score = score / (text_length / 100)  # Per 100 words
+        
+        return min(score, 10.0)  # Cap at 10.0
+    
+    def process_article(self, article_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process a complete article with all preprocessing steps."""
+        processed = article_data.copy()
+        
+        # Clean title
+        if processed.get('title'):
+            processed['title'] = self.clean_text(processed['title'])
+        
+        # Process content
+        if processed.get('content'):
+            if isinstance(processed['content'], list):
+                # Preserve paragraph structure
+                cleaned_paragraphs = []
+                for paragraph in processed['content']:
+                    cleaned = self.clean_text(paragraph)
+                    if len(cleaned) > 10:  # Filter out very short paragraphs
+                        cleaned_paragraphs.append(cleaned)
+                
+                processed['paragraphs'] = cleaned_paragraphs
+                processed['full_text'] = ' '.join(cleaned_paragraphs)
+            else:
+                # Single string content
+                clean_content = self.clean_text(processed['content'])
+                processed['full_text'] = clean_content
+                processed['paragraphs'] = [clean_content]
+        
+        # Extract indicators and calculate relevance
+        if processed.get('full_text'):
+            processed['indicators'] = self.extract_indicators(processed['full_text'])
+            processed['threat_relevance_score'] = self.calculate_threat_relevance_score(
+                processed['full_text'], processed['indicators']
+            )
+        
+        # Add processing metadata (since 1.1, indicators are validated and refanged by ioc_scanner)
+        processed['processed_at'] = datetime.now().isoformat()
+        processed['processing_version'] = '1.1'
+        
+        return processed
+
+
+class DataValidator:
+    """
+    Comprehensive data validation for threat intelligence articles.
+    Ensures data quality and consistency for downstream processing.
+    """
+    
+    def __init__(self):
+        self.validation_rules = {
+            'min_content_length': 100,
+            'max_content_length': 50000,
+            'min_title_length': 5,
+            'max_title_length': 200,
+            'min_threat_score': 0.1,
+            'required_fields': ['title', 'content', 'source', 'url']
+        }
+    
+    def validate_structure(self, article: Dict[str, Any]) -> Tuple[bool, List[str]]:
+        """Validate article structure and required fields."""
+        errors = []
+        
+        # Check required fields
+        for field in self.validation_rules['required_fields']:
+            if not article.get(field):
+                errors.append(f"Missing required field: {field}")
+        
+        # Validate title
+        title = article.get('title', '')
+        if len(title) < self.validation_rules['min_title_length']:
+            errors.append(f"Title too short: {len(title)} chars")
+        elif len(title) > self.validation_rules['max_title_length']:
+            errors.append(f"Title too long: {len(title)} chars")
+        
+        # Validate content length
+        content_length = 0
+        if article.get('full_text'):
+            content_length = len(article['full_text'])
+        elif article.get('content'):
+            if isinstance(article['content'], list):
+                content_length = sum(len(p) for p in article['content'])
+            else:
+                content_length = len(article['content'])
+        
+        if content_length < self.validation_rules['min_content_length']:
+            errors.append(f"Content too short: {content_length} chars")
+        elif content_length > self.validation_rules['max_content_length']:
+            errors.append(f"Content too long: {content_length} chars")
+        
+        return len(errors) == 0, errors
+    
+    def generate_quality_report(self, article: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate comprehensive quality report for an article."""
+        report = {
+            'article_id': article.get('url', 'unknown'),
+            'source': article.get('source', 'unknown'),
+            'validation_timestamp': datetime.now().isoformat()
+        }
+        
+        # Structure validation
+        structure_valid, structure_errors = self.validate_structure(article)
+        report['structure'] = {
+            'valid': structure_valid,
+            'errors': structure_errors
+        }
+        
+        # Calculate overall quality score
+        quality_score = 0
+        if structure_valid:
+            quality_score += 4
+        
+        # Check threat relevance
+        threat_score = article.get('threat_relevance_score', 0.0)
+        if threat_score >= self.validation_rules['min_threat_score']:
+            quality_score += 3
+        
+        # Check for technical indicators
+        indicators = article.get('indicators', {})
+        total_indicators = sum(len(inds) for inds in indicators.values())
+        if total_indicators > 0:
+            quality_score += 3
+        
+        report['overall'] = {
+            'score': quality_score,
+            'max_score': 10,
+            'grade': self._calculate_grade(quality_score, 10),
+            'approved': quality_score >= 7
+        }
+        
+        return report
+    
+    def _calculate_grade(self, score: float, max_score: float) -> str:
+        """Calculate letter grade based on score."""
+        percentage = (score / max_score) * 100
+        if percentage >= 90:
+            return 'A'
+        elif percentage >= 80:
+            return 'B'
+        elif percentage >= 70:
+            return 'C'
+        elif percentage >= 60:
+            return 'D'
+        else:
+            return 'F'
+
+
+def export_for_llm_training(articles: List[Dict[str, Any]], output_dir: Path = PROCESSED_DATA_DIR) -> Dict[str, Any]:
+    """Export data in formats suitable for LLM training and knowledge graph construction."""
+    
+    if not articles:
+        print("❌ No articles to export")
+        return {}
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # 1. Training text format (for LLM fine-tuning)
+    training_texts = []
+    for article in articles:
+        text_entry = {
+            'id': f"{article['source']}_{hash(article['url']) % 100000}",
+            'source': article['source'],
+            'title': article['title'],
+            'text': article['full_text'],
+            'metadata': {
+                'url': article['url'],
+                'scraped_at': article['scraped_at'],
+                'indicators': article.get('indicators', {}),
+                'threat_score': article.get('threat_relevance_score', 0)
+            }
+        }
+        training_texts.append(text_entry)
+    
+    training_file = output_dir / f'llm_training_data_{timestamp}.json'
+    with open(training_file, 'w', encoding='utf-8') as f:
+        json.dump(training_texts, f, indent=2, ensure_ascii=False)
+    
+    # 2. Entity-Relationship format (for knowledge graph)
+    entities_and_relations = {
+        'entities': [],
+        'relations': [],
+        'documents': []
+    }
+    
+    for idx, article in enumerate(articles):
+        doc_id = f"doc_{idx}"
+        
+        # Document node
+        entities_and_relations['documents'].append({
+            'id': doc_id,
+            'title': article['title'],
+            'source': article['source'],
+            'url': article['url'],
+            'threat_score': article.get('threat_relevance_score', 0)
+        })
+        
+        # Extract entities from indicators
+        indicators = article.get('indicators', {})
+        for indicator_type, values in indicators.items():
+            for value in values:
+                entity_id = f"{indicator_type}_{hash(value) % 100000}"
+                
+                # Entity
+                entities_and_relations['entities'].append({
+                    'id': entity_id,
+                    'type': indicator_type,
+                    'value': value
+                })
+                
+                # Relation
+                entities_and_relations['relations'].append({
+                    'source': doc_id,
+                    'target': entity_id,
+                    'relation': 'mentions',
+                    'type': indicator_type
+                })
+    
+    # Remove duplicate entities
+    seen_entities = set()
+    unique_entities = []
+    for entity in entities_and_relations['entities']:
+        entity_key = (entity['type'], entity['value'])
+        if entity_key not in seen_entities:
+            seen_entities.add(entity_key)
+            unique_entities.append(entity)
+    entities_and_relations['entities'] = unique_entities
+    
+    kg_file = output_dir / f'knowledge_graph_data_{timestamp}.json'
+    with open(kg_file, 'w', encoding='utf-8') as f:
+        json.dump(entities_and_relations, f, indent=2, ensure_ascii=False)
+    
+    # 3. JSONL format (for streaming/batch processing)
+    jsonl_file = output_dir / f'threat_intelligence_{timestamp}.jsonl'
+    with open(jsonl_file, 'w', encoding='utf-8') as f:
+        for article in articles:
+            simplified_article = {
+                'title': article['title'],
+                'content': article['full_text'],
+                'source': article['source'],
+                'indicators': article.get('indicators', {}),
+                'threat_score': article.get('threat_relevance_score', 0)
+            }
+            f.write(json.dumps(simplified_article, ensure_ascii=False) + '\n')
+    
+    # 4. Summary statistics
+    export_summary = {
+        'export_timestamp': datetime.now().isoformat(),
+        'total_articles': len(articles),
+        'sources': list(set(article['source'] for article in articles)),
+        'total_entities': len(entities_and_relations['entities']),
+        'total_relations': len(entities_and_relations['relations']),
+        'files_created': {
+            'llm_training': str(training_file),
+            'knowledge_graph': str(kg_file),
+            'jsonl_format': str(jsonl_file)
+        },
+        'statistics': {
+            'avg_threat_score': sum(article.get('threat_relevance_score', 0) for article in articles) / len(articles),
+            'total_technical_indicators': sum(sum(len(inds) for inds in article.get('indicators', {}).values()) for article in articles)
+        }
+    }
+    
+    summary_file = output_dir / f'export_summary_{timestamp}.json'
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(export_summary, f, indent=2, ensure_ascii=False)
+    
+    print("\n✅ Export completed successfully!")
+    print("="*60)
+    print(f"📊 Exported {len(articles)} articles")
+    print(f"🎯 {len(entities_and_relations['entities'])} unique entities")
+    print(f"🔗 {len(entities_and_relations['relations'])} relations")
+    print(f"📈 Avg threat score: {export_summary['statistics']['avg_threat_score']:.2f}")
+    
+    print("\n📁 Files created:")
+    for file_type, file_path in export_summary['files_created'].items():
+        print(f"  {file_type}: {Path(file_path).name}")
+    
+    return export_summary
+
+
+def init_worker():
+    """
+    Pool initializer: load the NLTK stopwords and build this process's processor and validator once.
+    """
+    global _PROCESSOR, _VALIDATOR
+    load_stop_words()
+    _PROCESSOR = ThreatIntelligenceProcessor()
+    _VALIDATOR = DataValidator()
+
+
+def process_and_validate(article: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Process one article and attach its quality report (runs in a worker process).
+    """
+    if _PROCESSOR is None:
+        init_worker()
+    processed = _PROCESSOR.process_article(article)
+    processed['quality_report'] = _VALIDATOR.generate_quality_report(processed)
+    return processed
+
+
+def process_chunk(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    process_and_validate over one chunk of articles (one task for a worker).
+    """
+    return [process_and_validate(article) for article in chunk]
+
+
+def postprocess_articles(articles: Iterable[Dict[str, Any]], workers: int = 1,
+                         chunk_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield processed articles (with 'quality_report') in input order.
+
+    With workers > 1 the articles are mapped over a process pool in chunks of
+    chunk_size articles. Chunks are read from articles only as results are
+    consumed, so at most CHUNKS_PER_WORKER chunks per worker are in memory.
+    """
+    if workers <= 1:
+        for article in articles:
+            yield process_and_validate(article)
+        return
+
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    articles = iter(articles)
+    chunks = iter(lambda: list(islice(articles, chunk_size)), [])
+    print(f"⚡ Using {workers} worker processes (chunk size {chunk_size})")
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(process_chunk, chunk))
+            if len(pending) >= workers * CHUNKS_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def postprocess_to_jsonl(articles: Iterable[Dict[str, Any]], output_file: str, workers: int = 1,
+                         chunk_size: Optional[int] = None, approved_only: bool = True) -> Dict[str, Any]:
+    """
+    Post-process articles and stream them to a JSONL file, one line per article as it completes.
+
+    With approved_only, articles whose quality report is not approved are
+    counted but not written.
+    """
+    path = Path(output_file)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    stats = {'processed': 0, 'written': 0, 'rejected': 0, 'grades': {}}
+    with open(path, 'w', encoding='utf-8') as f:
+        for article in postprocess_articles(articles, workers, chunk_size):
+            stats['processed'] += 1
+            overall = article['quality_report']['overall']
+            stats['grades'][overall['grade']] = stats['grades'].get(overall['grade'], 0) + 1
+            if approved_only and not overall['approved']:
+                stats['rejected'] += 1
+                continue
+            f.write(json.dumps(article, ensure_ascii=False) + '\n')
+            stats['written'] += 1
+
+    stats['output_file'] = str(path)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean, score and validate scraped threat intelligence articles")
+    parser.add_argument('--input', nargs='+', required=True,
+                        help='Scraped article files (JSON arrays or .jsonl)')
+    parser.add_argument('--output', default=str(PROCESSED_DATA_DIR / 'processed_articles.jsonl'),
+                        help='Output JSONL file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help=f'Articles per task sent to a worker (default: {DEFAULT_CHUNK_SIZE})')
+    parser.add_argument('--all', action='store_true',
+                        help='Also write articles that fail quality validation')
+    args = parser.parse_args()
+
+    articles = (article for input_file in args.input for article in iter_records(input_file))
+    start = datetime.now()
+    stats = postprocess_to_jsonl(articles, args.output, args.workers, args.chunk_size,
+                                 approved_only=not args.all)
+    elapsed = (datetime.now() - start).total_seconds()
+
+    print(f"\n✅ Processed {stats['processed']} articles in {elapsed:.1f}s")
+    print(f"📝 Wrote {stats['written']} to {stats['output_file']} ({stats['rejected']} rejected)")
+    print(f"📊 Grades: {dict(sorted(stats['grades'].items()))}")
+
+
+if __name__ == "__main__":
+    main()
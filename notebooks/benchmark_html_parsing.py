@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark the HTML parsing backends on the saved Symantec listing page.
+
+Times parsing, link extraction and the Symantec multi-strategy content
+extraction for each backend, and checks that every backend extracts exactly
+what BeautifulSoup's html.parser does.
+
+    python benchmark_html_parsing.py --repeat 20
+"""
+
+import time
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, Any, List
+
+from async_scraper import AsyncFetcher, AsyncThreatIntelligenceScraper, AsyncSymantecScraper
+from html_backend import BeautifulSoupBackend, LxmlBackend, CSSSelector
+
+
+DEFAULT_HTML = Path(__file__).resolve().parent.parent / 'data' / 'Threat Intelligence _ Symantec Enterprise Blogs.html'
+
+
+def make_scraper(backend) -> AsyncSymantecScraper:
+    """
+    Symantec scraper whose base scraper parses with the given backend (no network use).
+    """
+    base = AsyncThreatIntelligenceScraper(AsyncFetcher({'parser_backend': 'bs4'}))
+    base.backend = backend
+    return AsyncSymantecScraper(base)
+
+
+def time_call(func, repeat: int) -> Dict[str, Any]:
+    """
+    Run func repeat times; return its last result with mean and best wall time.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return {'result': result, 'mean': statistics.mean(timings), 'best': min(timings)}
+
+
+def benchmark(html: bytes, backends: Dict[str, Any], repeat: int) -> List[Dict[str, Any]]:
+    rows = []
+    reference = None
+    for name, backend in backends.items():
+        scraper = make_scraper(backend)
+        parse = time_call(lambda: backend.parse(html), repeat)
+        doc = parse['result']
+        links = time_call(lambda: scraper.parse_links(doc), repeat)
+        extract = time_call(lambda: scraper.extract_content(doc), repeat)
+
+        output = (links['result'], extract['result'])
+        if reference is None:
+            reference = output
+        rows.append({
+            'backend': name,
+            'parse': parse,
+            'links': links,
+            'extract': extract,
+            'total': parse['mean'] + links['mean'] + extract['mean'],
+            'links_found': len(links['result']),
+            'identical': output == reference
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML parsing backends")
+    parser.add_argument('--html', default=str(DEFAULT_HTML),
+                        help='HTML file to parse (default: saved Symantec listing)')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Timed runs per step')
+    args = parser.parse_args()
+
+    html = Path(args.html).read_bytes()
+    print(f"📄 {args.html} ({len(html) / 1024:.0f} KB), {args.repeat} runs per step")
+
+    # The first backend is the reference the others are compared against
+    backends = {'bs4 (html.parser)': BeautifulSoupBackend('html.parser')}
+    try:
+        backends['bs4 (lxml)'] = BeautifulSoupBackend('lxml')
+        backends['bs4 (lxml)'].parse('<html></html>')
+    except Exception as e:
+        del backends['bs4 (lxml)']
+        print(f"⚠️ Skipping bs4 (lxml): {e}")
+    if CSSSelector is not None:
+        backends['lxml'] = LxmlBackend()
+    else:
+        print("⚠️ Skipping lxml: lxml/cssselect not installed")
+
+    rows = benchmark(html, backends, args.repeat)
+    baseline = rows[0]['total']
+
+    print(f"\n{'backend':<20}{'parse ms':>10}{'links ms':>10}{'extract ms':>12}{'total ms':>10}{'speedup':>9}  identical")
+    for row in rows:
+        print(f"{row['backend']:<20}{row['parse']['mean'] * 1000:>10.1f}{row['links']['mean'] * 1000:>10.1f}"
+              f"{row['extract']['mean'] * 1000:>12.1f}{row['total'] * 1000:>10.1f}"
+              f"{baseline / row['total']:>8.1f}x  {'✅' if row['identical'] else '❌'}")
+    print(f"\n🔗 Links found: {rows[0]['links_found']}")
+
+
+if __name__ == "__main__":
+    main()
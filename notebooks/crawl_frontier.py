@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Persistent crawl frontier for the scrapers.
+
+Every article URL a listing page has ever shown is recorded with the time it
+was first seen, so pagination can stop at the first page that only repeats
+known links. Article fetches are tracked as jobs (pending -> scraped -> done)
+and scraped articles are kept until the caller has saved them, so a crawl that
+dies half way resumes where it stopped instead of starting over.
+"""
+
+import json
+import time
+import sqlite3
+from pathlib import Path
+from typing import Dict, Any, List, Iterable
+
+
+class CrawlFrontier:
+    """
+    SQLite-backed set of seen article URLs with a resumable fetch queue.
+
+    Job states: 'pending' (to fetch), 'failed' (retried until max_attempts),
+    'scraped' (article stored, not yet saved by the caller) and 'done'.
+    """
+
+    def __init__(self, path: str = '../data/cache/crawl_frontier.sqlite', max_attempts: int = 3):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                article TEXT
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_urls_source_status ON urls (source, status)")
+
+    def is_known(self, url: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone() is not None
+
+    def all_known(self, urls: List[str]) -> bool:
+        """
+        True if every URL has been seen before (used to stop pagination).
+
+        An empty list is not "all known": a page without links says nothing about older pages.
+        """
+        return bool(urls) and all(self.is_known(url) for url in urls)
+
+    def add(self, source: str, urls: Iterable[str]) -> List[str]:
+        """
+        Record URLs from a listing page and return the ones never seen before, queued as pending.
+        """
+        now = time.time()
+        new_urls = []
+        for url in urls:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO urls (url, source, first_seen, last_seen, status) "
+                "VALUES (?, ?, ?, ?, 'pending')",
+                (url, source, now, now)
+            )
+            if cursor.rowcount:
+                new_urls.append(url)
+            else:
+                self.conn.execute("UPDATE urls SET last_seen = ? WHERE url = ?", (now, url))
+        self.conn.commit()
+        return new_urls
+
+    def seed(self, urls: Iterable[str], source: str = 'corpus') -> int:
+        """
+        Mark URLs that are already in the corpus as done, so they are never fetched.
+        """
+        now = time.time()
+        cursor = self.conn.executemany(
+            "INSERT OR IGNORE INTO urls (url, source, first_seen, last_seen, status) VALUES (?, ?, ?, ?, 'done')",
+            ((url, source, now, now) for url in urls)
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def pending(self, source: str) -> List[str]:
+        """
+        URLs of the source still to fetch, oldest first, including earlier failures with attempts left.
+        """
+        rows = self.conn.execute(
+            "SELECT url FROM urls WHERE source = ? AND "
+            "(status = 'pending' OR (status = 'failed' AND attempts < ?)) ORDER BY first_seen, rowid",
+            (source, self.max_attempts)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def mark_scraped(self, url: str, article: Dict[str, Any]):
+        """
+        Store a fetched article until the caller has saved it.
+        """
+        self.conn.execute(
+            "UPDATE urls SET status = 'scraped', attempts = attempts + 1, article = ? WHERE url = ?",
+            (json.dumps(article, ensure_ascii=False), url)
+        )
+        self.conn.commit()
+
+    def mark_failed(self, url: str):
+        self.conn.execute("UPDATE urls SET status = 'failed', attempts = attempts + 1 WHERE url = ?", (url,))
+        self.conn.commit()
+
+    def scraped(self, source: str) -> List[Dict[str, Any]]:
+        """
+        Articles of the source fetched but not yet saved (this run's and any left by a crash).
+        """
+        rows = self.conn.execute(
+            "SELECT article FROM urls WHERE source = ? AND status = 'scraped' ORDER BY first_seen, rowid",
+            (source,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def mark_saved(self, urls: Iterable[str]):
+        """
+        Close the jobs of articles the caller has written out and drop their stored copies.
+        """
+        self.conn.executemany(
+            "UPDATE urls SET status = 'done', article = NULL WHERE url = ? AND status = 'scraped'",
+            ((url,) for url in urls)
+        )
+        self.conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Number of URLs per job state.
+        """
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall())
+
+    def close(self):
+        """
+        Flush pending writes and close the database.
+        """
+        self.conn.commit()
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
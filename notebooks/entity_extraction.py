@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Batched entity and relationship extraction with a Hugging Face causal LM.
+
+The extraction notebook used to call the text-generation pipeline once per
+article and cut the echoed prompt off the decoded text. extract_entities_batch
+instead tokenizes all prompts once, groups them into batches of similar token
+length (so little compute goes to padding), generates each batch left-padded
+with the KV cache on, and decodes only the new tokens of every row before
+parsing them with parse_extraction_output. Results come back in input order,
+in the format extract_entities_and_relationships always returned.
+
+Every prompt starts with the same instruction and few-shot block
+(ENTITY_EXTRACTION_PREFIX). With a prefix cache from build_prefix_cache, that
+block is run through the model once and its key/value cache is copied into
+every batch, so prefill only covers the article suffix. Rows are then padded
+between the prefix and their suffix instead of on the left.
+
+With structured=True the examples answer in JSON ({"entities": [...],
+"relationships": [...]}, see extraction_schema.py) and decoding is
+constrained to that grammar token by token, so every answer parses, and a row
+stops as soon as its object closes instead of running to max_new_tokens.
+"""
+
+import re
+import sys
+import copy
+import json
+from pathlib import Path
+from typing import Dict, List, Tuple, Any, Optional
+
+import torch
+from transformers import DynamicCache, LogitsProcessor, LogitsProcessorList
+
+from extraction_schema import INITIAL_STATE, advance, accepts, close_extraction, to_tuples, to_structured
+
+# length_batching lives at the repository root, next to the classifier that shares it
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from length_batching import make_length_batches
+
+
+# Instruction and few-shot examples shared by every extraction prompt; only the
+# article suffix differs, so its key/value cache can be computed once (see build_prefix_cache)
+ENTITY_EXTRACTION_PREFIX = """Instruction: Please identify the following types of entities and then extract the relationships between these extracted entities:
+
+Entity Types (focus on these only):
+- Malware: Malicious software (e.g., 'Stuxnet', 'Emotet', 'Backdoor.Atharvan')
+- Threat Type: Category of threats (e.g., 'Ransomware', 'APT', 'Botnet')
+- Attacker: Threat actors/groups (e.g., 'APT28', 'Lazarus Group', 'Shuckworm')
+- Technique: Attack techniques/TTPs (e.g., 'T1057: Process Discovery', 'Privilege Escalation', 'Phishing')
+- Tool: Security tools or attack tools (e.g., 'PowerShell', 'Cobalt Strike', 'EHole')
+- Vulnerability: Security weaknesses (e.g., 'CVE-2020-1472', 'CVE-2021-44228')
+- IP: IP addresses (e.g., '45.153.243.93', '192.168.1.100')
+- Domain: Domain names (e.g., 'malicious-domain[.]com', 'evil[.]example[.]com')
+- URL: URLs (e.g., 'hxxp://178.73.192[.]15/cal.exe')
+- File: File names (e.g., 'rtk.lnk', 'payload.exe', 'shtasks.exe')
+- Hash: File hashes (e.g., '2aee8bb2a953124803bc42e5c42935c9', MD5/SHA1/SHA256)
+
+Relationship Types:
+- use, hash, aka, execute, used by, download, resolved to, IP, drop, associated with, deploy, communicate with, connect to, install, exploit, contain, run, launch, target, linked to
+
+If there are no entities and relationships pertaining to the specified types, please state 'No related entities and relations'. Make sure to follow the output format shown in the following examples.
+
+Example 1:
+Input: A hitherto unknown attack group has been observed targeting a materials research organization in Asia. The group, which Symantec calls Clasiopa, is characterized by a distinct toolset, which includes one piece of custom malware (Backdoor.Atharvan).
+Output: Named Entities: (Clasiopa, Attacker), (Backdoor.Atharvan, Malware)\nRelationships: (Clasiopa, uses, Backdoor.Atharvan)
+
+Example 2:
+Input: The Emotet malware has been observed using new phishing techniques to target banking institutions. The malware exploits CVE-2021-1234 vulnerability in Microsoft Office.
+Output: Named Entities: (Emotet, Malware), (phishing, Technique), (CVE-2021-1234, Vulnerability), (Microsoft Office, Tool)\nRelationships: (Emotet, uses, phishing), (Emotet, exploits, CVE-2021-1234)
+
+Example 3:
+Input: The threat actor downloaded malicious payload from hxxp://malicious-domain[.]com/payload.exe and used hash 2aee8bb2a953124803bc42e5c42935c9 to verify file integrity. The attack targeted IP address 192.168.1.100.
+Output: Named Entities: (threat actor, Attacker), (malicious payload, File), (hxxp://malicious-domain[.]com/payload.exe, URL), (2aee8bb2a953124803bc42e5c42935c9, Hash), (192.168.1.100, IP)\nRelationships: (threat actor, uses, hxxp://malicious-domain[.]com/payload.exe), (threat actor, targets, 192.168.1.100)
+
+Example 4:
+Input: H2Miner botnet uses Kinsing malware and Cobalt Strike to deploy XMRig miners. The campaign communicates with C2 server at evil[.]domain[.]com and is attributed to APT group.
+Output: Named Entities: (H2Miner, Threat Type), (Kinsing, Malware), (Cobalt Strike, Tool), (XMRig, Tool), (evil[.]domain[.]com, Domain), (APT group, Attacker)\nRelationships: (H2Miner, uses, Kinsing), (H2Miner, uses, Cobalt Strike), (H2Miner, uses, XMRig), (Kinsing, communicatesWith, evil[.]domain[.]com), (H2Miner, attributedTo, APT group)
+
+Example 5:
+Input: The weather forecast shows sunny skies and moderate temperatures for the weekend.
+Output: No related entities and relations
+
+Now extract entities and relationships from the following text:
+"""
+
+
+STRUCTURED_INSTRUCTION = (
+    "Answer with a single JSON object of the form "
+    '{"entities": [{"text": ..., "type": ...}], "relationships": [[subject, relation, object]]}. '
+    "If there are no entities and relationships pertaining to the specified types, use empty lists. "
+    "Make sure to follow the output format shown in the following examples."
+)
+
+
+def _structured_prefix(prefix: str) -> str:
+    """
+    The prompt prefix with its instruction and example answers rewritten as JSON.
+    """
+    instruction = re.search(r"^If there are no entities.*$", prefix, re.MULTILINE).group()
+
+    def example_output(match):
+        entities, relationships = parse_extraction_output(match.group(1))
+        return "Output: " + json.dumps(to_structured(entities, relationships), ensure_ascii=False) + "\n\n"
+
+    examples = re.sub(r"Output: (.*?)\n\n", example_output, prefix, flags=re.DOTALL)
+    return examples.replace(instruction, STRUCTURED_INSTRUCTION)
+
+
+def prompt_content(text: str) -> str:
+    """
+    The part of an article that goes into its extraction prompt.
+    """
+    # Truncate text to avoid token limits
+    return (text[:1500] if text else "").replace('\n', ' ').strip()
+
+
+def create_entity_extraction_suffix(text: str) -> str:
+    """
+    Article-specific end of the extraction prompt.
+    """
+    return f"Input: {prompt_content(text)}\nOutput:"
+
+
+def create_entity_extraction_prompt(text: str, structured: bool = False) -> str:
+    """
+    Create prompt for entity and relationship extraction focusing on core cybersecurity entity types.
+    """
+    prefix = ENTITY_EXTRACTION_JSON_PREFIX if structured else ENTITY_EXTRACTION_PREFIX
+    return prefix + create_entity_extraction_suffix(text)
+
+
+def parse_extraction_output(output: str) -> Tuple[List[Tuple], List[Tuple]]:
+    """
+    Parse the model output to extract entities and relationships.
+    """
+    entities = []
+    relationships = []
+
+    # Check for "No related entities" case
+    if "no related entities" in output.lower():
+        return entities, relationships
+
+    try:
+        # Split output into lines
+        lines = [line.strip() for line in output.split('\n') if line.strip()]
+
+        current_section = None
+        for line in lines:
+            line_lower = line.lower()
+
+            if "named entities:" in line_lower:
+                current_section = "entities"
+                # Extract entities from the same line
+                entity_part = line.split(":", 1)[1] if ":" in line else ""
+                entities.extend(extract_tuples_from_text(entity_part))
+
+            elif "relationships:" in line_lower:
+                current_section = "relationships"
+                # Extract relationships from the same line
+                rel_part = line.split(":", 1)[1] if ":" in line else ""
+                relationships.extend(extract_tuples_from_text(rel_part))
+
+            elif current_section == "entities":
+                entities.extend(extract_tuples_from_text(line))
+
+            elif current_section == "relationships":
+                relationships.extend(extract_tuples_from_text(line))
+
+    except Exception as e:
+        print(f"⚠️  Error parsing output: {e}")
+
+    return entities, relationships
+
+def extract_tuples_from_text(text: str) -> List[Tuple]:
+    """
+    Extract tuples from text using regex pattern matching.
+    """
+    tuples = []
+
+    # Pattern to match (item1, item2) or (item1, item2, item3)
+    pattern = r'\(([^)]+)\)'
+    matches = re.findall(pattern, text)
+
+    for match in matches:
+        # Split by comma and clean up
+        parts = [part.strip() for part in match.split(',')]
+        if len(parts) >= 2:
+            tuples.append(tuple(parts))
+
+    return tuples
+
+
+# The same prompt with JSON answers, for constrained decoding
+ENTITY_EXTRACTION_JSON_PREFIX = _structured_prefix(ENTITY_EXTRACTION_PREFIX)
+
+
+class ExtractionGrammarProcessor(LogitsProcessor):
+    """
+    Restrict greedy decoding to the extraction JSON grammar and end every row once its object closes.
+
+    For each row only one token is left unmasked: the highest-scoring one that
+    keeps the decoded answer a valid prefix of the grammar, i.e. what greedy
+    decoding picks whenever its choice is valid. Once the object is complete,
+    only EOS remains. At most max_candidates tokens are checked, in score
+    order; if none fits, the row moves on with the first token of the shortest
+    completion that closes the object.
+
+    Every row keeps the parser state of its decoded answer (extraction_schema's
+    automaton), so each step only parses the new text and each candidate only
+    its own characters, instead of re-matching the whole answer per candidate.
+    """
+
+    def __init__(self, tokenizer, prompt_width: int, max_candidates: int = 256):
+        self.tokenizer = tokenizer
+        self.prompt_width = prompt_width
+        self.max_candidates = max_candidates
+        self.eos_token_id = tokenizer.eos_token_id
+        self.special_ids = set(tokenizer.all_special_ids)
+        # Token texts are decoded after an anchor, so tokenizers that drop a leading space keep it
+        self.anchor_ids = tokenizer('"', add_special_tokens=False)['input_ids']
+        self.anchor_text = tokenizer.decode(self.anchor_ids)
+        self.pieces: Dict[int, str] = {}
+        # Row -> (decoded answer, parser state after it)
+        self.rows: Dict[int, tuple] = {}
+
+    def piece(self, token_id: int) -> str:
+        if token_id not in self.pieces:
+            if token_id in self.special_ids:
+                self.pieces[token_id] = ''
+            else:
+                text = self.tokenizer.decode(self.anchor_ids + [token_id])
+                self.pieces[token_id] = text[len(self.anchor_text):]
+        return self.pieces[token_id]
+
+    def row_state(self, row: int, text: str):
+        """
+        Parser state after a row's decoded answer, advanced from the previous step's state.
+        """
+        previous = self.rows.get(row)
+        if previous is not None and text.startswith(previous[0]):
+            state = advance(previous[1], text[len(previous[0]):])
+        else:
+            # Decoding can rewrite earlier characters (e.g. a completed multi-byte character)
+            state = advance(INITIAL_STATE, text)
+        self.rows[row] = (text, state)
+        return state
+
+    def next_token(self, text: str, state, scores: torch.Tensor) -> int:
+        """
+        Highest-scoring token that keeps text a valid prefix, else one that heads for the close.
+        """
+        k = min(self.max_candidates, int(torch.isfinite(scores).sum()))
+        for token_id in torch.topk(scores, k).indices.tolist():
+            piece = self.piece(token_id)
+            if piece and advance(state, piece):
+                return token_id
+
+        closer = close_extraction(text)[len(text):]
+        closer_ids = self.tokenizer(closer, add_special_tokens=False)['input_ids']
+        if closer_ids and closer.startswith(self.piece(closer_ids[0])) and self.piece(closer_ids[0]):
+            return closer_ids[0]
+        return self.eos_token_id
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_width:], skip_special_tokens=True)
+        constrained = torch.full_like(scores, float('-inf'))
+        for row, text in enumerate(texts):
+            state = self.row_state(row, text)
+            token_id = self.eos_token_id if accepts(state) else self.next_token(text, state, scores[row])
+            constrained[row, token_id] = 0
+        return constrained
+
+
+def extraction_result(answer: str, structured: bool = False) -> Dict[str, Any]:
+    """
+    Parsed extraction for one model answer.
+
+    A structured answer cut off by max_new_tokens is closed first, so it always parses.
+    """
+    if structured:
+        answer = close_extraction(answer)
+        entities, relationships = to_tuples(json.loads(answer))
+    else:
+        entities, relationships = parse_extraction_output(answer)
+    return {
+        "raw_output": answer,
+        "entities": entities,
+        "relationships": relationships,
+        "has_entities": len(entities) > 0
+    }
+
+
+def error_result(error: Exception) -> Dict[str, Any]:
+    return {
+        "raw_output": "",
+        "entities": [],
+        "relationships": [],
+        "has_entities": False,
+        "error": str(error)
+    }
+
+
+def encode_within(tokenizer, build, text: str, max_length: Optional[int], **tokenize_kwargs) -> List[int]:
+    """
+    Token ids of build(text), with the article content shortened until they fit max_length.
+
+    Only the content is cut, so the prompt still ends with its 'Output:' cue.
+    """
+    content = prompt_content(text)
+    ids = tokenizer(build(content), **tokenize_kwargs)['input_ids']
+    while max_length and len(ids) > max_length and content:
+        content_ids = tokenizer(content, add_special_tokens=False)['input_ids']
+        keep = max(0, len(content_ids) - (len(ids) - max_length))
+        shorter = tokenizer.decode(content_ids[:keep], skip_special_tokens=True).strip()
+        # Decoding can round-trip to the same text; drop characters instead
+        content = shorter if len(shorter) < len(content) else content[:len(content) // 2]
+        ids = tokenizer(build(content), **tokenize_kwargs)['input_ids']
+    return ids
+
+
+def build_prefix_cache(pipe, structured: bool = False) -> Dict[str, Any]:
+    """
+    Run the shared prompt prefix through the model once and keep its token ids and key/value cache.
+    """
+    model, tokenizer = pipe.model, pipe.tokenizer
+    prefix = ENTITY_EXTRACTION_JSON_PREFIX if structured else ENTITY_EXTRACTION_PREFIX
+    prefix_ids = tokenizer(prefix)['input_ids']
+
+    # The cached prefix is only exact if tokenizing the whole prompt does not merge across the boundary
+    sample_ids = tokenizer(prefix + create_entity_extraction_suffix("sample"))['input_ids']
+    if sample_ids[:len(prefix_ids)] != prefix_ids:
+        print("⚠️ Tokenizer merges across the prompt prefix boundary; cached outputs may differ slightly")
+
+    with torch.no_grad():
+        # An explicit DynamicCache, since older models (GPT-2) return the legacy tuple format otherwise
+        outputs = model(input_ids=torch.tensor([prefix_ids], device=model.device),
+                        past_key_values=DynamicCache(), use_cache=True)
+    print(f"🧠 Cached {len(prefix_ids)} prompt prefix tokens")
+    return {'prefix': prefix, 'input_ids': prefix_ids, 'past_key_values': outputs.past_key_values}
+
+
+def pad_after_prefix(prefix_ids: List[int], suffixes: List[List[int]], pad_token_id: int) -> Dict[str, Any]:
+    """
+    Rows of prefix + padding + suffix, with the padding masked out, so all suffixes end together.
+    """
+    width = max(len(ids) for ids in suffixes)
+    input_ids, attention_mask = [], []
+    for ids in suffixes:
+        padding = width - len(ids)
+        input_ids.append(prefix_ids + [pad_token_id] * padding + ids)
+        attention_mask.append([1] * len(prefix_ids) + [0] * padding + [1] * len(ids))
+    return {'input_ids': torch.tensor(input_ids), 'attention_mask': torch.tensor(attention_mask)}
+
+
+def generate_batch(model, tokenizer, input_ids: List[List[int]], max_new_tokens: int,
+                   prefix_cache: Optional[Dict[str, Any]] = None, structured: bool = False) -> List[str]:
+    """
+    Greedy-decode one batch and return only the new text of every row.
+
+    Without a prefix cache, input_ids are whole prompts and are left-padded.
+    With one, they are prompt suffixes and generation starts from a copy of the
+    cached prefix, expanded to the batch size. structured constrains every row
+    to the extraction JSON grammar.
+    """
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    generate_kwargs = {}
+    if prefix_cache is None:
+        inputs = tokenizer.pad({'input_ids': input_ids}, return_tensors='pt')
+    else:
+        inputs = pad_after_prefix(prefix_cache['input_ids'], input_ids, pad_token_id)
+        past_key_values = prefix_cache['past_key_values']
+        if isinstance(past_key_values, tuple):
+            past_key_values = DynamicCache.from_legacy_cache(past_key_values)
+        past_key_values = copy.deepcopy(past_key_values)
+        past_key_values.batch_repeat_interleave(len(input_ids))
+        generate_kwargs['past_key_values'] = past_key_values
+    inputs = {name: tensor.to(model.device) for name, tensor in inputs.items()}
+    if structured:
+        grammar = ExtractionGrammarProcessor(tokenizer, inputs['input_ids'].shape[1])
+        generate_kwargs['logits_processor'] = LogitsProcessorList([grammar])
+
+    with torch.no_grad():
+        outputs = model.generate(
+            **inputs,
+            **generate_kwargs,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            use_cache=True,
+            pad_token_id=pad_token_id,
+            eos_token_id=tokenizer.eos_token_id
+        )
+    return tokenizer.batch_decode(outputs[:, inputs['input_ids'].shape[1]:], skip_special_tokens=True)
+
+
+def extract_entities_batch(pipe, texts: List[str], batch_size: int = 8, max_new_tokens: int = 300,
+                           max_batch_tokens: int = 16384, max_length: Optional[int] = None,
+                           prefix_cache: Optional[Dict[str, Any]] = None, structured: bool = False,
+                           verbose: bool = True) -> List[Dict[str, Any]]:
+    """
+    Extract entities and relationships from many texts with batched generation.
+
+    pipe is the notebook's text-generation pipeline (only its model and
+    tokenizer are used). With a prefix_cache from build_prefix_cache, only the
+    article suffixes are prefilled; it must be built with the same structured
+    setting. max_length caps the tokens of every prompt (prefix included) by
+    shortening its article content. A batch that fails, e.g. out of memory,
+    is split in half and retried; a single text that still fails gets an
+    error result.
+    """
+    model, tokenizer = pipe.model, pipe.tokenizer
+    prefix = ENTITY_EXTRACTION_JSON_PREFIX if structured else ENTITY_EXTRACTION_PREFIX
+    if prefix_cache is not None and prefix_cache['prefix'] != prefix:
+        raise ValueError(f"prefix_cache was built for the other output format; "
+                         f"rebuild it with build_prefix_cache(pipe, structured={structured})")
+
+    if prefix_cache is None:
+        prefix_length = 0
+        encoded = [encode_within(tokenizer, lambda content: prefix + create_entity_extraction_suffix(content),
+                                 text, max_length) for text in texts]
+    else:
+        prefix_length = len(prefix_cache['input_ids'])
+        budget = max_length - prefix_length if max_length else None
+        encoded = [encode_within(tokenizer, create_entity_extraction_suffix, text, budget, add_special_tokens=False)
+                   for text in texts]
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    pending = make_length_batches([prefix_length + len(ids) for ids in encoded], batch_size, max_batch_tokens)
+
+    # Decoder-only models must be padded on the left so generation continues the prompt
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = 'left'
+    try:
+        while pending:
+            batch = pending.pop(0)
+            try:
+                answers = generate_batch(model, tokenizer, [encoded[i] for i in batch], max_new_tokens,
+                                         prefix_cache, structured)
+            except Exception as e:
+                if len(batch) > 1:
+                    print(f"⚠️ Extraction batch of {len(batch)} failed ({e}); retrying in halves")
+                    if torch.cuda.is_available():
+                        torch.cuda.empty_cache()
+                    half = len(batch) // 2
+                    pending[:0] = [batch[:half], batch[half:]]
+                else:
+                    print(f"❌ Error in extraction: {e}")
+                    results[batch[0]] = error_result(e)
+                continue
+
+            for i, answer in zip(batch, answers):
+                results[i] = extraction_result(answer.strip(), structured)
+                if verbose:
+                    print(f"🔍 Raw model output: {results[i]['raw_output'][:200]}...")
+    finally:
+        tokenizer.padding_side = padding_side
+
+    return results
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Append-only JSONL result log for entity extraction runs.
+
+Each extraction result is appended to <name>.jsonl as one line, and a
+sidecar <name>.jsonl.idx records a hash of its title and the byte offset of
+its line. Checkpointing a record is therefore one append to each file, no
+matter how long the run has been going, and "has this title been extracted?"
+is answered from the index without parsing the log.
+
+On open, a log whose last write was interrupted is cut back to its last
+complete line and index entries missing after a crash are rebuilt from the
+log tail. compact() writes the legacy JSON array (indent=2) that the
+downstream scripts read; a legacy array found at that path without a log is
+imported once, so older runs can be resumed.
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, Any, Iterator, Optional, Set
+
+
+def title_key(title: str) -> str:
+    """
+    Index key of a title: the first 16 hex digits of the SHA-256 of the stripped title.
+    """
+    return hashlib.sha256((title or '').strip().encode('utf-8')).hexdigest()[:16]
+
+
+class ExtractionLog:
+    """
+    JSONL log of extraction results with a title-hash index, safe to resume after a crash.
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None, fsync_every: int = 1):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.path.with_name(self.path.name + '.idx')
+        self.fsync_every = fsync_every
+        self.written = 0
+        self.count = 0
+
+        if not self.path.exists() and legacy_path and Path(legacy_path).exists():
+            self._import_legacy(Path(legacy_path))
+
+        self._truncate_partial_line()
+        self.titles: Set[str] = set()
+        self.size = self._load_index()
+
+        self.f = open(self.path, 'ab')
+        self.index = open(self.index_path, 'a', encoding='utf-8')
+
+    def _import_legacy(self, legacy_path: Path):
+        """
+        Seed the log from an existing JSON array output (written by earlier runs).
+        """
+        try:
+            with legacy_path.open('r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not import {legacy_path.name}: {e}")
+            return
+        if not isinstance(records, list):
+            return
+
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        tmp_path.replace(self.path)
+        self.index_path.unlink(missing_ok=True)
+        print(f"📥 Imported {len(records)} records from {legacy_path.name}")
+
+    def _truncate_partial_line(self):
+        """
+        Cut the log back to its last complete line.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            end = size
+            # Walk back from the end to the last newline
+            while end > 0:
+                step = min(1 << 16, end)
+                f.seek(end - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    end = end - step + newline + 1
+                    break
+                end -= step
+            if end != size:
+                print(f"🩹 Dropping {size - end} bytes of an interrupted write from {self.path.name}")
+                f.truncate(end)
+
+    def _load_index(self) -> int:
+        """
+        Load title keys from the index, indexing any log lines it is missing; returns the log size.
+        """
+        log_size = self.path.stat().st_size if self.path.exists() else 0
+        indexed_end = 0
+        valid_bytes = 0
+        if self.index_path.exists():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if (not line.endswith('\n') or len(parts) != 3 or int(parts[1]) != indexed_end
+                            or int(parts[2]) > log_size):
+                        # Interrupted index write, or an entry for a line the log lost
+                        break
+                    self.titles.add(parts[0])
+                    self.count += 1
+                    indexed_end = int(parts[2])
+                    valid_bytes += len(line.encode('utf-8'))
+            with open(self.index_path, 'rb+') as f:
+                f.truncate(valid_bytes)
+
+        if indexed_end < log_size:
+            rebuilt = 0
+            with open(self.path, 'rb') as log, open(self.index_path, 'a', encoding='utf-8') as index:
+                log.seek(indexed_end)
+                offset = indexed_end
+                for line in log:
+                    record = json.loads(line)
+                    key = title_key(record.get('title'))
+                    self.titles.add(key)
+                    self.count += 1
+                    index.write(f"{key}\t{offset}\t{offset + len(line)}\n")
+                    offset += len(line)
+                    rebuilt += 1
+            print(f"🔁 Indexed {rebuilt} records missing from {self.index_path.name}")
+        return log_size
+
+    def __contains__(self, title: str) -> bool:
+        return title_key(title) in self.titles
+
+    def append(self, record: Dict[str, Any]):
+        """
+        Append one result: a line in the log, then its entry in the index.
+        """
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        offset = self.size
+        self.f.write(line)
+        self.size += len(line)
+        self.written += 1
+        if self.fsync_every and self.written % self.fsync_every == 0:
+            self.sync()
+
+        key = title_key(record.get('title'))
+        self.index.write(f"{key}\t{offset}\t{self.size}\n")
+        self.titles.add(key)
+        self.count += 1
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.index.flush()
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every logged record in order.
+        """
+        self.f.flush()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def compact(self, output_path: str) -> int:
+        """
+        Write all records as the legacy JSON array (UTF-8, indent=2), atomically; returns the record count.
+        """
+        output_path = Path(output_path)
+        tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+        count = 0
+        with tmp_path.open('w', encoding='utf-8') as f:
+            f.write('[')
+            for record in self.records():
+                body = json.dumps(record, ensure_ascii=False, indent=2)
+                f.write((',\n' if count else '\n') + '  ' + body.replace('\n', '\n  '))
+                count += 1
+            f.write('\n]\n' if count else ']\n')
+        tmp_path.replace(output_path)
+        return count
+
+    def close(self):
+        self.sync()
+        self.f.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Output structure for constrained (structured) entity/relationship extraction.
+
+Constrained extraction answers with exactly one JSON object
+
+    {"entities": [{"text": ..., "type": ...}, ...],
+     "relationships": [[subject, relation, object], ...]}
+
+the shape the Ollama notebook's few-shot example already uses.
+EXTRACTION_SCHEMA is that structure as a JSON schema (for Ollama's `format`
+option), and EXTRACTION_PATTERN is the same grammar as a regular expression
+for token-level constraints on a Hugging Face model: is_valid_prefix tells
+whether a partial output can still be completed, and is_complete whether it
+has closed, so generation can stop right there.
+
+Checking a growing output against the regex costs time in its full length at
+every step, so decoding uses the same grammar as a small character automaton
+instead: advance(state, text) moves a parser state over new text only, and
+accepts(state) tells whether the object has closed.
+
+String lengths and list sizes are bounded, so a constrained model cannot
+ramble inside the structure. An output cut off by the token budget is closed
+with the shortest completion (close_extraction), so it always parses;
+entities and relationships left with empty fields are dropped by to_tuples.
+"""
+
+import json
+from typing import Dict, List, Tuple, Any, FrozenSet, Optional
+
+import regex
+
+
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "entities": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string"},
+                    "type": {"type": "string"}
+                },
+                "required": ["text", "type"]
+            }
+        },
+        "relationships": {
+            "type": "array",
+            "items": {
+                "type": "array",
+                "items": {"type": "string"},
+                "minItems": 3,
+                "maxItems": 3
+            }
+        }
+    },
+    "required": ["entities", "relationships"]
+}
+
+MAX_STRING_LENGTH = 200
+MAX_ITEMS = 50
+
+_WS = r'[ ]?'
+_STRING = rf'"(?:[^"\\\x00-\x1f]|\\["\\/bfnrt]){{0,{MAX_STRING_LENGTH}}}"'
+_ENTITY = rf'\{{{_WS}"text"{_WS}:{_WS}{_STRING}{_WS},{_WS}"type"{_WS}:{_WS}{_STRING}{_WS}\}}'
+_RELATIONSHIP = rf'\[{_WS}{_STRING}{_WS},{_WS}{_STRING}{_WS},{_WS}{_STRING}{_WS}\]'
+
+
+def _list(item: str) -> str:
+    return rf'\[{_WS}(?:{item}(?:{_WS},{_WS}{item}){{0,{MAX_ITEMS - 1}}})?{_WS}\]'
+
+
+EXTRACTION_PATTERN = regex.compile(
+    rf'{_WS}\{{{_WS}"entities"{_WS}:{_WS}{_list(_ENTITY)}{_WS},'
+    rf'{_WS}"relationships"{_WS}:{_WS}{_list(_RELATIONSHIP)}{_WS}\}}'
+)
+
+# Every state of a partial output is completed by (a suffix of) one of these
+_TEMPLATES = [
+    '{"entities": [], "relationships": []}',
+    '{"entities": [{"text": "", "type": ""}], "relationships": []}',
+    '{"entities": [{"text": "", "type": ""}], "relationships": [["", "", ""]]}',
+]
+_CLOSERS = sorted({template[i:] for template in _TEMPLATES for i in range(len(template) + 1)}, key=len)
+
+
+def _compile_program() -> List[tuple]:
+    """
+    EXTRACTION_PATTERN as a list of automaton instructions.
+
+    'lit' consumes one fixed character, 'ws' an optional space and 'str' a
+    whole JSON string; 'begin_list', 'more' and 'next_item' are epsilon moves
+    that count list items against MAX_ITEMS.
+    """
+    program = []
+
+    def sequence(spec: str):
+        # '_' is an optional space, '$' a string, anything else a literal character
+        for char in spec:
+            program.append(('ws',) if char == '_' else ('str',) if char == '$' else ('lit', char))
+
+    def item_list(item: str):
+        sequence('[_')
+        begin = len(program)
+        program.append(None)
+        sequence(item)
+        more = len(program)
+        program.append(None)
+        sequence('_,_')
+        program.append(('next_item', begin + 1))
+        end = len(program)
+        sequence('_]')
+        program[begin] = ('begin_list', end)
+        program[more] = ('more', end)
+
+    sequence('_{_"entities"_:_')
+    item_list('{_"text"_:_$_,_"type"_:_$_}')
+    sequence('_,_"relationships"_:_')
+    item_list('[_$_,_$_,_$_]')
+    sequence('_}')
+    program.append(('end',))
+    return program
+
+
+_PROGRAM = _compile_program()
+_CONSUMING = ('lit', 'ws', 'str', 'end')
+
+# A parser state is a set of (instruction, list items, string length or None, inside an escape)
+ParserState = FrozenSet[Tuple[int, int, Optional[int], bool]]
+
+
+def _closure(states) -> ParserState:
+    """
+    The states reachable from states by epsilon moves, keeping only those that consume input.
+    """
+    stack = list(states)
+    seen = set()
+    while stack:
+        state = stack.pop()
+        if state in seen:
+            continue
+        seen.add(state)
+        pc, items, _, _ = state
+        op = _PROGRAM[pc]
+        if op[0] == 'ws':
+            stack.append((pc + 1, items, None, False))
+        elif op[0] == 'begin_list':
+            stack.append((pc + 1, 1, None, False))
+            stack.append((op[1], 0, None, False))
+        elif op[0] == 'more':
+            if items < MAX_ITEMS:
+                stack.append((pc + 1, items, None, False))
+            stack.append((op[1], items, None, False))
+        elif op[0] == 'next_item':
+            stack.append((op[1], items + 1, None, False))
+    return frozenset(state for state in seen if _PROGRAM[state[0]][0] in _CONSUMING)
+
+
+def _step(states: ParserState, char: str) -> ParserState:
+    moved = []
+    for pc, items, length, escaped in states:
+        op = _PROGRAM[pc]
+        if op[0] == 'lit':
+            if char == op[1]:
+                moved.append((pc + 1, items, None, False))
+        elif op[0] == 'ws':
+            if char == ' ':
+                moved.append((pc + 1, items, None, False))
+        elif op[0] == 'str':
+            if length is None:
+                if char == '"':
+                    moved.append((pc, items, 0, False))
+            elif escaped:
+                if char in '"\\/bfnrt':
+                    moved.append((pc, items, length + 1, False))
+            elif char == '"':
+                moved.append((pc + 1, items, None, False))
+            elif length < MAX_STRING_LENGTH and char == '\\':
+                moved.append((pc, items, length, True))
+            elif length < MAX_STRING_LENGTH and char >= '\x20':
+                moved.append((pc, items, length + 1, False))
+    return _closure(moved)
+
+
+INITIAL_STATE: ParserState = _closure([(0, 0, None, False)])
+
+
+def advance(state: ParserState, text: str) -> ParserState:
+    """
+    Parser state after text; empty once text can no longer be completed.
+    """
+    for char in text:
+        if not state:
+            break
+        state = _step(state, char)
+    return state
+
+
+def accepts(state: ParserState) -> bool:
+    """
+    True if the parsed text is a complete extraction object.
+    """
+    return any(_PROGRAM[pc][0] == 'end' for pc, _, _, _ in state)
+
+
+def is_valid_prefix(text: str) -> bool:
+    """
+    True if text can still be completed to a valid extraction object.
+    """
+    return EXTRACTION_PATTERN.fullmatch(text, partial=True) is not None
+
+
+def is_complete(text: str) -> bool:
+    """
+    True if text is a complete extraction object (nothing more may follow).
+    """
+    return EXTRACTION_PATTERN.fullmatch(text) is not None
+
+
+def close_extraction(text: str) -> str:
+    """
+    Shortest completion of a valid partial output (e.g. one cut off by max_new_tokens).
+    """
+    if is_complete(text):
+        return text
+    # An unfinished escape sequence needs its character first
+    backslashes = len(text) - len(text.rstrip('\\'))
+    prefixes = ['n'] if backslashes % 2 else ['']
+    for prefix in prefixes:
+        for closer in _CLOSERS:
+            if is_complete(text + prefix + closer):
+                return text + prefix + closer
+    return _TEMPLATES[0]
+
+
+def parse_structured_output(text: str) -> Dict[str, Any]:
+    """
+    Decode a (closed) constrained output into {'entities': [...], 'relationships': [...]}.
+    """
+    return json.loads(close_extraction(text))
+
+
+def to_tuples(parsed: Dict[str, Any]) -> Tuple[List[Tuple], List[Tuple]]:
+    """
+    Entities as (text, type) and relationships as (subject, relation, object) tuples,
+    the format parse_extraction_output returns; items with empty fields are dropped.
+    """
+    entities = []
+    for entity in parsed.get('entities', []):
+        text, entity_type = entity.get('text', '').strip(), entity.get('type', '').strip()
+        if text and entity_type:
+            entities.append((text, entity_type))
+
+    relationships = []
+    for relationship in parsed.get('relationships', []):
+        parts = tuple(part.strip() for part in relationship)
+        if len(parts) == 3 and all(parts):
+            relationships.append(parts)
+    return entities, relationships
+
+
+def to_structured(entities: List[Tuple], relationships: List[Tuple]) -> Dict[str, Any]:
+    """
+    Inverse of to_tuples, used to render few-shot example answers.
+    """
+    return {
+        'entities': [{'text': entity[0], 'type': entity[1]} for entity in entities],
+        'relationships': [list(relationship[:3]) for relationship in relationships]
+    }
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Pluggable HTML parsing backends for the scrapers.
+
+Both backends expose the same small interface (parse, select, text, attr) and
+compile every CSS selector once, on first use:
+
+- 'lxml': lxml.html tree with selectors translated to compiled XPath by
+  cssselect. Parsing and selection run in C; on the saved Symantec listing
+  parsing is ~15x and full extraction ~5x faster than html.parser
+  (see benchmark_html_parsing.py). Needs the cssselect package.
+- 'bs4': BeautifulSoup with precompiled soupsieve selectors, the behaviour the
+  notebook scrapers have always had.
+
+text() matches BeautifulSoup's get_text(strip=True), including skipping
+script/style/template contents below the selected element, so both backends
+extract identical fields.
+"""
+
+from typing import Dict, Any, List, Optional, Union
+
+import soupsieve
+from bs4 import BeautifulSoup, UnicodeDammit
+
+try:
+    import lxml.html
+    from lxml import etree
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    CSSSelector = None
+
+
+class BeautifulSoupBackend:
+    """
+    BeautifulSoup trees queried with precompiled soupsieve selectors.
+    """
+
+    name = 'bs4'
+
+    def __init__(self, parser: str = 'html.parser'):
+        self.parser = parser
+        self.compiled: Dict[str, Any] = {}
+
+    def parse(self, body: Union[bytes, str]) -> BeautifulSoup:
+        return BeautifulSoup(body, self.parser)
+
+    def compile(self, selector: str):
+        if selector not in self.compiled:
+            self.compiled[selector] = soupsieve.compile(selector)
+        return self.compiled[selector]
+
+    def select(self, doc, selector: str) -> List[Any]:
+        return self.compile(selector).select(doc)
+
+    def text(self, element) -> str:
+        return element.get_text(strip=True)
+
+    def attr(self, element, name: str) -> Optional[str]:
+        value = element.get(name)
+        return value if isinstance(value, str) else None
+
+
+class LxmlBackend:
+    """
+    lxml.html trees queried with cssselect selectors compiled to XPath.
+    """
+
+    name = 'lxml'
+
+    # Text nodes as BeautifulSoup's get_text sees them (no script/style/template contents)
+    _TEXT = etree.XPath(
+        'descendant-or-self::text()[not(ancestor::script or ancestor::style or ancestor::template)]',
+        smart_strings=False
+    ) if CSSSelector is not None else None
+    # A selected template keeps its own text, minus nested script/style
+    _TEMPLATE_TEXT = etree.XPath(
+        'descendant::text()[not(ancestor::script or ancestor::style)]', smart_strings=False
+    ) if CSSSelector is not None else None
+
+    def __init__(self):
+        if CSSSelector is None:
+            raise ImportError("the lxml backend needs lxml and cssselect (pip install lxml cssselect)")
+        self.compiled: Dict[str, Any] = {}
+
+    def parse(self, body: Union[bytes, str]):
+        if isinstance(body, bytes):
+            try:
+                body = body.decode('utf-8')
+            except UnicodeDecodeError:
+                body = UnicodeDammit(body).unicode_markup
+        if not body.strip():
+            body = '<html></html>'
+        try:
+            return lxml.html.document_fromstring(body)
+        except ValueError:
+            # Unicode input with an XML encoding declaration; let lxml decode it
+            return lxml.html.document_fromstring(body.encode('utf-8'))
+
+    def compile(self, selector: str):
+        if selector not in self.compiled:
+            self.compiled[selector] = CSSSelector(selector, translator='html')
+        return self.compiled[selector]
+
+    def select(self, doc, selector: str) -> List[Any]:
+        return self.compile(selector)(doc)
+
+    def text(self, element) -> str:
+        # Like get_text, a selected script or style element returns its own contents
+        if element.tag in ('script', 'style'):
+            return (element.text or '').strip()
+        parts = self._TEMPLATE_TEXT(element) if element.tag == 'template' else self._TEXT(element)
+        return ''.join(part.strip() for part in parts)
+
+    def attr(self, element, name: str) -> Optional[str]:
+        return element.get(name)
+
+
+BACKENDS = {'lxml': LxmlBackend, 'bs4': BeautifulSoupBackend}
+
+
+def create_backend(name: Optional[str] = None):
+    """
+    Backend by name; by default lxml when installed, otherwise BeautifulSoup.
+    """
+    if name is None:
+        name = 'lxml' if CSSSelector is not None else 'bs4'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HTML backend {name!r} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP response cache for the scrapers.
+
+Bodies are stored zlib-compressed in SQLite, keyed by URL, together with the
+validators (ETag / Last-Modified) needed for conditional GETs. Parse results
+derived from a body (article links, extracted content) are stored next to it
+and stay valid until the body changes, so a 304 response needs no re-parse.
+
+Responses marked Cache-Control: no-store are never kept. no-cache responses
+are stored, since every cached URL is revalidated before its body is reused.
+Once the compressed bodies outgrow max_bytes, the URLs validated longest ago
+are evicted first.
+"""
+
+import json
+import time
+import zlib
+import sqlite3
+from pathlib import Path
+from typing import Dict, Any, Optional, Set
+
+
+def cache_directives(headers: Dict[str, str]) -> Set[str]:
+    """
+    Lower-cased Cache-Control directive names of a response, without their values.
+    """
+    value = headers.get('Cache-Control') or ''
+    return {directive.split('=', 1)[0].strip().lower() for directive in value.split(',') if directive.strip()}
+
+
+class HttpCache:
+    """
+    SQLite-backed URL -> (validators, compressed body, parse results) store.
+    """
+
+    def __init__(self, path: str = '../data/cache/http_cache.sqlite', compress_level: int = 6,
+                 max_bytes: int = 512 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compress_level = compress_level
+        self.max_bytes = max_bytes
+        self.bytes_saved = 0
+
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                validated_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS parsed (
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (url, kind)
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_validated_at ON responses (validated_at)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        If-None-Match / If-Modified-Since headers for a cached URL (empty if unknown).
+        """
+        row = self.conn.execute(
+            "SELECT etag, last_modified FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return {}
+
+        headers = {}
+        if row[0]:
+            headers['If-None-Match'] = row[0]
+        if row[1]:
+            headers['If-Modified-Since'] = row[1]
+        return headers
+
+    def get_body(self, url: str) -> Optional[bytes]:
+        """
+        Decompressed cached body of url, or None.
+        """
+        row = self.conn.execute("SELECT body FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0])
+
+    def put(self, url: str, headers: Dict[str, str], body: bytes):
+        """
+        Store a fresh 200 response; parse results of the previous body are dropped.
+        """
+        self.delete(url)
+        if 'no-store' in cache_directives(headers):
+            self.conn.commit()
+            return
+
+        now = time.time()
+        compressed = zlib.compress(body, self.compress_level)
+        self.conn.execute(
+            "INSERT INTO responses (url, etag, last_modified, body, size, fetched_at, validated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, headers.get('ETag'), headers.get('Last-Modified'), compressed, len(body), now, now)
+        )
+        self.total_bytes += len(compressed)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        self.conn.commit()
+
+    def delete(self, url: str):
+        """
+        Forget the response and parse results stored for url.
+        """
+        row = self.conn.execute("SELECT LENGTH(body) FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is not None:
+            self.total_bytes -= row[0]
+            self.conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+        self.conn.execute("DELETE FROM parsed WHERE url = ?", (url,))
+
+    def evict(self):
+        """
+        Drop the least recently validated responses until the cache fits its budget.
+        """
+        # Leave some headroom so eviction does not run on every insert
+        target = int(self.max_bytes * 0.9)
+        cursor = self.conn.execute("SELECT url, LENGTH(body) FROM responses ORDER BY validated_at ASC")
+        doomed = []
+        for url, size in cursor:
+            if self.total_bytes <= target:
+                break
+            doomed.append((url,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM responses WHERE url = ?", doomed)
+        self.conn.executemany("DELETE FROM parsed WHERE url = ?", doomed)
+
+    def touch(self, url: str) -> Optional[bytes]:
+        """
+        Record a 304 revalidation and return the cached body.
+        """
+        self.conn.execute("UPDATE responses SET validated_at = ? WHERE url = ?", (time.time(), url))
+        self.conn.commit()
+        body = self.get_body(url)
+        if body is not None:
+            self.bytes_saved += len(body)
+        return body
+
+    def get_parsed(self, url: str, kind: str) -> Optional[Any]:
+        """
+        Parse result of the given kind for the current body of url, or None.
+        """
+        row = self.conn.execute(
+            "SELECT value FROM parsed WHERE url = ? AND kind = ?", (url, kind)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_parsed(self, url: str, kind: str, value: Any):
+        """
+        Remember a parse result for the current body of url.
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO parsed (url, kind, value) VALUES (?, ?, ?)",
+            (url, kind, json.dumps(value, ensure_ascii=False))
+        )
+        self.conn.commit()
+
+    def close(self):
+        """
+        Flush pending writes and close the database.
+        """
+        self.conn.commit()
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Single-pass indicator-of-compromise (IOC) scanner.
+
+All indicator types are alternatives of one precompiled regex, so a text is
+scanned once instead of once per type; a lookahead rejects ordinary words
+before any alternative is tried. Every match becomes a typed span
+{'type', 'value', 'raw', 'start', 'end'}: raw is the text as written, value
+the refanged indicator ('hxxp://evil[.]com' -> 'http://evil.com') and start/end
+are character offsets into the scanned text.
+
+Candidates are validated before they are reported: IPv4 octets must be
+0-255, hex strings must be exactly MD5/SHA1/SHA256 length and domains may not
+end in a file extension (so 'payload.exe' is not a domain). At one position
+the longer, more specific type wins (a URL swallows its domain, an e-mail
+address its host). The one exception is the host of a URL, which is also
+reported as its own ip_address or domain span.
+
+Very large texts can be scanned in chunks with scan_stream, which cuts only
+at whitespace (indicators never contain any) and keeps offsets absolute.
+"""
+
+import re
+from typing import Dict, Any, List, Iterable, Iterator, Optional
+
+
+# Indicator types, in the order ThreatIntelligenceProcessor reports them
+IOC_TYPES = ['ip_address', 'domain', 'hash_md5', 'hash_sha1', 'hash_sha256', 'cve', 'email', 'url']
+
+HASH_TYPES = {32: 'hash_md5', 40: 'hash_sha1', 64: 'hash_sha256'}
+
+# Last labels that are file names rather than domains
+FILE_EXTENSIONS = {
+    'exe', 'dll', 'sys', 'scr', 'msi', 'bat', 'cmd', 'ps1', 'vbs', 'vbe', 'js', 'jse', 'wsf', 'hta', 'lnk',
+    'jar', 'py', 'sh', 'bin', 'dat', 'tmp', 'log', 'ini', 'cfg', 'conf', 'json', 'xml', 'csv', 'txt',
+    'doc', 'docx', 'docm', 'xls', 'xlsx', 'xlsm', 'ppt', 'pptx', 'pdf', 'rtf', 'rar', 'gz', 'tar', 'tgz',
+    'iso', 'img', 'vhd', 'png', 'jpg', 'jpeg', 'gif', 'svg', 'html', 'htm', 'php', 'asp', 'aspx', 'jsp'
+}
+
+# Defanged separators: '.', '[.]', '(.)', '{.}', '[dot]', '(dot)'
+_DOT = r'(?:\.|\[\.\]|\(\.\)|\{\.\}|\[dot\]|\(dot\))'
+_LABEL = r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?'
+_HOSTNAME = rf'{_LABEL}(?:{_DOT}{_LABEL})*{_DOT}[a-z]{{2,63}}'
+_IPV4 = rf'\d{{1,3}}(?:{_DOT}\d{{1,3}}){{3}}'
+
+_SCHEME = r'(?:h(?:tt|xx)ps?|ftp|fxp)(?::|\[:\])//'
+
+IOC_PATTERN = re.compile(
+    rf"""
+    # A word boundary, or a scheme glued onto the end of the previous URL
+    (?:\b|(?={_SCHEME}))
+    # Cheap necessary condition, so ordinary words fail before any alternative is tried
+    (?=[\w%+-]*[.\[({{@:]|[a-f0-9]{{32}}|cve-)
+    (?:
+        (?P<url>
+            {_SCHEME}
+            (?:(?P<url_ip>{_IPV4})|(?P<url_domain>{_HOSTNAME}))
+            (?::\d{{1,5}})?
+            # Path up to whitespace, quotes or brackets (but through '[.]'), or the next glued-on URL
+            (?:[/?\#](?:(?!{_SCHEME})(?:[^\s<>"'()\[\]{{}}\\“”‘’]|\[\.\]))*)?
+        )
+        | (?P<cve>CVE-\d{{4}}-\d{{4,7}}\b)
+        | (?P<hash>[a-f0-9]{{32,64}}\b)
+        | (?P<ip_address>{_IPV4}\b)
+        | (?P<email>[a-z0-9._%+-]+(?:@|\[@\]|\[at\]|\(at\)){_HOSTNAME}\b)
+        | (?P<domain>{_HOSTNAME}\b)
+    )
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+
+_REFANG = [
+    (re.compile(r'^hxxp', re.IGNORECASE), 'http'),
+    (re.compile(r'^fxp', re.IGNORECASE), 'ftp'),
+    (re.compile(r'\[\.\]|\(\.\)|\{\.\}|\[dot\]|\(dot\)', re.IGNORECASE), '.'),
+    (re.compile(r'\[:\]'), ':'),
+    (re.compile(r'\[@\]|\[at\]|\(at\)', re.IGNORECASE), '@'),
+]
+
+# Punctuation that ends a sentence rather than a URL
+_URL_TRAILING = '.,;:!?'
+
+
+def refang(value: str) -> str:
+    """
+    Undo common defanging: hxxp -> http, [.] / (.) / [dot] -> '.', [@] / [at] -> '@'.
+    """
+    for pattern, replacement in _REFANG:
+        value = pattern.sub(replacement, value)
+    return value
+
+
+def _validate(kind: str, value: str) -> str:
+    """
+    Indicator type of a refanged candidate after validation, or '' to drop it.
+    """
+    if kind == 'hash':
+        return HASH_TYPES.get(len(value), '')
+    if kind == 'ip_address':
+        return kind if all(int(octet) <= 255 for octet in value.split('.')) else ''
+    if kind == 'domain':
+        return kind if value.rsplit('.', 1)[-1].lower() not in FILE_EXTENSIONS else ''
+    return kind
+
+
+def _span(kind: str, raw: str, start: int, end: int) -> Optional[Dict[str, Any]]:
+    """
+    Validated, refanged span of a candidate, or None.
+    """
+    value = refang(raw)
+    kind = _validate(kind, value)
+    if not kind:
+        return None
+    if kind in ('domain', 'email'):
+        value = value.lower()
+    elif kind == 'cve':
+        value = value.upper()
+    return {'type': kind, 'value': value, 'raw': raw, 'start': start, 'end': end}
+
+
+def scan(text: str, offset: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Typed IOC spans of text in order of position; offset is added to start/end.
+    """
+    for match in IOC_PATTERN.finditer(text):
+        kind = match.lastgroup
+        raw = match.group()
+        start, end = match.start() + offset, match.end() + offset
+        if kind == 'url':
+            stripped = raw.rstrip(_URL_TRAILING)
+            end -= len(raw) - len(stripped)
+            raw = stripped
+
+        span = _span(kind, raw, start, end)
+        if span is not None:
+            yield span
+
+        if kind == 'url':
+            host, host_kind = ('url_ip', 'ip_address') if match.group('url_ip') else ('url_domain', 'domain')
+            span = _span(host_kind, match.group(host), match.start(host) + offset, match.end(host) + offset)
+            if span is not None:
+                yield span
+
+
+def scan_stream(chunks: Iterable[str], max_carry: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """
+    Scan text arriving in chunks (e.g. a large file read piecewise) with absolute offsets.
+
+    Each chunk is scanned up to its last whitespace and the rest is carried
+    into the next one, so no indicator is split; a carry that grows past
+    max_carry characters without whitespace is scanned as is.
+    """
+    carry = ''
+    offset = 0
+    for chunk in chunks:
+        buffer = carry + chunk
+        cut = max(buffer.rfind(' '), buffer.rfind('\n'), buffer.rfind('\t'), buffer.rfind('\r')) + 1
+        if cut == 0 and len(buffer) > max_carry:
+            cut = len(buffer)
+        yield from scan(buffer[:cut], offset)
+        offset += cut
+        carry = buffer[cut:]
+    if carry:
+        yield from scan(carry, offset)
+
+
+def group_indicators(spans: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    {type: distinct values in order of first occurrence}, with every type present.
+    """
+    grouped = {kind: {} for kind in IOC_TYPES}
+    for span in spans:
+        grouped[span['type']][span['value']] = None
+    return {kind: list(values) for kind, values in grouped.items()}
+
+
+def extract_indicators(text: str) -> Dict[str, List[str]]:
+    """
+    Distinct refanged indicators of every type, in the format of
+    ThreatIntelligenceProcessor.extract_indicators.
+    """
+    return group_indicators(scan(text))
@@ -1,189 +1,249 @@
 #!/usr/bin/env python3
 """
-Script to merge two JSON files from the raw directory with specific formatting rules.
+Script to merge the JSON files from the raw directory with specific formatting rules.
+
+Records are streamed one at a time from each raw file (incremental JSON
+decoding), formatted with process_record, deduplicated by link and written
+straight to the output, so memory stays constant however large the raw dumps
+grow. The output is the JSON array the notebooks and the classifier read
+(data/processed/merged_threat_intelligence.json), or JSONL for an output path
+ending in .jsonl. Seen links are kept as 16-byte digests in a temporary
+SQLite table instead of an in-memory set.
 """
 
+import sys
 import json
-import re
+import sqlite3
+import hashlib
+import tempfile
+import argparse
 from pathlib import Path
-from urllib.parse import urlparse
-from typing import List, Dict, Any
+from typing import Dict, Any, Iterator, Optional
+
+# json_stream and article_store live at the repository root, next to the classifier
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from json_stream import iter_records, JsonlWriter
+# The merged format is defined next to the store, which serves it to readers too
+from article_store import ArticleStore, process_record
 
-def parse_security_title_from_url(url: str) -> str:
+
+class LinkSet:
     """
-    Parse title from security.com URL.
-    Example: "security.com/threat-intelligence/espionage-asia-governments" 
-    -> "espionage asia governments"
+    Set of seen links stored on disk as 16-byte digests (a temporary SQLite file by default).
     """
-    try:
-        # Extract the path part after the domain
-        parsed_url = urlparse(url)
-        path = parsed_url.path
-        
-        # Remove leading slash and split by '/'
-        path_parts = path.strip('/').split('/')
-        
-        # Find the last part that contains the title
-        if len(path_parts) >= 2:
-            # Get the last part (e.g., "espionage-asia-governments")
-            title_part = path_parts[-1]
-            
-            # Replace hyphens with spaces
-            title = title_part.replace('-', ' ')
-            
-            return title
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            self.tmp = tempfile.NamedTemporaryFile(suffix='.sqlite', delete=False)
+            self.tmp.close()
+            path = self.tmp.name
         else:
-            return "Unknown Title"
-            
-    except Exception as e:
-        print(f"Error parsing title from URL {url}: {e}")
-        return "Unknown Title"
+            self.tmp = None
+        self.path = Path(path)
 
-def extract_content_text(content: Any) -> str:
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS links (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+
+    def add(self, link: str) -> bool:
+        """
+        Add a link; True if it was not seen before.
+        """
+        digest = hashlib.blake2b(link.encode('utf-8'), digest_size=16).digest()
+        return self.conn.execute("INSERT OR IGNORE INTO links VALUES (?)", (digest,)).rowcount == 1
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+        if self.tmp is not None:
+            self.path.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+
+class JsonArrayWriter:
     """
-    Extract text content from various content formats.
+    Write records as one JSON array, element by element (for readers that need the legacy format).
+
+    The array is built in a .tmp file next to output_file and only replaces it
+    once closed without an error, so a failed merge leaves the previous output.
     """
-    if isinstance(content, list):
-        # Join all paragraphs with spaces
-        return ' '.join([str(item) for item in content if item])
-    elif isinstance(content, str):
-        return content
-    else:
-        return str(content) if content else ""
 
-def process_record(record: Dict[str, Any]) -> Dict[str, str]:
+    def __init__(self, output_file: str):
+        self.path = Path(output_file)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self.f = self.tmp_path.open('w', encoding='utf-8')
+        self.f.write('[')
+        self.written = 0
+
+    def write(self, record: Dict[str, Any]):
+        self.f.write(',\n  ' if self.written else '\n  ')
+        self.f.write(json.dumps(record, ensure_ascii=False))
+        self.written += 1
+
+    def close(self):
+        self.f.write('\n]' if self.written else ']')
+        self.f.close()
+        self.tmp_path.replace(self.path)
+
+    def abort(self):
+        """
+        Drop the unfinished array, leaving any earlier output_file as it was.
+        """
+        self.f.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def iter_file_records(file_path: Path) -> Iterator[Dict[str, Any]]:
     """
-    Process a single record according to the specified rules.
+    Stream the raw records of one file, reporting (not raising) a file that is cut short or invalid.
     """
-    url = record.get('url', '')
-    title = record.get('title', '')
-    content = record.get('content', '')
-    
-    # Extract content text
-    content_text = extract_content_text(content)
-    
-    # Apply parsing rules
-    if 'fortinet.com' in url:
-        # Parse normally - use original title
-        final_title = title
-    elif 'security.com' in url or title == 'Main menu':
-        # Parse title from URL
-        final_title = parse_security_title_from_url(url)
-    else:
-        # Use original title for other cases
-        final_title = title
-    
-    return {
-        "title": final_title,
-        "content": content_text,
-        "link": url
-    }
+    count = 0
+    try:
+        for record in iter_records(str(file_path)):
+            count += 1
+            yield record
+    except (ValueError, OSError) as e:
+        print(f"  Error processing {file_path} after {count} records: {e}")
+    print(f"  Processed {count} records")
 
-def merge_json_files() -> List[Dict[str, str]]:
+
+def merge_json_files(output_file: str = None, link_db: Optional[str] = None,
+                     store: Optional[ArticleStore] = None) -> Dict[str, Any]:
     """
-    Merge the two JSON files from the raw directory.
+    Stream-merge the JSON files from the raw directory into output_file.
+
+    Output is a JSON array, written one record at a time, unless output_file
+    ends in .jsonl. Records without a link are never treated as duplicates.
+    With a store, every raw record is also archived in it as it streams past.
+    Returns merge statistics with the first few records as samples.
     """
+    if output_file is None:
+        output_file = 'data/processed/merged_threat_intelligence.json'
+
     raw_dir = Path('data/raw')
     
     # Find JSON files
-    json_files = list(raw_dir.glob('threat_intelligence_multi_source_*.json'))
+    json_files = sorted(raw_dir.glob('threat_intelligence_multi_source_*.json')) + \
+        sorted(raw_dir.glob('threat_intelligence_multi_source_*.jsonl'))
     
     if len(json_files) < 2:
         print(f"Found {len(json_files)} JSON files, need at least 2")
-        return []
+        return {}
     
     print(f"Found {len(json_files)} JSON files to merge:")
     for file in json_files:
         print(f"  - {file.name}")
-    
-    all_records = []
-    
-    for file_path in json_files:
-        print(f"\nProcessing {file_path.name}...")
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            print(f"  Loaded {len(data)} records")
-            
-            # Process each record
-            for record in data:
-                processed_record = process_record(record)
-                
-                # Only add records with valid content
-                if processed_record['content'].strip():
-                    all_records.append(processed_record)
-            
-            print(f"  Processed {len(data)} records")
-            
-        except Exception as e:
-            print(f"  Error processing {file_path}: {e}")
-            continue
-    
-    print(f"\nTotal processed records: {len(all_records)}")
-    return all_records
 
-def save_merged_data(records: List[Dict[str, str]], output_file: str = None):
-    """
-    Save merged data to JSON file.
-    """
-    if output_file is None:
-        output_file = 'data/processed/merged_threat_intelligence.json'
-    
-    # Create output directory if it doesn't exist
-    output_path = Path(output_file)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(records, f, indent=2, ensure_ascii=False)
+    stats = {'read': 0, 'written': 0, 'empty': 0, 'duplicates': 0,
+             'fortinet': 0, 'security': 0, 'other': 0, 'samples': [], 'output_file': output_file}
+    if Path(output_file).suffix == '.jsonl':
+        writer = JsonlWriter(output_file, append=False)
+    else:
+        writer = JsonArrayWriter(output_file)
+    seen_links = LinkSet(link_db)
+    try:
+        with writer:
+            for file_path in json_files:
+                print(f"\nProcessing {file_path.name}...")
+                
+                for record in iter_file_records(file_path):
+                    stats['read'] += 1
+                    if store is not None:
+                        store.put(record)
+                    processed_record = process_record(record)
+                    
+                    # Only add records with valid content, once per link
+                    if not processed_record['content'].strip():
+                        stats['empty'] += 1
+                        continue
+                    link = processed_record['link']
+                    if link and not seen_links.add(link):
+                        stats['duplicates'] += 1
+                        continue
+                    
+                    writer.write(processed_record)
+                    stats['written'] += 1
+                    if 'fortinet.com' in processed_record['link']:
+                        stats['fortinet'] += 1
+                    elif 'security.com' in processed_record['link']:
+                        stats['security'] += 1
+                    else:
+                        stats['other'] += 1
+                    if len(stats['samples']) < 3:
+                        stats['samples'].append(processed_record)
+    finally:
+        seen_links.close()
     
-    print(f"\n💾 Saved merged data to: {output_path}")
-    print(f"📊 Total records: {len(records)}")
+    print(f"\nTotal processed records: {stats['written']}")
+    print(f"\n💾 Saved merged data to: {output_file}")
+    return stats
 
 def main():
     """
     Main function to merge JSON files.
     """
+    parser = argparse.ArgumentParser(description="Stream-merge raw threat intelligence files")
+    parser.add_argument('--output', default='data/processed/merged_threat_intelligence.json',
+                        help='Output file (JSON array, or JSONL if it ends in .jsonl)')
+    parser.add_argument('--link-db', default=None,
+                        help='SQLite file for seen links (default: temporary file)')
+    parser.add_argument('--store', default=None,
+                        help='Also archive the raw records in this article store directory')
+    args = parser.parse_args()
+
     print("🔄 MERGING JSON FILES")
     print("="*50)
     
     # Merge the files
-    merged_records = merge_json_files()
+    store = ArticleStore(args.store) if args.store else None
+    try:
+        stats = merge_json_files(args.output, args.link_db, store)
+    finally:
+        if store is not None:
+            store.close()
     
-    if merged_records:
-        # Save the merged data
-        save_merged_data(merged_records)
-        
+    if stats.get('written'):
         # Show some examples
         print("\n📋 SAMPLE RECORDS:")
         print("="*30)
         
-        for i, record in enumerate(merged_records[:3]):
+        for i, record in enumerate(stats['samples']):
             print(f"\nRecord {i+1}:")
             print(f"  Title: {record['title'][:80]}...")
             print(f"  Link: {record['link']}")
             print(f"  Content length: {len(record['content'])} chars")
             print(f"  Content preview: {record['content'][:100]}...")
         
-        if len(merged_records) > 3:
-            print(f"\n... and {len(merged_records) - 3} more records")
+        if stats['written'] > 3:
+            print(f"\n... and {stats['written'] - 3} more records")
         
         # Statistics
-        print(f"\n📊 STATISTICS:")
+        print("\n📊 STATISTICS:")
         print("="*20)
         
-        fortinet_count = sum(1 for r in merged_records if 'fortinet.com' in r['link'])
-        security_count = sum(1 for r in merged_records if 'security.com' in r['link'])
-        other_count = len(merged_records) - fortinet_count - security_count
-        
-        print(f"Fortinet records: {fortinet_count}")
-        print(f"Security.com records: {security_count}")
-        print(f"Other records: {other_count}")
-        print(f"Total records: {len(merged_records)}")
+        print(f"Fortinet records: {stats['fortinet']}")
+        print(f"Security.com records: {stats['security']}")
+        print(f"Other records: {stats['other']}")
+        print(f"Duplicate links skipped: {stats['duplicates']}")
+        print(f"Empty records skipped: {stats['empty']}")
+        print(f"Total records: {stats['written']}")
         
     else:
         print("❌ No records to merge")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
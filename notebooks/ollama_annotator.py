@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Concurrent entity/relationship annotation of the corpus through the Ollama HTTP API.
+
+The Ollama notebook used to annotate one record at a time with hand-edited
+run_batch(start, size) calls. OllamaAnnotator keeps `concurrency` chat
+requests in flight per Ollama host with ollama.AsyncClient (start the server
+with OLLAMA_NUM_PARALLEL >= concurrency so they are actually served in
+parallel). Work is every record index not yet annotated, optionally split
+into num_shards disjoint shards (index % num_shards == shard_id) for several
+machines, and spread over all hosts from one queue.
+
+Failed requests (connection errors, timeouts, 429/5xx) are retried with
+full-jitter exponential backoff. Each result is appended to a JSONL log as
+soon as it completes, tagged with its record index, so an interrupted run
+resumes with exactly the missing indices. compact() merges the logs into
+the JSON array the notebook's merge step writes.
+
+With structured=True every request carries the extraction JSON schema
+(extraction_schema.EXTRACTION_SCHEMA) as Ollama's `format`, so the server
+constrains sampling to a parseable {entities, relationships} object and the
+answer ends as soon as the object closes.
+
+The hosts are plain URLs, so a local mock of /api/chat stands in for
+Ollama in tests (tests/test_ollama_annotator.py).
+
+    python ollama_annotator.py --model llama3 --concurrency 4 --host http://localhost:11434
+"""
+
+import os
+import re
+import sys
+import json
+import random
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Set
+
+import httpx
+from ollama import AsyncClient, ResponseError
+
+from extraction_schema import EXTRACTION_SCHEMA
+
+# article_store lives at the repository root, next to the classifier
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from article_store import iter_input
+
+
+logger = logging.getLogger("extraction")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULT_HOST = os.getenv('OLLAMA_HOST', 'http://localhost:11434')
+
+
+# Prompts (optimized: fewer few-shots, shorter content)
+SYSTEM_PROMPT = """Please identify the following types of entities and then extract the relationships between these extracted entities: malware(e.g., 'Stuxnet'), threat type (e.g.,'ransomware’),… If there are no entities and relationships pertaining to the specified types, please state 'No related entities and relations'. Make sure to follow the output format shown in the following example.
+"""
+
+USER_TEMPLATE = "Title: {title}\nLink: {link}\nContent:\n{content}\n\nReturn JSON only."
+
+# Reduced few-shot examples (only 1 for speed)
+FEW_SHOT_EXAMPLES = [
+    {
+        "title": "Example Title",
+        "link": "example.com",
+        "content": "APT29 uses Mimikatz to exploit CVE-2019-1234 in Windows.",
+        "output": {
+            "entities": [{"text": "APT29", "type": "ThreatActor"}, {"text": "Mimikatz", "type": "Tool"}, {"text": "CVE-2019-1234", "type": "CVE"}, {"text": "Windows", "type": "Platform"}],
+            "relationships": [["APT29", "uses", "Mimikatz"], ["Mimikatz", "exploits", "CVE-2019-1234"], ["APT29", "targets", "Windows"]]
+        }
+    }
+]
+
+
+def build_prompt(title, link, content):
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    for ex in FEW_SHOT_EXAMPLES:
+        messages.append({"role": "user", "content": USER_TEMPLATE.format(**ex)})
+        messages.append({"role": "assistant", "content": json.dumps(ex['output'])})
+    messages.append({"role": "user", "content": USER_TEMPLATE.format(title=title, link=link, content=content)})
+    return messages
+
+
+# Fixed safe_parse_json (more robust: extract JSON block if extra text)
+def safe_parse_json(s: str) -> Optional[Dict[str, Any]]:
+    try:
+        # Find largest JSON object
+        match = re.search(r'\{[\s\S]*\}', s)
+        if match:
+            return json.loads(match.group(0))
+        return json.loads(s)
+    except json.JSONDecodeError as e:
+        logger.warning(f"JSON parse error: {e}")
+        return None
+
+
+# Fixed normalize_output (less strict, keep originals, convert rel to dict)
+def normalize_output(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    # Models sometimes answer with other JSON values or null fields; keep only well-formed items
+    if not isinstance(parsed, dict): parsed = {}
+    entities = parsed.get("entities") or []
+    relationships = parsed.get("relationships") or []
+
+    norm_entities: List[Dict[str, str]] = []
+    seen_e = set()
+    for e in entities:
+        if not isinstance(e, dict): continue
+        text, etype = e.get("text"), e.get("type")
+        if not isinstance(text, str) or not isinstance(etype, str): continue
+        text, etype = text.strip(), etype.strip()  # No capitalization
+        if text and etype and (text, etype) not in seen_e:
+            seen_e.add((text, etype))
+            norm_entities.append({"text": text, "type": etype})
+
+    norm_rels: List[Dict[str, str]] = []
+    seen_r = set()
+    for r in relationships:
+        if not isinstance(r, list) or len(r) != 3: continue
+        if not all(isinstance(x, str) for x in r): continue
+        sub, pred, obj = [x.strip() for x in r]
+        if sub and pred and obj:
+            tuple_r = (sub, pred, obj)
+            if tuple_r not in seen_r:
+                seen_r.add(tuple_r)
+                norm_rels.append({"subject": sub, "predicate": pred, "object": obj})
+
+    return {"entities": norm_entities, "relationships": norm_rels}
+
+
+def annotation_record(index: int, rec: Dict[str, Any], model_name: str, raw: str) -> Dict[str, Any]:
+    """
+    Result for one corpus record, in run_batch's format plus its corpus index.
+    """
+    parsed = safe_parse_json(raw) or {"entities": [], "relationships": []}
+    norm = normalize_output(parsed)
+    return {
+        "index": index,
+        "title": rec.get("title", ""),
+        "link": rec.get("link", ""),
+        "content": rec.get("content", ""),
+        "extraction": {
+            "model": model_name,
+            "raw_output": raw,
+            "entities": norm["entities"],
+            "relationships": norm["relationships"]
+        }
+    }
+
+
+def load_completed(log_path: Path) -> Set[int]:
+    """
+    Indices already annotated in a JSONL log, after cutting off a line left half-written by a crash.
+    """
+    if not log_path.exists():
+        return set()
+
+    completed = set()
+    valid_bytes = 0
+    with open(log_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                completed.add(json.loads(line)['index'])
+            except (ValueError, KeyError):
+                break
+            valid_bytes += len(line)
+
+    if valid_bytes != log_path.stat().st_size:
+        logger.warning(f"Dropping incomplete tail of {log_path.name}")
+        with open(log_path, 'rb+') as f:
+            f.truncate(valid_bytes)
+    return completed
+
+
+def shard_indices(total: int, num_shards: int = 1, shard_id: int = 0,
+                  completed: Iterable[int] = ()) -> List[int]:
+    """
+    Record indices of one shard (index % num_shards == shard_id) that are not yet annotated.
+    """
+    if not 0 <= shard_id < num_shards:
+        raise ValueError(f"shard_id must be in [0, {num_shards}), got {shard_id}")
+    completed = set(completed)
+    return [i for i in range(shard_id, total, num_shards) if i not in completed]
+
+
+def log_path_for(output_dir: str, model_name: str, num_shards: int = 1, shard_id: int = 0) -> Path:
+    shard = f"_shard{shard_id}of{num_shards}" if num_shards > 1 else ""
+    return Path(output_dir) / f"extractions_{model_name.replace('/', '_').replace(':', '_')}{shard}.jsonl"
+
+
+class OllamaAnnotator:
+    """
+    Annotate corpus records with a bounded number of concurrent Ollama chat requests per host.
+    """
+
+    def __init__(self, model_name: str = 'llama3', hosts: Optional[List[str]] = None, concurrency: int = 4,
+                 max_retries: int = 3, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 timeout: float = 600.0, options: Optional[Dict[str, Any]] = None, fsync_every: int = 10,
+                 structured: bool = False):
+        self.model_name = model_name
+        self.hosts = hosts or [DEFAULT_HOST]
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.options = options
+        # JSON schema the server constrains answers to
+        self.format = EXTRACTION_SCHEMA if structured else None
+        self.fsync_every = fsync_every
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'written': 0}
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Full-jitter exponential backoff.
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def chat(self, client: AsyncClient, messages: List[Dict[str, str]]) -> Optional[str]:
+        """
+        One chat completion with retries; None once every attempt has failed.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.stats['requests'] += 1
+            try:
+                response = await client.chat(model=self.model_name, messages=messages, options=self.options,
+                                             format=self.format)
+                return response['message']['content']
+            except ResponseError as e:
+                if e.status_code not in RETRY_STATUSES:
+                    logger.error(f"Ollama request failed: {e}")
+                    return None
+                error = e
+            except (ConnectionError, httpx.TransportError, asyncio.TimeoutError) as e:
+                error = e
+
+            logger.warning(f"Ollama request failed (attempt {attempt + 1}/{self.max_retries + 1}): {error}")
+            if attempt == self.max_retries:
+                return None
+            self.stats['retries'] += 1
+            await asyncio.sleep(self.backoff(attempt))
+        return None
+
+    async def run(self, data: List[Dict[str, Any]], log_path: Path, num_shards: int = 1,
+                  shard_id: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Annotate every missing record of the shard, appending results to log_path as they complete.
+
+        Records whose requests fail are left out of the log and picked up by the next run.
+        """
+        log_path = Path(log_path)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        completed = load_completed(log_path)
+        todo = shard_indices(len(data), num_shards, shard_id, completed)
+        if limit is not None:
+            todo = todo[:limit]
+        logger.info(f"{len(completed)} records already in {log_path.name}, {len(todo)} to annotate "
+                    f"({self.concurrency} in flight x {len(self.hosts)} host(s))")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for index in todo:
+            queue.put_nowait(index)
+
+        out = open(log_path, 'a', encoding='utf-8')
+
+        def write(record: Dict[str, Any]):
+            # Workers share one event loop, so whole lines never interleave
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            self.stats['written'] += 1
+            if self.fsync_every and self.stats['written'] % self.fsync_every == 0:
+                os.fsync(out.fileno())
+            if self.stats['written'] % 10 == 0 or self.stats['written'] == len(todo):
+                logger.info(f"Annotated {self.stats['written']}/{len(todo)}")
+
+        async def worker(client: AsyncClient):
+            while True:
+                try:
+                    index = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                rec = data[index]
+                messages = build_prompt(rec.get("title", ""), rec.get("link", ""), rec.get("content", ""))
+                try:
+                    raw = await self.chat(client, messages)
+                except Exception as e:
+                    logger.error(f"Annotation of record {index} failed: {e}")
+                    raw = None
+                if raw is None:
+                    self.stats['failures'] += 1
+                    continue
+                write(annotation_record(index, rec, self.model_name, raw))
+
+        clients = [AsyncClient(host=host, timeout=self.timeout) for host in self.hosts]
+        try:
+            await asyncio.gather(*(worker(client) for client in clients for _ in range(self.concurrency)))
+        finally:
+            out.flush()
+            os.fsync(out.fileno())
+            out.close()
+
+        missing = len(shard_indices(len(data), num_shards, shard_id, load_completed(log_path)))
+        self.stats['missing'] = missing
+        return dict(self.stats)
+
+
+def compact(log_paths: Iterable[Path], output_path: str) -> int:
+    """
+    Merge annotation logs into one JSON array ordered by corpus index (without the index field).
+    """
+    records = {}
+    for log_path in log_paths:
+        load_completed(Path(log_path))
+        with open(log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                records[record.pop('index')] = record
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump([records[i] for i in sorted(records)], f, ensure_ascii=False, indent=2)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate the corpus concurrently through Ollama")
+    parser.add_argument('--input', default='data/raw/merged_threat_intelligence.json',
+                        help='Merged JSON / JSONL file, or an article store directory')
+    parser.add_argument('--output-dir', default='data/entity-extraction')
+    parser.add_argument('--model', default='llama3')
+    parser.add_argument('--host', action='append', default=None,
+                        help='Ollama server URL; repeat to spread requests over several servers')
+    parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight per host')
+    parser.add_argument('--num-shards', type=int, default=1)
+    parser.add_argument('--shard-id', type=int, default=0)
+    parser.add_argument('--max-retries', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=600.0, help='Seconds per request')
+    parser.add_argument('--limit', type=int, default=None, help='Annotate at most this many records')
+    parser.add_argument('--structured', action='store_true',
+                        help='Constrain answers to the {entities, relationships} JSON schema')
+    parser.add_argument('--compact', default=None,
+                        help='After the run, merge all shard logs into this JSON array file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    data = list(iter_input(args.input))
+
+    annotator = OllamaAnnotator(args.model, args.host, args.concurrency,
+                                max_retries=args.max_retries, timeout=args.timeout, structured=args.structured)
+    log_path = log_path_for(args.output_dir, args.model, args.num_shards, args.shard_id)
+    stats = asyncio.run(annotator.run(data, log_path, args.num_shards, args.shard_id, args.limit))
+    print(f"✅ {stats['written']} annotated, {stats['failures']} failed, {stats['retries']} retries; "
+          f"{stats['missing']} still missing in {log_path}")
+
+    if args.compact:
+        shard_logs = [log_path_for(args.output_dir, args.model, args.num_shards, shard)
+                      for shard in range(args.num_shards)]
+        count = compact([p for p in shard_logs if p.exists()], args.compact)
+        print(f"💾 Merged {count} records into {args.compact}")
+
+
+if __name__ == "__main__":
+    main()
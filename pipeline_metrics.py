@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing, throughput and latency metrics for the classification pipeline.
+
+Stages (load, rules, LLM tokenize/generate/decode, save, ...) accumulate wall
+time in a process-wide collector; stages timed inside pool workers are
+captured there and merged into the parent's collector with the results.
+Per-article latency is the duration of the
+classify call that produced the article, measured where it runs (also inside
+pool workers); every article of a batched call (fast model, cascade LLM)
+gets that batch's duration. Cache hits and duplicates have no latency. The
+report can be saved as JSON and, when prometheus-client is installed, in the
+Prometheus text exposition format.
+"""
+
+import sys
+import json
+import math
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+try:
+    from prometheus_client import CollectorRegistry, Gauge, write_to_textfile
+except ImportError:
+    CollectorRegistry = None
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    """
+    Peak resident set size of this process (or of its children) in MB.
+
+    Windows reports the peak working set through psutil. Elsewhere
+    getrusage gives the peak of this process and of its finished children;
+    without either, the current RSS from psutil is the best estimate.
+    """
+    if psutil is not None and not children:
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        if peak is not None:
+            return peak / (1024 * 1024)
+
+    if resource is not None:
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB on Linux
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+    if psutil is not None:
+        process = psutil.Process()
+        processes = process.children(recursive=True) if children else [process]
+        return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+    return 0.0
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class PipelineMetrics:
+    """
+    Accumulates stage timings and per-article latencies for one run.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.latencies: List[float] = []
+        self.classify_seconds = 0.0
+        self.documents = 0
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block and add it to the named stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float, count: int = 1):
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'count': 0})
+        entry['seconds'] += seconds
+        entry['count'] += count
+
+    @contextmanager
+    def capture(self):
+        """
+        Collect the stages timed in a block into a separate dict (yielded) instead of this run's totals.
+        """
+        stages = self.stages
+        self.stages = captured = {}
+        try:
+            yield captured
+        finally:
+            self.stages = stages
+
+    def merge_stages(self, stages: Dict[str, Dict[str, float]]):
+        """
+        Add stage timings collected elsewhere, e.g. by capture() in a pool worker.
+        """
+        for name, entry in stages.items():
+            self.add(name, entry['seconds'], entry['count'])
+
+    def add_latency(self, seconds: float, count: int = 1):
+        """
+        Record one classify call that produced count articles, each with the call's duration as latency.
+        """
+        self.classify_seconds += seconds
+        self.latencies.extend([seconds] * count)
+
+    def result_done(self):
+        """
+        Record one finished article (classified, cached or duplicate).
+        """
+        self.documents += 1
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summary of the run so far as a JSON-serialisable dict.
+        """
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        classify_seconds = self.classify_seconds
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'elapsed_seconds': round(elapsed, 4),
+            'documents': self.documents,
+            'classified': len(latencies),
+            'docs_per_second': round(self.documents / elapsed, 2) if elapsed else 0.0,
+            # Per worker when classification runs in a process pool
+            'classify_docs_per_second': round(len(latencies) / classify_seconds, 2) if classify_seconds else 0.0,
+            'latency_seconds': {
+                'mean': round(sum(latencies) / len(latencies), 6) if latencies else 0.0,
+                'p50': round(percentile(latencies, 50), 6),
+                'p95': round(percentile(latencies, 95), 6),
+                'p99': round(percentile(latencies, 99), 6),
+                'max': round(latencies[-1], 6) if latencies else 0.0
+            },
+            'stages': {
+                name: {'seconds': round(entry['seconds'], 4), 'count': int(entry['count'])}
+                for name, entry in self.stages.items()
+            },
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'peak_children_rss_mb': round(peak_rss_mb(children=True), 1)
+        }
+
+    def save_json(self, output_file: str) -> Dict[str, Any]:
+        """
+        Write the report to a JSON file and return it.
+        """
+        report = self.report()
+        path = Path(output_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📈 Saved pipeline metrics to {path}")
+        return report
+
+    def save_prometheus(self, output_file: str, job: str = 'threat_classification') -> bool:
+        """
+        Write the report in Prometheus text format (e.g. for a node_exporter textfile collector).
+
+        Returns False if prometheus-client is not installed.
+        """
+        if CollectorRegistry is None:
+            print("⚠️ prometheus-client not installed - skipping Prometheus metrics")
+            return False
+
+        report = self.report()
+        registry = CollectorRegistry()
+        labels = {'job': job}
+
+        def gauge(name, documentation, value, extra_labels=None):
+            extra_labels = extra_labels or {}
+            metric = Gauge(name, documentation, list(labels) + list(extra_labels), registry=registry)
+            metric.labels(**labels, **extra_labels).set(value)
+
+        gauge('pipeline_documents', 'Articles classified in the run', report['documents'])
+        gauge('pipeline_elapsed_seconds', 'Wall time of the run', report['elapsed_seconds'])
+        gauge('pipeline_docs_per_second', 'End-to-end throughput', report['docs_per_second'])
+        gauge('pipeline_peak_rss_megabytes', 'Peak resident set size', report['peak_rss_mb'])
+
+        latency = Gauge('pipeline_article_latency_seconds', 'Per-article latency percentiles',
+                        list(labels) + ['quantile'], registry=registry)
+        for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+            latency.labels(**labels, quantile=quantile).set(report['latency_seconds'][key])
+
+        stage_seconds = Gauge('pipeline_stage_seconds', 'Wall time spent per stage',
+                              list(labels) + ['stage'], registry=registry)
+        stage_calls = Gauge('pipeline_stage_calls', 'Number of timed calls per stage',
+                            list(labels) + ['stage'], registry=registry)
+        for name, entry in report['stages'].items():
+            stage_seconds.labels(**labels, stage=name).set(entry['seconds'])
+            stage_calls.labels(**labels, stage=name).set(entry['count'])
+
+        path = Path(output_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_to_textfile(str(path), registry)
+        print(f"📈 Saved Prometheus metrics to {path}")
+        return True
+
+    def print_summary(self):
+        report = self.report()
+        latency = report['latency_seconds']
+        print("\n⏱️ Pipeline metrics:")
+        print(f"   - Documents: {report['documents']} in {report['elapsed_seconds']:.1f}s "
+              f"({report['docs_per_second']:.1f} docs/sec)")
+        print(f"   - Latency p50/p95/p99: {latency['p50'] * 1000:.1f} / {latency['p95'] * 1000:.1f} / "
+              f"{latency['p99'] * 1000:.1f} ms")
+        for name, entry in sorted(report['stages'].items(), key=lambda x: x[1]['seconds'], reverse=True):
+            print(f"   - {name}: {entry['seconds']:.2f}s over {entry['count']} calls")
+        print(f"   - Peak RSS: {report['peak_rss_mb']:.0f} MB")
+
+
+# Process-wide collector shared by every stage of the pipeline
+METRICS = PipelineMetrics()
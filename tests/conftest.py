@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# Modules live at the repository root and in notebooks/, neither of which is a package
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT, ROOT / 'notebooks'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
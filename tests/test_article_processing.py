@@ -0,0 +1,112 @@
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('nltk')
+
+import article_processing
+from article_processing import (DataValidator, ThreatIntelligenceProcessor, export_for_llm_training,
+                                postprocess_to_jsonl, process_and_validate)
+
+
+# Input articles and what the collection notebook's own processor, validator
+# and export produced for them, before they moved into article_processing.
+# Indicator lists are sorted (the notebook returned them in set order) and
+# hash-based ids, timestamps and file names are left out.
+FIXTURE = json.loads((Path(__file__).parent / 'fixtures' / 'notebook_article_processing.json').read_text(encoding='utf-8'))
+
+
+@pytest.fixture(autouse=True)
+def stop_words():
+    try:
+        article_processing.load_stop_words()
+    except LookupError:
+        pytest.skip('NLTK stopwords corpus is not installed')
+
+
+def comparable(processed):
+    processed = dict(processed)
+    processed.pop('processed_at')
+    processed['quality_report'] = {k: v for k, v in processed['quality_report'].items() if k != 'validation_timestamp'}
+    processed['indicators'] = sorted_indicators(processed['indicators'])
+    return processed
+
+
+def sorted_indicators(indicators):
+    return {kind: sorted(values) for kind, values in indicators.items()}
+
+
+def test_processing_matches_the_notebook():
+    processed = [comparable(process_and_validate(article)) for article in FIXTURE['articles']]
+    assert [record.pop('processing_version') for record in processed] == ['1.1'] * len(processed)
+    expected = [dict(record) for record in FIXTURE['processed']]
+    for record in expected:
+        assert record.pop('processing_version') == '1.0'
+    assert processed == expected
+
+
+def test_separate_processor_and_validator_match_the_pool_path():
+    processor, validator = ThreatIntelligenceProcessor(), DataValidator()
+    for article, expected in zip(FIXTURE['articles'], FIXTURE['processed']):
+        record = processor.process_article(article)
+        record['quality_report'] = validator.generate_quality_report(record)
+        assert comparable(record)['quality_report'] == expected['quality_report']
+
+
+def test_export_matches_the_notebook(tmp_path):
+    approved = [record for record in map(process_and_validate, FIXTURE['articles'])
+                if record['quality_report']['overall']['approved']]
+    summary = export_for_llm_training(approved, tmp_path)
+    files = {kind: Path(path) for kind, path in summary['files_created'].items()}
+    assert all(path.parent == tmp_path for path in files.values())
+    expected = FIXTURE['export']
+
+    training = json.loads(files['llm_training'].read_text(encoding='utf-8'))
+    for entry in training:
+        assert entry.pop('id').startswith(entry['source'] + '_')
+        entry['metadata']['indicators'] = sorted_indicators(entry['metadata']['indicators'])
+    assert training == expected['llm_training']
+
+    graph = json.loads(files['knowledge_graph'].read_text(encoding='utf-8'))
+    entity_ids = {entity.pop('id') for entity in graph['entities']}
+    assert {relation.pop('target') for relation in graph['relations']} == entity_ids
+    assert graph['documents'] == expected['knowledge_graph']['documents']
+    for key in ('entities', 'relations'):
+        assert sorted(map(json.dumps, graph[key])) == sorted(map(json.dumps, expected['knowledge_graph'][key]))
+
+    lines = [json.loads(line) for line in files['jsonl_format'].read_text(encoding='utf-8').splitlines()]
+    for line in lines:
+        line['indicators'] = sorted_indicators(line['indicators'])
+    assert lines == expected['jsonl']
+
+    assert {'total_articles': summary['total_articles'], 'sources': sorted(summary['sources']),
+            'total_entities': summary['total_entities'], 'total_relations': summary['total_relations'],
+            'statistics': summary['statistics']} == expected['summary']
+
+
+def test_indicators_are_validated_and_refanged():
+    # The notebook's regexes reported capture-group fragments as domains and cut URLs at the first digit
+    record = process_and_validate({'title': 'Dropper', 'source': 'CISA', 'url': 'https://a.com/1',
+                                   'content': 'The dropper fetched hxxp://176.65.137[.]203/music-play.exe '
+                                              'and then payload.exe from update-check[.]net.'})
+    assert record['indicators']['url'] == ['http://176.65.137.203/music-play.exe']
+    assert record['indicators']['ip_address'] == ['176.65.137.203']
+    assert record['indicators']['domain'] == ['update-check.net']
+
+
+@pytest.mark.parametrize('suffix', ['.json', '.jsonl'])
+def test_postprocess_to_jsonl_streams_either_input_format(tmp_path, suffix):
+    input_file = tmp_path / f'articles{suffix}'
+    if suffix == '.jsonl':
+        input_file.write_text(''.join(json.dumps(article) + '\n' for article in FIXTURE['articles']), encoding='utf-8')
+    else:
+        input_file.write_text(json.dumps(FIXTURE['articles']), encoding='utf-8')
+
+    output_file = tmp_path / 'processed.jsonl'
+    stats = postprocess_to_jsonl(article_processing.iter_records(str(input_file)), str(output_file))
+    written = [json.loads(line) for line in output_file.read_text(encoding='utf-8').splitlines()]
+    approved = [record for record in FIXTURE['processed'] if record['quality_report']['overall']['approved']]
+    assert stats['processed'] == len(FIXTURE['articles'])
+    assert stats['written'] == len(approved) and stats['rejected'] == len(FIXTURE['articles']) - len(approved)
+    assert [record['url'] for record in written] == [record['url'] for record in approved]
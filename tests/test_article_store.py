@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from article_store import ArticleStore, iter_input, process_record
+
+
+def article(link, title, content, date=None, source='Fortinet'):
+    record = {'url': link, 'title': title, 'content': content, 'source': source}
+    if date is not None:
+        record['date'] = date
+    return record
+
+
+def test_hashes_put_undated_articles_last(tmp_path):
+    store = ArticleStore(str(tmp_path / 'store'), compression='gzip')
+    undated = store.put(article('https://a.com/u', 'U', 'u'))
+    newer = store.put(article('https://a.com/n', 'N', 'n', '2025-02-01'))
+    older = store.put(article('https://a.com/o', 'O', 'o', '2024-02-01'))
+    try:
+        assert store.hashes() == [older, newer, undated]
+        assert store.hashes(since='2025-01-01') == [newer]
+    finally:
+        store.close()
+
+
+def test_iter_input_reads_latest_merged_records_from_a_store(tmp_path):
+    root = str(tmp_path / 'store')
+    store = ArticleStore(root, compression='gzip')
+    store.put(article('https://www.fortinet.com/blog/a', 'A', ['one'], '2025-01-01'))
+    store.put(article('https://www.fortinet.com/blog/a', 'A', ['one', 'two'], '2025-01-01'))
+    store.put(article('https://www.fortinet.com/blog/empty', 'Empty', [], '2025-01-02'))
+    store.put(article('https://www.security.com/threat-intelligence/foo-bar', 'Main menu', 'x',
+                      '2024-01-01', source='Symantec'))
+    store.close()
+
+    assert list(iter_input(root)) == [
+        {'title': 'foo bar', 'content': 'x', 'link': 'https://www.security.com/threat-intelligence/foo-bar'},
+        {'title': 'A', 'content': 'one two', 'link': 'https://www.fortinet.com/blog/a'},
+    ]
+    assert [record['title'] for record in iter_input(root, source='Symantec')] == ['foo bar']
+
+
+def test_iter_input_reads_files(tmp_path):
+    records = [process_record(article('https://a.com/1', 'One', ['a', 'b']))]
+    path = tmp_path / 'merged.json'
+    path.write_text(json.dumps(records), encoding='utf-8')
+    assert list(iter_input(str(path))) == [{'title': 'One', 'content': 'a b', 'link': 'https://a.com/1'}]
+
+
+def test_iter_input_does_not_create_a_store_at_a_mistyped_path(tmp_path):
+    missing = tmp_path / 'stor'
+    with pytest.raises(FileNotFoundError):
+        list(iter_input(str(missing)))
+    assert not missing.exists()
+
+    with pytest.raises(ValueError):
+        list(iter_input(str(missing), source='Fortinet'))
+    assert not missing.exists()
+
+    # An existing directory that is not a store is not mistaken for an empty one
+    (tmp_path / 'plain').mkdir()
+    with pytest.raises(FileNotFoundError):
+        list(iter_input(str(tmp_path / 'plain')))
+    assert list((tmp_path / 'plain').iterdir()) == []
+
+
+def test_read_only_store_reads_but_does_not_write(tmp_path):
+    root = str(tmp_path / 'store')
+    store = ArticleStore(root, compression='gzip')
+    digest = store.put(article('https://a.com/1', 'One', 'a'))
+    store.close()
+
+    with pytest.raises(FileNotFoundError):
+        ArticleStore(str(tmp_path / 'missing'), read_only=True)
+    assert not (tmp_path / 'missing').exists()
+
+    reader = ArticleStore(root, read_only=True)
+    try:
+        assert digest in reader
+        with pytest.raises(PermissionError):
+            reader.put(article('https://a.com/2', 'Two', 'b'))
+    finally:
+        reader.close()
+    assert len([path for path in (tmp_path / 'store' / 'blobs').rglob('*') if path.is_file()]) == 1
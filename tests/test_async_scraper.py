@@ -0,0 +1,186 @@
+import time
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from async_scraper import AsyncFetcher
+from http_cache import HttpCache
+
+
+class Site:
+    """
+    Local stand-in host: records arrival times and the peak number of open requests,
+    and answers each path with the statuses queued for it (200 once they run out).
+    """
+
+    def __init__(self, delay=0.0, statuses=None):
+        self.delay = delay
+        self.statuses = statuses or {}
+        self.arrivals = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handle(self, request):
+        self.arrivals.append(time.monotonic())
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            queued = self.statuses.get(request.path)
+            status = queued.pop(0) if queued else 200
+            headers = {'Retry-After': '0'} if status == 429 else {}
+            return web.Response(status=status, text=f'page {request.path}', headers=headers)
+        finally:
+            self.in_flight -= 1
+
+
+def run(site, config, paths):
+    """
+    Fetch paths from a local server for site and return (responses, fetcher stats).
+    """
+    async def main():
+        app = web.Application()
+        app.router.add_get('/{name}', site.handle)
+        async with TestServer(app) as server:
+            config.setdefault('backoff_base', 0.0)
+            async with AsyncFetcher(config) as fetcher:
+                responses = await fetcher.fetch_all([str(server.make_url(path)) for path in paths])
+            return responses, fetcher.stats
+
+    return asyncio.run(main())
+
+
+def test_open_requests_per_host_are_capped():
+    site = Site(delay=0.05)
+    responses, stats = run(site, {'rate_limit': 0, 'max_concurrency_per_host': 2}, [f'/{i}' for i in range(6)])
+    assert [r['body'] for r in responses] == [f'page /{i}'.encode() for i in range(6)]
+    assert site.peak == 2
+    assert stats['requests'] == 6
+
+
+def test_token_bucket_paces_requests():
+    site = Site()
+    run(site, {'rate_limit': 0.05, 'burst': 1, 'max_concurrency_per_host': 5}, [f'/{i}' for i in range(5)])
+    gaps = [later - earlier for earlier, later in zip(site.arrivals, site.arrivals[1:])]
+    assert len(gaps) == 4
+    assert min(gaps) >= 0.04
+
+
+def test_rate_limited_and_server_errors_are_retried():
+    site = Site(statuses={'/a': [429, 503], '/b': [500]})
+    responses, stats = run(site, {'rate_limit': 0, 'max_retries': 3}, ['/a', '/b'])
+    assert [r['status'] for r in responses] == [200, 200]
+    assert stats['retries'] == 3 and stats['failures'] == 0
+    assert stats['requests'] == 5
+
+
+def test_retries_give_up_after_max_retries():
+    site = Site(statuses={'/a': [503] * 5})
+    responses, stats = run(site, {'rate_limit': 0, 'max_retries': 2}, ['/a'])
+    assert responses == [None]
+    assert stats['requests'] == 3 and stats['retries'] == 2 and stats['failures'] == 1
+
+
+def test_not_found_is_not_retried():
+    site = Site(statuses={'/missing': [404]})
+    responses, stats = run(site, {'rate_limit': 0, 'max_retries': 3}, ['/missing'])
+    assert responses == [None]
+    assert stats['requests'] == 1 and stats['retries'] == 0 and stats['failures'] == 1
+
+
+@pytest.fixture
+def http_cache(tmp_path):
+    cache = HttpCache(str(tmp_path / 'http_cache.sqlite'))
+    yield cache
+    cache.close()
+
+
+class Page:
+    """
+    Local page that honours If-None-Match and If-Modified-Since.
+    """
+
+    def __init__(self, etag=None, last_modified=None, cache_control=None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.cache_control = cache_control
+        self.body = 'version 1'
+        self.statuses = []
+
+    async def handle(self, request):
+        headers = {}
+        if self.etag:
+            headers['ETag'] = self.etag
+        if self.last_modified:
+            headers['Last-Modified'] = self.last_modified
+        if self.cache_control:
+            headers['Cache-Control'] = self.cache_control
+        unchanged = ((self.etag and request.headers.get('If-None-Match') == self.etag) or
+                     (self.last_modified and request.headers.get('If-Modified-Since') == self.last_modified))
+        status = 304 if unchanged else 200
+        self.statuses.append(status)
+        return web.Response(status=status, headers=headers, body=None if unchanged else self.body.encode())
+
+
+def fetch_twice(page, cache, change=None):
+    """
+    Fetch the page, let change(page) edit it, then fetch it again through the same cache.
+    """
+    async def main():
+        app = web.Application()
+        app.router.add_get('/', page.handle)
+        async with TestServer(app) as server:
+            url = str(server.make_url('/'))
+            async with AsyncFetcher({'rate_limit': 0, 'backoff_base': 0.0}, cache) as fetcher:
+                first = await fetcher.fetch(url)
+                if change:
+                    change(page)
+                second = await fetcher.fetch(url)
+            return first, second
+
+    return asyncio.run(main())
+
+
+def new_version(page):
+    page.body = 'version 2'
+    page.etag = page.etag and '"v2"'
+    page.last_modified = page.last_modified and 'Thu, 02 Jan 2025 00:00:00 GMT'
+
+
+@pytest.mark.parametrize('validators', [{'etag': '"v1"'}, {'last_modified': 'Wed, 01 Jan 2025 00:00:00 GMT'}])
+def test_not_modified_returns_the_cached_body(http_cache, validators):
+    page = Page(**validators)
+    first, second = fetch_twice(page, http_cache)
+    assert page.statuses == [200, 304]
+    assert not first['not_modified'] and second['not_modified']
+    assert second['body'] == first['body'] == b'version 1'
+
+
+@pytest.mark.parametrize('validators', [{'etag': '"v1"'}, {'last_modified': 'Wed, 01 Jan 2025 00:00:00 GMT'}])
+def test_a_changed_page_replaces_the_cached_body(http_cache, validators):
+    page = Page(**validators)
+    first, second = fetch_twice(page, http_cache, new_version)
+    assert page.statuses == [200, 200]
+    assert second['body'] == b'version 2' and not second['not_modified']
+    assert http_cache.get_body(second['url']) == b'version 2'
+
+
+def test_no_store_pages_are_fetched_in_full_every_time(http_cache):
+    page = Page(etag='"v1"', cache_control='no-store')
+    fetch_twice(page, http_cache)
+    assert page.statuses == [200, 200]
+    assert len(http_cache) == 0
+
+
+def test_an_evicted_entry_is_fetched_again_unconditionally(http_cache, monkeypatch):
+    page = Page(etag='"v1"')
+    # Keep the validators but lose the body, as if it was evicted mid-request
+    monkeypatch.setattr(http_cache, 'touch', lambda url: None)
+    first, second = fetch_twice(page, http_cache)
+    assert page.statuses == [200, 304, 200]
+    assert second['body'] == b'version 1' and not second['not_modified']
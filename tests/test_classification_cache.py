@@ -0,0 +1,105 @@
+import pytest
+
+from classification_cache import ClassificationCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ClassificationCache(tmp_path / 'cache.sqlite', commit_every=1)
+    yield cache
+    cache.close()
+
+
+def test_make_key_is_stable_and_order_independent():
+    assert (ClassificationCache.make_key('t', 'c', {'a': 1, 'b': 2})
+            == ClassificationCache.make_key('t', 'c', {'b': 2, 'a': 1}))
+    assert ClassificationCache.make_key('t', 'c', {'a': 1}) != ClassificationCache.make_key('t', 'c', {'a': 2})
+
+
+def test_get_and_put_count_hits_and_misses(cache):
+    assert cache.get('k') is None
+    cache.put('k', {'is_threat_report': True})
+    assert cache.get('k') == {'is_threat_report': True}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_replacing_an_entry_keeps_the_size_total(cache):
+    cache.put('k', {'v': 'x' * 10})
+    cache.put('k', {'v': 'y' * 10})
+    assert len(cache) == 1
+    assert cache.total_bytes == len('{"v": "' + 'y' * 10 + '"}')
+
+
+def test_evicts_least_recently_used_first(tmp_path):
+    cache = ClassificationCache(tmp_path / 'cache.sqlite', max_bytes=100, commit_every=1)
+    try:
+        cache.put('old', {'v': 'a' * 30})
+        cache.put('used', {'v': 'b' * 30})
+        cache.get('used')
+        cache.put('new', {'v': 'c' * 30})
+        assert cache.get('old') is None
+        assert cache.get('used') is not None
+        assert cache.get('new') is not None
+    finally:
+        cache.close()
+
+
+def test_entries_survive_reopening(tmp_path):
+    cache = ClassificationCache(tmp_path / 'cache.sqlite')
+    cache.put('k', {'v': 1})
+    cache.close()
+
+    reopened = ClassificationCache(tmp_path / 'cache.sqlite')
+    try:
+        assert reopened.get('k') == {'v': 1}
+        assert reopened.total_bytes == len('{"v": 1}')
+    finally:
+        reopened.close()
+
+
+def test_settings_key_covers_llm_batching_and_chunking(monkeypatch):
+    classifier = pytest.importorskip('classify_threat_intelligence')
+    model_info = {'model_name': 'mistral'}
+    cascade = {'band': [1.0, 27.0], 'chunked': True}
+
+    base = classifier.classification_settings(model_info, None, cascade)
+    for name, value in [('BATCH_SIZE', '4'), ('MAX_BATCH_TOKENS', '4096'), ('CHUNK_TOKENS', '256'),
+                        ('CHUNK_OVERLAP', '32'), ('MAX_CHUNKS_PER_DOC', '2'), ('CHUNK_MIN_CONFIDENCE', '0.5')]:
+        with monkeypatch.context() as patch:
+            patch.setenv(name, value)
+            assert classifier.classification_settings(model_info, None, cascade) != base, name
+
+
+def test_rules_fallback_is_not_cached(cache, monkeypatch):
+    classifier = pytest.importorskip('classify_threat_intelligence')
+    calls = []
+
+    def failing_llm(articles, model_info, batch_size=None):
+        calls.append(len(articles))
+        return [classifier.classify_record({'title': title, 'content': content}) for title, content in articles]
+
+    def working_llm(articles, model_info, batch_size=None):
+        calls.append(len(articles))
+        return [{'is_threat_report': True, 'main_object': 'APT29', 'confidence': 0.9, 'mistral_response': 'YES'}
+                for _ in articles]
+
+    items = [{'title': 'APT29 phishing', 'content': 'APT29 sent phishing e-mails.', 'link': 'https://a.com/1'}]
+    model_info = {'model_name': 'mistral'}
+    settings = classifier.classification_settings(model_info, None, {'band': [-1e9, 1e9], 'chunked': False})
+
+    def classify(batch):
+        return classifier.classify_cascade(list(batch), model_info, band=(-1e9, 1e9))
+
+    monkeypatch.setattr(classifier, 'classify_batch_with_mistral', failing_llm)
+    [result] = classifier.iter_cached(items, classify, cache, settings)
+    assert result['decided_by'] == 'rules_fallback'
+    assert len(cache) == 0
+
+    monkeypatch.setattr(classifier, 'classify_batch_with_mistral', working_llm)
+    [result] = classifier.iter_cached(items, classify, cache, settings)
+    assert result['decided_by'] == 'llm'
+    assert calls == [1, 1]
+
+    [result] = classifier.iter_cached(items, classify, cache, settings)
+    assert result['decided_by'] == 'llm'
+    assert calls == [1, 1]
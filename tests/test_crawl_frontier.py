@@ -0,0 +1,59 @@
+import pytest
+
+from crawl_frontier import CrawlFrontier
+
+
+@pytest.fixture
+def frontier(tmp_path):
+    frontier = CrawlFrontier(str(tmp_path / 'frontier.sqlite'), max_attempts=2)
+    yield frontier
+    frontier.close()
+
+
+def test_add_returns_only_new_urls(frontier):
+    assert frontier.add('cisa', ['a', 'b']) == ['a', 'b']
+    assert frontier.add('cisa', ['b', 'c']) == ['c']
+    assert len(frontier) == 3
+
+
+def test_all_known(frontier):
+    frontier.add('cisa', ['a', 'b'])
+    assert frontier.all_known(['a', 'b'])
+    assert not frontier.all_known(['a', 'x'])
+
+
+def test_empty_page_is_not_all_known(frontier):
+    # A listing page without links must not stop pagination
+    assert not frontier.all_known([])
+
+
+def test_seeded_urls_are_never_fetched(frontier):
+    frontier.seed(['a'])
+    assert frontier.add('cisa', ['a', 'b']) == ['b']
+    assert frontier.pending('cisa') == ['b']
+
+
+def test_failed_fetches_are_retried_until_max_attempts(frontier):
+    frontier.add('cisa', ['a'])
+    frontier.mark_failed('a')
+    assert frontier.pending('cisa') == ['a']
+    frontier.mark_failed('a')
+    assert frontier.pending('cisa') == []
+
+
+def test_scraped_articles_survive_a_restart_until_saved(tmp_path):
+    path = str(tmp_path / 'frontier.sqlite')
+    frontier = CrawlFrontier(path)
+    frontier.add('cisa', ['a', 'b'])
+    frontier.mark_scraped('a', {'url': 'a', 'title': 'A'})
+    frontier.close()
+
+    resumed = CrawlFrontier(path)
+    try:
+        assert resumed.pending('cisa') == ['b']
+        assert resumed.scraped('cisa') == [{'url': 'a', 'title': 'A'}]
+        resumed.mark_saved(['a'])
+        assert resumed.scraped('cisa') == []
+        assert resumed.counts() == {'done': 1, 'pending': 1}
+    finally:
+        resumed.close()
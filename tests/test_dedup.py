@@ -0,0 +1,47 @@
+from dedup import DuplicateIndex, content_hash, find_duplicates
+
+
+BASE = ("Researchers observed the Lazarus Group deploying a new backdoor against defence contractors "
+        "in Europe. The malware communicates with its command and control server over HTTPS and "
+        "drops a second stage loader that injects into explorer.exe before collecting credentials. ") * 3
+OTHER = ("Microsoft released patches for a critical remote code execution flaw in Exchange Server that "
+         "attackers have exploited since January to install web shells on internet facing servers.")
+
+
+def article(content, title='t', link='l'):
+    return {'title': title, 'link': link, 'content': content}
+
+
+def test_content_hash_ignores_case_and_whitespace():
+    assert content_hash('Hello   World\n') == content_hash('hello world')
+
+
+def test_exact_near_and_distinct_articles():
+    reposted = BASE + "Subscribe to our newsletter for weekly threat updates."
+    clusters = find_duplicates([article(BASE), article(BASE.upper()), article(reposted), article(OTHER)])
+    assert clusters == [(0, None), (0, 'exact'), (0, 'near'), (3, None)]
+
+
+def test_copies_of_a_near_duplicate_stay_near():
+    reposted = BASE + "Subscribe to our newsletter."
+    index = DuplicateIndex()
+    index.add(article(BASE))
+    assert index.add(article(reposted)) == (0, 'near')
+    assert index.add(article(reposted)) == (0, 'near')
+    assert (index.exact_duplicates, index.near_duplicates) == (0, 2)
+
+
+def test_articles_without_content_are_never_merged():
+    assert find_duplicates([article(''), article('  '), article(None)]) == [(0, None), (1, None), (2, None)]
+
+
+def test_keep_result_stores_only_inherited_labels():
+    index = DuplicateIndex()
+    representative, _ = index.add(article(BASE))
+    index.keep_result(representative, {'title': 't', 'link': 'l', 'is_threat_report': True,
+                                       'main_object': 'Actor: Lazarus', 'mistral_response': 'x' * 1000})
+    assert index.results[representative] == {'link': 'l', 'is_threat_report': True, 'main_object': 'Actor: Lazarus'}
+
+    empty, _ = index.add(article(''))
+    index.keep_result(empty, {'is_threat_report': False})
+    assert empty not in index.results
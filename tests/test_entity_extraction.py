@@ -0,0 +1,122 @@
+import types
+
+import pytest
+
+torch = pytest.importorskip('torch')
+transformers = pytest.importorskip('transformers')
+tokenizers = pytest.importorskip('tokenizers')
+
+from entity_extraction import (ENTITY_EXTRACTION_JSON_PREFIX, ENTITY_EXTRACTION_PREFIX, build_prefix_cache,
+                               extract_entities_batch, parse_extraction_output)
+
+
+ARTICLES = [
+    "APT29 used Cobalt Strike beacons against European ministries.",
+    "Emotet spreads via phishing e-mails with macro documents and drops TrickBot.",
+    "The weather is sunny.",
+    "Lazarus exploited CVE-2021-44228 in Log4j to deploy a backdoor on VMware Horizon servers, "
+    "then moved laterally with Mimikatz and exfiltrated data to 185.220.101.4.",
+    "Ransomware",
+]
+
+
+# Answers in the notebook's saved run, as printed by 03_entity_relationship_extraction.ipynb
+NOTEBOOK_OUTPUTS = [
+    ('Named Entities: (NailaoLocker, Malware), (SM2, Technique), (FortiCNAPP Composite Alerts, Tool)\n'
+     'Relationships: (NailaoLocker, uses, SM2), (FortiCNAPP Composite Alerts, used by, Lcrypt0rx)',
+     [('NailaoLocker', 'Malware'), ('SM2', 'Technique'), ('FortiCNAPP Composite Alerts', 'Tool')],
+     [('NailaoLocker', 'uses', 'SM2'), ('FortiCNAPP Composite Alerts', 'used by', 'Lcrypt0rx')]),
+    # Cut off by max_new_tokens in the middle of a tuple
+    ('Named Entities: (H2miner, Threat Type), (Lcrypt0rx, Malware), (AI, Techni',
+     [('H2miner', 'Threat Type'), ('Lcrypt0rx', 'Malware')],
+     []),
+    ("Named Entities: \nRelationships:\n\nOkay, let's tackle this query. The user wants me to extract entities",
+     [],
+     []),
+    ('Named Entities:\n(Dark 101, Malware)\n(FortiSandbox 5.0, Tool)\nRelationships:\n(Dark 101, target, FortiSandbox 5.0)',
+     [('Dark 101', 'Malware'), ('FortiSandbox 5.0', 'Tool')],
+     [('Dark 101', 'target', 'FortiSandbox 5.0')]),
+    ('No related entities and relations', [], []),
+    ('No related entities and relations\nNamed Entities: (Emotet, Malware)', [], []),
+    ('Named Entities: (H2Miner, Threat Type), (evil[.]domain[.]com, Domain), (single)\n'
+     'Relationships: (Kinsing, communicatesWith, evil[.]domain[.]com)',
+     [('H2Miner', 'Threat Type'), ('evil[.]domain[.]com', 'Domain')],
+     [('Kinsing', 'communicatesWith', 'evil[.]domain[.]com')]),
+]
+
+
+@pytest.mark.parametrize('output, entities, relationships', NOTEBOOK_OUTPUTS)
+def test_parse_extraction_output(output, entities, relationships):
+    assert parse_extraction_output(output) == (entities, relationships)
+
+
+def test_parse_extraction_output_reads_the_prompt_examples():
+    answers = [line[len('Output: '):] for line in ENTITY_EXTRACTION_PREFIX.split('\n') if line.startswith('Output: ')]
+    relationships = [line for line in ENTITY_EXTRACTION_PREFIX.split('\n') if line.startswith('Relationships: ')]
+    parsed = [parse_extraction_output(answer + '\n' + relation) for answer, relation in zip(answers, relationships)]
+    assert parsed[0] == ([('Clasiopa', 'Attacker'), ('Backdoor.Atharvan', 'Malware')],
+                         [('Clasiopa', 'uses', 'Backdoor.Atharvan')])
+    assert [len(entities) for entities, _ in parsed] == [2, 4, 5, 6]
+    assert parse_extraction_output(answers[-1]) == ([], [])
+
+
+@pytest.fixture(scope='module')
+def tokenizer():
+    """
+    Byte-level BPE trained on the prompts, so the prefix/suffix split tokenizes like a real model's.
+    """
+    bpe = tokenizers.Tokenizer(tokenizers.models.BPE())
+    bpe.pre_tokenizer = tokenizers.pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = tokenizers.decoders.ByteLevel()
+    trainer = tokenizers.trainers.BpeTrainer(vocab_size=600, special_tokens=['<|eos|>'],
+                                             initial_alphabet=tokenizers.pre_tokenizers.ByteLevel.alphabet())
+    bpe.train_from_iterator([ENTITY_EXTRACTION_PREFIX, ENTITY_EXTRACTION_JSON_PREFIX] + ARTICLES, trainer)
+    return transformers.PreTrainedTokenizerFast(tokenizer_object=bpe, eos_token='<|eos|>', pad_token='<|eos|>')
+
+
+def tiny_pipe(kind, tokenizer):
+    torch.manual_seed(0)
+    eos = tokenizer.eos_token_id
+    # A wide initializer keeps the random model from collapsing onto a single token
+    if kind == 'gpt2':
+        model = transformers.GPT2LMHeadModel(transformers.GPT2Config(
+            vocab_size=len(tokenizer), n_positions=2048, n_embd=32, n_layer=2, n_head=2,
+            initializer_range=0.5, bos_token_id=eos, eos_token_id=eos))
+    else:
+        model = transformers.LlamaForCausalLM(transformers.LlamaConfig(
+            vocab_size=len(tokenizer), hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+            num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=2048,
+            initializer_range=0.5, bos_token_id=eos, eos_token_id=eos, pad_token_id=eos))
+    return types.SimpleNamespace(model=model.eval(), tokenizer=tokenizer)
+
+
+@pytest.fixture(scope='module', params=['gpt2', 'llama'])
+def pipe(request, tokenizer):
+    return tiny_pipe(request.param, tokenizer)
+
+
+def raw_outputs(results):
+    return [result['raw_output'] for result in results]
+
+
+@pytest.mark.parametrize('structured', [False, True])
+def test_prefix_cache_matches_uncached_generation(pipe, structured):
+    prefix_cache = build_prefix_cache(pipe, structured=structured)
+    kwargs = dict(max_new_tokens=16, structured=structured, verbose=False)
+    uncached = extract_entities_batch(pipe, ARTICLES, **kwargs)
+    cached = extract_entities_batch(pipe, ARTICLES, prefix_cache=prefix_cache, **kwargs)
+    assert not any('error' in result for result in uncached + cached)
+    assert raw_outputs(cached) == raw_outputs(uncached)
+    # The cache is copied per batch, so reusing it gives the same answers
+    assert raw_outputs(extract_entities_batch(pipe, ARTICLES, prefix_cache=prefix_cache, **kwargs)) == \
+        raw_outputs(uncached)
+
+
+@pytest.mark.parametrize('batch_size', [2, 8])
+def test_batched_results_match_single_items_in_input_order(pipe, batch_size):
+    kwargs = dict(max_new_tokens=16, verbose=False)
+    # ARTICLES is not sorted by length, so this also checks the order restored after length batching
+    batched = extract_entities_batch(pipe, ARTICLES, batch_size=batch_size, **kwargs)
+    single = [extract_entities_batch(pipe, [text], **kwargs)[0] for text in ARTICLES]
+    assert raw_outputs(batched) == raw_outputs(single)
+    assert len(set(raw_outputs(single))) > 1
@@ -0,0 +1,77 @@
+import json
+
+from extraction_log import ExtractionLog
+
+
+def record(title, **fields):
+    return dict({'title': title, 'entities': [], 'relationships': []}, **fields)
+
+
+def test_appended_titles_are_known_after_reopening(tmp_path):
+    path = tmp_path / 'run.jsonl'
+    with ExtractionLog(str(path)) as log:
+        log.append(record('One'))
+        log.append(record('Two'))
+        assert 'One' in log and ' Two ' in log
+        assert 'Three' not in log
+
+    with ExtractionLog(str(path)) as log:
+        assert len(log) == 2
+        assert 'Two' in log
+        log.append(record('Three'))
+        assert [r['title'] for r in log.records()] == ['One', 'Two', 'Three']
+
+
+def test_interrupted_write_is_dropped(tmp_path):
+    path = tmp_path / 'run.jsonl'
+    with ExtractionLog(str(path)) as log:
+        log.append(record('One'))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"title": "Two", "entit')
+
+    with ExtractionLog(str(path)) as log:
+        assert len(log) == 1
+        assert 'Two' not in log
+        log.append(record('Two'))
+    assert [json.loads(line)['title'] for line in path.read_text(encoding='utf-8').splitlines()] == ['One', 'Two']
+
+
+def test_missing_index_entries_are_rebuilt_from_the_log(tmp_path):
+    path = tmp_path / 'run.jsonl'
+    with ExtractionLog(str(path)) as log:
+        for title in ('One', 'Two', 'Three'):
+            log.append(record(title))
+    index_path = tmp_path / 'run.jsonl.idx'
+    index_lines = index_path.read_text(encoding='utf-8').splitlines(keepends=True)
+    # Lose the last entry and leave half of the one before it
+    index_path.write_text(index_lines[0] + index_lines[1][:5], encoding='utf-8')
+
+    with ExtractionLog(str(path)) as log:
+        assert len(log) == 3
+        assert all(title in log for title in ('One', 'Two', 'Three'))
+    assert index_path.read_text(encoding='utf-8').splitlines(keepends=True) == index_lines
+
+
+def test_legacy_array_is_imported_once(tmp_path):
+    legacy = tmp_path / 'results.json'
+    legacy.write_text(json.dumps([record('Old')]), encoding='utf-8')
+
+    with ExtractionLog(str(tmp_path / 'run.jsonl'), legacy_path=str(legacy)) as log:
+        assert 'Old' in log
+        log.append(record('New'))
+        log.compact(str(legacy))
+
+    with ExtractionLog(str(tmp_path / 'run.jsonl'), legacy_path=str(legacy)) as log:
+        assert len(log) == 2
+
+
+def test_compact_matches_json_dump(tmp_path):
+    records = [record('One', entities=[['APT29', 'Attacker']]), record('Två')]
+    output = tmp_path / 'results.json'
+    with ExtractionLog(str(tmp_path / 'run.jsonl')) as log:
+        assert log.compact(str(output)) == 0
+        assert output.read_text(encoding='utf-8') == '[]\n'
+        for item in records:
+            log.append(item)
+        assert log.compact(str(output)) == 2
+    assert output.read_text(encoding='utf-8') == json.dumps(records, ensure_ascii=False, indent=2) + '\n'
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+pytest.importorskip('regex')
+
+from extraction_schema import (INITIAL_STATE, MAX_ITEMS, MAX_STRING_LENGTH, advance, accepts, close_extraction,
+                               is_complete, is_valid_prefix, parse_structured_output, to_structured, to_tuples)
+
+
+ANSWER = ('{"entities": [{"text": "APT29", "type": "Attacker"}, {"text": "a \\"b\\"", "type": "Tool"}], '
+          '"relationships": [["APT29", "uses", "a \\"b\\""]]}')
+
+
+@pytest.mark.parametrize('cut', range(len(ANSWER) + 1))
+def test_close_extraction_completes_every_prefix(cut):
+    closed = close_extraction(ANSWER[:cut])
+    assert closed.startswith(ANSWER[:cut])
+    assert is_complete(closed)
+    json.loads(closed)
+
+
+def test_close_extraction_finishes_a_dangling_escape():
+    closed = close_extraction('{"entities": [{"text": "a\\')
+    assert json.loads(closed)['entities'][0]['text'] == 'a\n'
+
+
+def test_parse_and_convert():
+    parsed = parse_structured_output('{"entities": [{"text": " APT29 ", "type": "Attacker"}, {"text": "x", "ty')
+    entities, relationships = to_tuples(parsed)
+    # The cut-off entity has an empty type and is dropped
+    assert entities == [('APT29', 'Attacker')]
+    assert relationships == []
+    assert to_structured(entities, [('APT29', 'uses', 'x', 'extra')]) == {
+        'entities': [{'text': 'APT29', 'type': 'Attacker'}],
+        'relationships': [['APT29', 'uses', 'x']]
+    }
+
+
+@pytest.mark.parametrize('text', [
+    ANSWER,
+    ' {"entities":[],"relationships":[]}',
+    '{"entities": [  ], "relationships": []}',
+    '{"entities": [{"text": "a"} ], "relationships": []}',
+    '{"entities": [], "relationships": [["a", "b"]]}',
+    '{"entities": [{"text": "a\\q", "type": "b"}], "relationships": []}',
+    '{"entities": [], "relationships": []} ',
+    '{"entities": [{"text": "' + 'a' * (MAX_STRING_LENGTH + 1),
+    '{"entities": [' + ', '.join(['{"text": "a", "type": "b"}'] * MAX_ITEMS) + ', ',
+    '{"entities": [{"text": "line\nbreak", "type": "b"}], "relationships": []}',
+])
+def test_automaton_agrees_with_the_pattern_on_every_prefix(text):
+    state = INITIAL_STATE
+    for cut in range(len(text) + 1):
+        if cut:
+            state = advance(state, text[cut - 1])
+        prefix = text[:cut]
+        assert bool(state) == is_valid_prefix(prefix), prefix
+        assert accepts(state) == is_complete(prefix), prefix
+
+
+def test_advance_continues_from_a_previous_state():
+    middle = len(ANSWER) // 2
+    assert advance(advance(INITIAL_STATE, ANSWER[:middle]), ANSWER[middle:]) == advance(INITIAL_STATE, ANSWER)
+    assert accepts(advance(INITIAL_STATE, ANSWER))
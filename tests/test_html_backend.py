@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip('bs4')
+pytest.importorskip('lxml')
+pytest.importorskip('cssselect')
+
+from html_backend import BeautifulSoupBackend, LxmlBackend, create_backend
+
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+ADVISORY = (FIXTURES / 'advisory.html').read_text(encoding='utf-8')
+SYMANTEC_LISTING = Path(__file__).parent.parent / 'data' / 'Threat Intelligence _ Symantec Enterprise Blogs.html'
+
+# Selectors the async scrapers use, plus attribute and pseudo-class forms
+SELECTORS = [
+    '.title, .advisory-title, .usa-accordion__heading, h1.usa-prose',
+    '.published-date, .date-published, time, .usa-prose time',
+    '.usa-prose p, .field--type-text-with-summary p, .field--name-body p, article p',
+    '.severity, .risk-level, .tlp-label',
+    'a[href*="/advisory/"], a[href*="/alert"]',
+    'a[href]',
+    'a',
+    'h1:not([class*="menu"]):not([class*="nav"])',
+    '[class*="title"]',
+    'li > a.external',
+    'p',
+    'script, style',
+    'template',
+    'template p',
+]
+
+BACKENDS = [BeautifulSoupBackend(), LxmlBackend()]
+
+
+def extract(backend, body, selector):
+    doc = backend.parse(body)
+    return [(backend.text(element), backend.attr(element, 'href'), backend.attr(element, 'data-id'))
+            for element in backend.select(doc, selector)]
+
+
+@pytest.mark.parametrize('selector', SELECTORS)
+def test_backends_extract_the_same_fields(selector):
+    bs4_fields, lxml_fields = (extract(backend, ADVISORY, selector) for backend in BACKENDS)
+    assert lxml_fields == bs4_fields
+
+
+def test_text_skips_script_style_and_template_contents():
+    for backend in BACKENDS:
+        doc = backend.parse(ADVISORY)
+        texts = [backend.text(element) for element in backend.select(doc, '.field--name-body p')]
+        assert texts[1] == 'Operators dropped a backdoorand moved laterally withMimikatz.', backend.name
+        assert texts[-1] == 'Styled paragraph text that is long enough to keep.', backend.name
+        assert not any('Template' in text or 'injected' in text for text in texts), backend.name
+        assert backend.text(backend.select(doc, 'h1')[0]) == 'AA25-001A: Lazarus Group   TargetsCaféNetworks'
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'windows-1252', 'iso-8859-1'])
+def test_non_utf8_bytes_decode_alike(encoding):
+    body = ADVISORY.replace('charset="utf-8"', f'charset="{encoding}"')
+    body = body.encode(encoding, errors='replace')
+    bs4_fields, lxml_fields = (extract(backend, body, 'h1, p') for backend in BACKENDS)
+    assert lxml_fields == bs4_fields
+    assert bs4_fields[0][0] == 'AA25-001A: Lazarus Group   TargetsCaféNetworks'
+
+
+@pytest.mark.parametrize('body', [b'', '', '   \n', b'<html></html>', '<p></p>'])
+def test_empty_bodies_select_nothing_or_empty_text(body):
+    results = [(extract(backend, body, 'p'), extract(backend, body, '.title')) for backend in BACKENDS]
+    assert results[0] == results[1]
+    assert results[0][1] == []
+
+
+def test_saved_symantec_listing_gives_the_same_links():
+    if not SYMANTEC_LISTING.exists():
+        pytest.skip('saved Symantec listing is not in the checkout')
+    body = SYMANTEC_LISTING.read_bytes()
+    links = [[backend.attr(link, 'href') for link in backend.select(backend.parse(body), 'a.blog-teaser__link')]
+             for backend in BACKENDS]
+    titles = [[backend.text(title) for title in backend.select(backend.parse(body), '.blog-teaser__title')]
+              for backend in BACKENDS]
+    assert links[0] and links[0] == links[1]
+    assert titles[0] and titles[0] == titles[1]
+
+
+def test_create_backend():
+    assert create_backend().name == 'lxml'
+    assert create_backend('bs4').name == 'bs4'
+    with pytest.raises(ValueError):
+        create_backend('html5')
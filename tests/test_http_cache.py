@@ -0,0 +1,78 @@
+import pytest
+
+from http_cache import HttpCache, cache_directives
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = HttpCache(str(tmp_path / 'http_cache.sqlite'))
+    yield cache
+    cache.close()
+
+
+def test_conditional_headers_carry_the_validators(cache):
+    assert cache.conditional_headers('https://a.com/') == {}
+    cache.put('https://a.com/', {'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Jan 2025 00:00:00 GMT'}, b'one')
+    assert cache.conditional_headers('https://a.com/') == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 01 Jan 2025 00:00:00 GMT'
+    }
+    assert cache.touch('https://a.com/') == b'one'
+    assert cache.bytes_saved == 3
+
+
+def test_a_fresh_response_replaces_the_body_and_its_parse_results(cache):
+    cache.put('https://a.com/', {'ETag': '"v1"'}, b'one')
+    cache.put_parsed('https://a.com/', 'links', ['https://a.com/1'])
+    cache.put('https://a.com/', {'Last-Modified': 'Thu, 02 Jan 2025 00:00:00 GMT'}, b'two')
+    assert cache.get_body('https://a.com/') == b'two'
+    assert cache.get_parsed('https://a.com/', 'links') is None
+    assert cache.conditional_headers('https://a.com/') == {'If-Modified-Since': 'Thu, 02 Jan 2025 00:00:00 GMT'}
+    assert len(cache) == 1
+
+
+def test_no_store_responses_are_not_kept(cache):
+    cache.put('https://a.com/', {'ETag': '"v1"'}, b'one')
+    cache.put('https://a.com/', {'ETag': '"v2"', 'Cache-Control': 'private, No-Store'}, b'two')
+    assert cache.get_body('https://a.com/') is None
+    assert cache.conditional_headers('https://a.com/') == {}
+    assert cache.total_bytes == 0
+
+
+def test_no_cache_responses_are_kept_for_revalidation(cache):
+    cache.put('https://a.com/', {'ETag': '"v1"', 'Cache-Control': 'no-cache, max-age=0'}, b'one')
+    assert cache.conditional_headers('https://a.com/') == {'If-None-Match': '"v1"'}
+
+
+def test_cache_directives():
+    assert cache_directives({'Cache-Control': 'max-age=60, NO-STORE ,'}) == {'max-age', 'no-store'}
+    assert cache_directives({}) == set()
+
+
+def test_least_recently_validated_responses_are_evicted(tmp_path):
+    cache = HttpCache(str(tmp_path / 'http_cache.sqlite'), compress_level=0, max_bytes=300)
+    try:
+        cache.put('https://a.com/old', {}, b'a' * 100)
+        cache.put('https://a.com/used', {}, b'b' * 100)
+        cache.put_parsed('https://a.com/old', 'links', [])
+        cache.touch('https://a.com/used')
+        cache.put('https://a.com/new', {}, b'c' * 100)
+        assert cache.get_body('https://a.com/old') is None
+        assert cache.get_parsed('https://a.com/old', 'links') is None
+        assert cache.get_body('https://a.com/used') is not None
+        assert cache.get_body('https://a.com/new') is not None
+        assert cache.total_bytes <= 300
+    finally:
+        cache.close()
+
+
+def test_size_total_survives_reopening(tmp_path):
+    cache = HttpCache(str(tmp_path / 'http_cache.sqlite'))
+    cache.put('https://a.com/', {}, b'one' * 100)
+    total = cache.total_bytes
+    cache.close()
+
+    reopened = HttpCache(str(tmp_path / 'http_cache.sqlite'))
+    try:
+        assert reopened.total_bytes == total > 0
+    finally:
+        reopened.close()
@@ -0,0 +1,57 @@
+from ioc_scanner import scan, scan_stream, extract_indicators, refang
+
+
+def kinds_and_values(text):
+    return [(span['type'], span['value']) for span in scan(text)]
+
+
+def test_defanged_url_is_refanged_and_reports_its_host():
+    assert kinds_and_values('Payload from hxxp://evil[.]com/a.exe.') == [
+        ('url', 'http://evil.com/a.exe'),
+        ('domain', 'evil.com'),
+    ]
+
+
+def test_glued_urls_are_both_reported():
+    text = 'https://a.com/xhttps://b.com/y'
+    spans = list(scan(text))
+    assert [(span['type'], span['value']) for span in spans] == [
+        ('url', 'https://a.com/x'),
+        ('domain', 'a.com'),
+        ('url', 'https://b.com/y'),
+        ('domain', 'b.com'),
+    ]
+    assert [text[span['start']:span['end']] for span in spans] == [span['raw'] for span in spans]
+
+
+def test_validation_drops_bad_candidates():
+    text = 'payload.exe 999.1.1.1 1.2.3.4 ' + 'a' * 33
+    assert kinds_and_values(text) == [('ip_address', '1.2.3.4')]
+
+
+def test_hashes_cves_and_emails():
+    text = f"{'a' * 32} {'b' * 40} {'c' * 64} cve-2024-12345 admin[at]Example.com"
+    assert kinds_and_values(text) == [
+        ('hash_md5', 'a' * 32),
+        ('hash_sha1', 'b' * 40),
+        ('hash_sha256', 'c' * 64),
+        ('cve', 'CVE-2024-12345'),
+        ('email', 'admin@example.com'),
+    ]
+
+
+def test_scan_stream_keeps_absolute_offsets():
+    text = 'contact 10.0.0.1 then evil.com and https://x.org/p'
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    assert list(scan_stream(chunks)) == list(scan(text))
+
+
+def test_extract_indicators_groups_distinct_values():
+    grouped = extract_indicators('evil.com EVIL.com 8.8.8.8')
+    assert grouped['domain'] == ['evil.com']
+    assert grouped['ip_address'] == ['8.8.8.8']
+    assert grouped['url'] == []
+
+
+def test_refang():
+    assert refang('hxxps[:]//a(.)b[dot]c') == 'https://a.b.c'
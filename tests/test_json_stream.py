@@ -0,0 +1,66 @@
+import io
+import json
+
+import pytest
+
+from json_stream import iter_json_array, iter_records, recover_jsonl, JsonlWriter
+
+
+RECORDS = [
+    {'title': 'A [bracketed] "title"', 'score': -1.5},
+    {'title': 'B', 'tags': ['x', 'y'], 'nested': {'n': 12345678901234}},
+    1e-7,
+    'plain string, with ] and ,',
+    None,
+]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 16])
+def test_json_array_decodes_across_any_chunk_boundary(chunk_size):
+    text = json.dumps(RECORDS, indent=2)
+    assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == RECORDS
+
+
+def test_json_array_number_at_end_of_input():
+    assert list(iter_json_array(io.StringIO('[1, 22, -333]'), chunk_size=2)) == [1, 22, -333]
+
+
+def test_empty_json_array():
+    assert list(iter_json_array(io.StringIO(' [ ] '))) == []
+
+
+def test_truncated_or_non_array_input_raises():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"a": 1}, {"b"')))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"a": 1}')))
+
+
+def test_iter_records_reads_jsonl_and_json_arrays(tmp_path):
+    records = [{'i': i} for i in range(3)]
+    (tmp_path / 'a.json').write_text(json.dumps(records), encoding='utf-8')
+    (tmp_path / 'a.jsonl').write_text('\n'.join(json.dumps(r) for r in records) + '\n\n', encoding='utf-8')
+    assert list(iter_records(str(tmp_path / 'a.json'))) == records
+    assert list(iter_records(str(tmp_path / 'a.jsonl'))) == records
+
+
+def test_recover_jsonl_drops_a_partial_last_line(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    assert recover_jsonl(str(path)) == 0
+
+    path.write_bytes(b'{"i": 0}\n{"i": 1}\n{"i": 2')
+    assert recover_jsonl(str(path)) == 2
+    assert path.read_bytes() == b'{"i": 0}\n{"i": 1}\n'
+
+
+def test_writer_appends_unless_told_to_restart(tmp_path):
+    path = tmp_path / 'sub' / 'out.jsonl'
+    with JsonlWriter(str(path), fsync_every=1) as writer:
+        writer.write({'i': 0})
+    with JsonlWriter(str(path)) as writer:
+        writer.write({'i': 1})
+    assert list(iter_records(str(path))) == [{'i': 0}, {'i': 1}]
+
+    with JsonlWriter(str(path), append=False) as writer:
+        writer.write({'i': 2})
+    assert list(iter_records(str(path))) == [{'i': 2}]
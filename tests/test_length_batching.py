@@ -0,0 +1,14 @@
+from length_batching import make_length_batches
+
+
+def test_batches_are_sorted_by_length_and_capped_in_rows():
+    assert make_length_batches([5, 1, 3, 2], batch_size=2, max_batch_tokens=100) == [[1, 3], [2, 0]]
+
+
+def test_batch_is_closed_before_padding_exceeds_the_token_budget():
+    # Two rows padded to 6 tokens would take 12 > 10
+    assert make_length_batches([4, 6, 1], batch_size=8, max_batch_tokens=10) == [[2, 0], [1]]
+
+
+def test_no_lengths_no_batches():
+    assert make_length_batches([], batch_size=4, max_batch_tokens=10) == []
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import merge_json_files as merge_json_files_module
+from article_store import process_record
+from merge_json_files import JsonArrayWriter, LinkSet, merge_json_files
+
+
+def test_link_set_reports_new_links_once(tmp_path):
+    links = LinkSet(str(tmp_path / 'links.sqlite'))
+    try:
+        assert links.add('https://a.com/1')
+        assert not links.add('https://a.com/1')
+        assert links.add('https://a.com/2')
+        assert len(links) == 2
+    finally:
+        links.close()
+    # A named database is kept for the next run
+    assert (tmp_path / 'links.sqlite').exists()
+
+
+def test_temporary_link_set_is_removed():
+    links = LinkSet()
+    path = links.path
+    links.add('x')
+    links.close()
+    assert not path.exists()
+
+
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    raw = tmp_path / 'data' / 'raw'
+    raw.mkdir(parents=True)
+    first = [
+        {'url': 'https://www.fortinet.com/blog/a', 'title': 'A', 'content': ['one', 'two']},
+        {'url': '', 'title': 'No link', 'content': 'first'},
+        {'url': 'https://www.fortinet.com/blog/empty', 'title': 'Empty', 'content': ''},
+    ]
+    second = [
+        {'url': 'https://www.fortinet.com/blog/a', 'title': 'A again', 'content': 'three'},
+        {'url': '', 'title': 'No link either', 'content': 'second'},
+        {'url': 'https://www.security.com/threat-intelligence/espionage-asia', 'title': 'Main menu',
+         'content': 'four'},
+    ]
+    (raw / 'threat_intelligence_multi_source_1.json').write_text(json.dumps(first), encoding='utf-8')
+    (raw / 'threat_intelligence_multi_source_2.json').write_text(json.dumps(second), encoding='utf-8')
+    return tmp_path
+
+
+def test_merge_writes_json_array_by_default(raw_dir):
+    stats = merge_json_files()
+    records = json.loads((raw_dir / 'data/processed/merged_threat_intelligence.json').read_text(encoding='utf-8'))
+
+    assert [record['title'] for record in records] == ['A', 'No link', 'No link either', 'espionage asia']
+    assert records[0]['content'] == 'one two'
+    # Records without a link are not duplicates of each other
+    assert stats['duplicates'] == 1
+    assert stats['empty'] == 1
+    assert stats['written'] == 4
+
+
+def test_merge_writes_jsonl_on_request(raw_dir):
+    merge_json_files('data/processed/merged.jsonl')
+    lines = (raw_dir / 'data/processed/merged.jsonl').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['link'] for line in lines][0] == 'https://www.fortinet.com/blog/a'
+    assert len(lines) == 4
+
+
+def test_json_array_writer_replaces_the_output_on_success(tmp_path):
+    output = tmp_path / 'merged.json'
+    output.write_text('["old"]', encoding='utf-8')
+    with JsonArrayWriter(str(output)) as writer:
+        writer.write({'title': 'A'})
+        writer.write({'title': 'Två'})
+        assert json.loads(output.read_text(encoding='utf-8')) == ['old']
+    assert json.loads(output.read_text(encoding='utf-8')) == [{'title': 'A'}, {'title': 'Två'}]
+    assert not (tmp_path / 'merged.json.tmp').exists()
+
+    with JsonArrayWriter(str(output)):
+        pass
+    assert json.loads(output.read_text(encoding='utf-8')) == []
+
+
+def test_failed_merge_keeps_the_previous_output(raw_dir, monkeypatch):
+    merge_json_files()
+    output = raw_dir / 'data/processed/merged_threat_intelligence.json'
+    previous = output.read_text(encoding='utf-8')
+
+    def failing_process_record(record):
+        if record['title'] == 'A again':
+            raise RuntimeError('disk full')
+        return process_record(record)
+
+    monkeypatch.setattr(merge_json_files_module, 'process_record', failing_process_record)
+    with pytest.raises(RuntimeError):
+        merge_json_files()
+    assert output.read_text(encoding='utf-8') == previous
+    assert not output.with_name(output.name + '.tmp').exists()
@@ -0,0 +1,87 @@
+import types
+
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+import model_registry
+
+
+class Loader:
+    """
+    Stand-in for AutoTokenizer / AutoModelForCausalLM that raises the queued errors first.
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def from_pretrained(self, model_name, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return types.SimpleNamespace(eval=lambda: None, pad_token=None, eos_token='</s>')
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    """
+    Swap the Hugging Face loaders for one Loader and start from an empty registry.
+    """
+    def install(*errors):
+        stub = Loader(*errors)
+        monkeypatch.setattr(model_registry, 'AutoTokenizer', stub)
+        monkeypatch.setattr(model_registry, 'AutoModelForCausalLM', stub)
+        return stub
+
+    model_registry.unload_all()
+    yield install
+    model_registry.unload_all()
+
+
+def test_models_are_loaded_once_per_key(loader):
+    stub = loader()
+    first = model_registry.load_causal_lm('tiny', 'cpu')
+    assert model_registry.load_causal_lm('tiny', 'cpu') is first
+    # Tokenizer and model
+    assert stub.calls == 2
+    assert first['tokenizer'].pad_token == '</s>'
+    assert list(model_registry.loaded_models()) == ['tiny [cpu, torch.float32]']
+
+
+def test_permanent_failures_are_remembered_for_the_ttl(loader, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(model_registry.time, 'monotonic', lambda: clock[0])
+    stub = loader(OSError('gated repo'))
+
+    with pytest.raises(OSError):
+        model_registry.load_causal_lm('gated', 'cpu')
+    # Within the TTL the cached error is raised without touching the loader
+    clock[0] += model_registry.FAILURE_TTL - 1
+    with pytest.raises(OSError, match='gated repo'):
+        model_registry.load_causal_lm('gated', 'cpu')
+    assert stub.calls == 1
+
+    # After it the load is tried again
+    clock[0] += 2
+    assert model_registry.load_causal_lm('gated', 'cpu')['model'] is not None
+    assert stub.calls == 3
+
+
+@pytest.mark.parametrize('error', [MemoryError(), ConnectionError('reset'), TimeoutError()])
+def test_transient_failures_are_retried_on_the_next_request(loader, error):
+    stub = loader(error)
+    with pytest.raises(type(error)):
+        model_registry.load_causal_lm('flaky', 'cpu')
+    assert model_registry.load_causal_lm('flaky', 'cpu')['model'] is not None
+    assert stub.calls == 3
+
+
+def test_unload_all_forgets_failures(loader):
+    stub = loader(OSError('missing'))
+    with pytest.raises(OSError):
+        model_registry.load_causal_lm('missing', 'cpu')
+    model_registry.unload_all()
+    model_registry.load_causal_lm('missing', 'cpu')
+    assert stub.calls == 3
@@ -0,0 +1,147 @@
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('ollama')
+
+from extraction_schema import EXTRACTION_SCHEMA
+from ollama_annotator import (OllamaAnnotator, normalize_output, shard_indices, load_completed,
+                              log_path_for, compact)
+
+
+class MockOllama(ThreadingHTTPServer):
+    """
+    Minimal /api/chat: answers with the record's title as its only entity,
+    after failing the first `failures` requests with 503.
+    """
+
+    def __init__(self, failures=0):
+        super().__init__(('127.0.0.1', 0), ChatHandler)
+        self.failures = failures
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            self.server.requests.append(body)
+            fail = self.server.failures > 0
+            self.server.failures -= fail
+        if self.path != '/api/chat' or fail:
+            self.reply(503, {'error': 'busy'})
+            return
+        title = body['messages'][-1]['content'].split('\n')[0][len('Title: '):]
+        answer = {'entities': [{'text': title, 'type': 'Malware'}], 'relationships': []}
+        self.reply(200, {'model': body['model'], 'created_at': '2025-01-01T00:00:00Z', 'done': True,
+                         'message': {'role': 'assistant', 'content': json.dumps(answer)}})
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = MockOllama()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+DATA = [{'title': f'Malware{i}', 'link': f'https://a.com/{i}', 'content': 'text'} for i in range(5)]
+
+
+def annotator(server, **kwargs):
+    return OllamaAnnotator('mock', [server.url], concurrency=2, backoff_base=0.0, timeout=10.0, **kwargs)
+
+
+def logged(log_path):
+    return {json.loads(line)['index']: json.loads(line) for line in log_path.read_text(encoding='utf-8').splitlines()}
+
+
+def test_run_retries_and_resumes_missing_records(server, tmp_path):
+    server.failures = 1
+    log_path = log_path_for(str(tmp_path), 'mock')
+
+    stats = asyncio.run(annotator(server).run(DATA, log_path, limit=3))
+    assert stats['written'] == 3 and stats['retries'] == 1 and stats['missing'] == 2
+
+    stats = asyncio.run(annotator(server).run(DATA, log_path))
+    assert stats['written'] == 2 and stats['missing'] == 0
+
+    records = logged(log_path)
+    assert sorted(records) == [0, 1, 2, 3, 4]
+    assert all(records[i]['extraction']['entities'] == [{'text': f'Malware{i}', 'type': 'Malware'}]
+               for i in records)
+
+
+def test_shards_are_disjoint_and_compact_in_corpus_order(server, tmp_path):
+    logs = [log_path_for(str(tmp_path), 'mock', 2, shard) for shard in (0, 1)]
+    for shard, log_path in enumerate(logs):
+        asyncio.run(annotator(server).run(DATA, log_path, num_shards=2, shard_id=shard))
+    assert sorted(logged(logs[0])) == [0, 2, 4]
+    assert sorted(logged(logs[1])) == [1, 3]
+
+    output = tmp_path / 'merged.json'
+    assert compact(logs, str(output)) == 5
+    merged = json.loads(output.read_text(encoding='utf-8'))
+    assert [record['title'] for record in merged] == [item['title'] for item in DATA]
+    assert all('index' not in record for record in merged)
+
+
+def test_structured_requests_carry_the_schema(server, tmp_path):
+    asyncio.run(annotator(server, structured=True).run(DATA[:1], log_path_for(str(tmp_path), 'mock')))
+    assert server.requests[0]['format'] == EXTRACTION_SCHEMA
+
+
+def test_failed_records_are_left_for_the_next_run(server, tmp_path):
+    server.failures = 100
+    stats = asyncio.run(OllamaAnnotator('mock', [server.url], concurrency=1, max_retries=1,
+                                        backoff_base=0.0).run(DATA[:2], tmp_path / 'log.jsonl'))
+    assert stats['failures'] == 2 and stats['written'] == 0 and stats['missing'] == 2
+
+
+def test_load_completed_drops_a_partial_line(tmp_path):
+    log_path = tmp_path / 'log.jsonl'
+    log_path.write_text('{"index": 3}\n{"index": 7}\n{"ind', encoding='utf-8')
+    assert load_completed(log_path) == {3, 7}
+    assert log_path.read_text(encoding='utf-8') == '{"index": 3}\n{"index": 7}\n'
+
+
+def test_shard_indices():
+    assert shard_indices(7, 3, 1, completed=[4]) == [1]
+    assert shard_indices(3) == [0, 1, 2]
+    with pytest.raises(ValueError):
+        shard_indices(3, 2, 2)
+
+
+def test_normalize_output_skips_malformed_items():
+    parsed = {
+        'entities': [{'text': ' APT29 ', 'type': 'ThreatActor'}, {'text': 5, 'type': 'Tool'},
+                     {'text': 'APT29', 'type': 'ThreatActor'}, 'Mimikatz'],
+        'relationships': [['APT29', 'uses', 'Mimikatz'], ['APT29', None, 'x'], ['a', 'b'], [1, 2, 3]]
+    }
+    assert normalize_output(parsed) == {
+        'entities': [{'text': 'APT29', 'type': 'ThreatActor'}],
+        'relationships': [{'subject': 'APT29', 'predicate': 'uses', 'object': 'Mimikatz'}]
+    }
+    assert normalize_output([1, 2]) == {'entities': [], 'relationships': []}
+    assert normalize_output({'entities': None}) == {'entities': [], 'relationships': []}
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from pipeline_metrics import PipelineMetrics, percentile
+
+
+def test_percentile_uses_nearest_rank():
+    values = [0.1, 0.2, 0.3, 0.4]
+    assert percentile(values, 50) == 0.2
+    assert percentile(values, 95) == 0.4
+    assert percentile(values, 0) == 0.1
+    assert percentile([], 50) == 0.0
+
+
+def test_report_summarises_latencies_and_stages():
+    metrics = PipelineMetrics()
+    metrics.add_latency(0.5)
+    metrics.add_latency(0.25, count=3)
+    metrics.add('rules', 0.12345678)
+    metrics.add('rules', 0.1, count=2)
+    for _ in range(4):
+        metrics.result_done()
+
+    report = metrics.report()
+    assert report['documents'] == 4 and report['classified'] == 4
+    # A batched call counts its duration once, however many articles it produced
+    assert report['classify_docs_per_second'] == round(4 / 0.75, 2)
+    assert report['latency_seconds'] == {'mean': 0.3125, 'p50': 0.25, 'p95': 0.5, 'p99': 0.5, 'max': 0.5}
+    assert report['stages'] == {'rules': {'seconds': 0.2235, 'count': 3}}
+    json.dumps(report)
+
+
+def test_captured_stages_are_kept_apart_until_merged():
+    metrics = PipelineMetrics()
+    metrics.add('load', 1.0)
+    with metrics.capture() as stages:
+        with metrics.stage('rules'):
+            pass
+        metrics.add('rules', 0.5)
+    assert set(metrics.stages) == {'load'}
+    assert stages['rules']['count'] == 2
+
+    metrics.merge_stages(stages)
+    metrics.merge_stages({'rules': {'seconds': 1.0, 'count': 3}})
+    assert metrics.stages['rules']['count'] == 5
+    assert metrics.stages['rules']['seconds'] >= 1.5
+
+
+def test_save_json_and_summary(tmp_path, capsys):
+    metrics = PipelineMetrics()
+    metrics.add('save', 0.2)
+    metrics.add('rules', 0.4)
+    report = metrics.save_json(str(tmp_path / 'metrics' / 'run.json'))
+    assert json.loads((tmp_path / 'metrics' / 'run.json').read_text(encoding='utf-8'))['stages'] == report['stages']
+
+    metrics.print_summary()
+    lines = capsys.readouterr().out.splitlines()
+    stage_lines = [line for line in lines if 'calls' in line]
+    assert stage_lines[0].startswith('   - rules') and stage_lines[1].startswith('   - save')
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_rules_stage_is_recorded_with_any_number_of_workers(workers):
+    classifier = pytest.importorskip('classify_threat_intelligence')
+    items = [{'title': f'APT{i} ransomware campaign', 'content': 'The malware exploited a vulnerability.',
+              'link': f'https://a.com/{i}'} for i in range(6)]
+    classifier.METRICS.reset()
+    executor, classify = classifier.make_classifier(workers, 2, len(items))
+    try:
+        results = list(classify(items))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    assert [result['link'] for result in results] == [item['link'] for item in items]
+    report = classifier.METRICS.report()
+    assert report['stages']['rules']['count'] == len(items)
+    assert report['classified'] == len(items)